@@ -0,0 +1,94 @@
+"""
+The benchmark suite: the README scenarios at small, medium and huge payload sizes, passing and failing, with both
+engines.
+
+    python -m benchmarks run -o results.json                 # all of it
+    python -m benchmarks run --sizes small,medium -o new.json
+    python -m benchmarks compare results.json new.json       # exits with 1 on a regression
+    python -m benchmarks parity --random 500                 # exits with 1 when an engine disagrees
+
+`run --baseline results.json` compares as it goes.
+"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks import parity  # noqa: E402
+from benchmarks.scenarios import SCENARIOS, SIZES  # noqa: E402
+from benchmarks.suite import compare, load, run, save, table  # noqa: E402
+from tissuebox.bench import ENGINES  # noqa: E402
+
+
+def names(value, known, what):
+    chosen = value.split(",")
+    for name in chosen:
+        if name not in known:
+            raise argparse.ArgumentTypeError("unknown {} {!r}, one of {}".format(what, name, ", ".join(known)))
+    return chosen
+
+
+def report(baseline, current, args):
+    rows, regressions = compare(baseline, current, args.threshold, args.allocation_threshold)
+    table(rows)
+    if regressions:
+        print("\n{} regressions beyond the thresholds:".format(len(regressions)))
+        table(regressions)
+        return 1
+    print("\nNo regressions")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    runner = commands.add_parser("run", help="run the suite and save the results as JSON")
+    runner.add_argument("-o", "--output", help="where to save the results")
+    runner.add_argument("--scenarios", type=lambda v: names(v, SCENARIOS, "scenario"), help=", ".join(SCENARIOS))
+    runner.add_argument("--sizes", type=lambda v: names(v, SIZES, "size"), help=", ".join(SIZES))
+    runner.add_argument("--engines", type=lambda v: names(v, ENGINES, "engine"), default=ENGINES, help=", ".join(ENGINES))
+    runner.add_argument("--no-allocations", action="store_true", help="skip counting allocations")
+    runner.add_argument("--baseline", help="results to compare with once done")
+
+    comparer = commands.add_parser("compare", help="compare results with a baseline")
+    comparer.add_argument("baseline")
+    comparer.add_argument("current")
+
+    checker = commands.add_parser("parity", help="check every engine gives the interpreter's answers")
+    checker.add_argument("--random", type=int, default=200, help="random schemas to check, each with several payloads")
+    checker.add_argument("--seed", type=int, default=0)
+    checker.add_argument("--no-tests", action="store_true", help="skip the cases recorded from tests.py")
+    checker.add_argument("--no-timing", action="store_true", help="skip timing the engines")
+    checker.add_argument("--engines", type=lambda v: names(v, parity.ENGINES, "engine"), help=", ".join(parity.ENGINES))
+
+    for command in (runner, comparer):
+        command.add_argument("--threshold", type=float, default=0.2, help="slowdown that counts as a regression, 0.2 is 20%%")
+        command.add_argument("--allocation-threshold", type=float, default=0.2, help="same for allocations")
+
+    args = parser.parse_args(argv)
+    if args.command == "parity":
+        cases = ([] if args.no_tests else parity.recorded()) + parity.generated(args.random, args.seed)
+        checked = parity.run(cases, args.engines, not args.no_timing)
+        parity.report(checked)
+        return 1 if checked["mismatches"] else 0
+    if args.command == "compare":
+        return report(load(args.baseline), load(args.current), args)
+
+    def progress(key, result):
+        extra = "  {:.0f} allocations".format(result["allocations"]) if "allocations" in result else ""
+        print("{:<36} {:>12.2f} us{}".format(key, result["seconds"] * 1e6, extra), flush=True)
+
+    current = run(args.scenarios, args.sizes, args.engines, not args.no_allocations, progress)
+    if args.output:
+        save(current, args.output)
+    if args.baseline:
+        print()
+        return report(load(args.baseline), current, args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
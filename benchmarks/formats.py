@@ -0,0 +1,64 @@
+"""
+Micro benchmark of the format validators of tissuebox.basic.
+
+Compares each validator against the way it used to be written, a regex compiled or looked up in the re cache on every
+call, on valid, invalid and 1MB hostile inputs.
+
+    python benchmarks/formats.py
+"""
+import re
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from tissuebox.basic import date, email, ipv4, ipv6, iso8601, url, uuid4  # noqa: E402
+
+URL = (
+    r"(https?:\/\/(?:www\.|(?!www))[a-zA-Z0-9][a-zA-Z0-9-]+[a-zA-Z0-9]\.[^\s]{2,}|www\.[a-zA-Z0-9][a-zA-Z0-9-]+"
+    r"[a-zA-Z0-9]\.[^\s]{2,}|https?:\/\/(?:www\.|(?!www))[a-zA-Z0-9]\.[^\s]{2,}|www\.[a-zA-Z0-9]\.[^\s]{2,})"
+)
+
+
+def old_uuid4(x, field=None):
+    return isinstance(x, str) and bool(re.compile(r"^[a-f0-9]{8}-?[a-f0-9]{4}-?4[a-f0-9]{3}-?[89ab][a-f0-9]{3}-?[a-f0-9]{12}\Z", re.I).match(x))
+
+
+def old_email(x, field=None):
+    return isinstance(x, str) and bool(re.match(r"(^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$)", x))
+
+
+def old_url(x, field=None):
+    return isinstance(x, str) and bool(re.match(URL, x))
+
+
+HOSTILE = "a" * 2**20
+
+CASES = [
+    ("uuid4", uuid4, old_uuid4, ["1b4e28ba-2fa1-41d2-883f-0016d3cca427", "1b4e28ba-2fa1-11d2-883f-0016d3cca427", HOSTILE]),
+    ("email", email, old_email, ["roger@example.com", "roger@example", "a@" + "a." * 2**19 + "!"]),
+    ("url", url, old_url, ["https://www.example.com/path", "http://e.x", "http://" + HOSTILE]),
+    ("ipv4", ipv4, None, ["192.168.0.1", "192.168.0.256", HOSTILE]),
+    ("ipv6", ipv6, None, ["2001:db8::ff00:42:8329", "2001:db8:::1", HOSTILE]),
+    ("date", date, None, ["2024-02-29", "2023-02-29", HOSTILE]),
+    ("iso8601", iso8601, None, ["2024-02-29T10:30:00+05:30", "2024-02-29T25:30:00", HOSTILE]),
+]
+
+
+def best(f, value, number):
+    return min(timeit.repeat(lambda: f(value), number=number, repeat=5)) / number
+
+
+def main():
+    print("{:<10} {:<40} {:>12} {:>12}".format("validator", "input", "now (us)", "before (us)"))
+    for name, new, old, values in CASES:
+        for value in values:
+            number = 10 if len(value) > 1000 else 20000
+            label = repr(value) if len(value) <= 38 else "{} chars".format(len(value))
+            before = "{:12.2f}".format(best(old, value, number) * 1e6) if old else "{:>12}".format("-")
+            print("{:<10} {:<40} {:12.2f} {}".format(name, label[:40], best(new, value, number) * 1e6, before))
+
+
+if __name__ == "__main__":
+    main()
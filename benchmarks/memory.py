@@ -0,0 +1,31 @@
+"""
+Bytes and allocations of a validate() call with each engine, broken down into error lists, path lists, formatted
+messages, schema copies and the rest, on a passing and a failing payload.
+
+    python benchmarks/memory.py
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from tissuebox.basic import email, integer, string  # noqa: E402
+from tissuebox.bench import memory, report  # noqa: E402
+
+SCHEMA = {"name": string, "address.city": string, "staffs": [{"age": integer, "email": email}]}
+
+
+def payload(n, valid):
+    staffs = [{"age": i if valid else str(i), "email": "roger@example.com" if valid else "roger"} for i in range(n)]
+    return {"name": "Roger", "address": {"city": "Basel"}, "staffs": staffs}
+
+
+def main():
+    for valid in (True, False):
+        print("{} payload, 100 staffs".format("passing" if valid else "failing"))
+        report(memory(payload(100, valid), SCHEMA))
+        print()
+
+
+if __name__ == "__main__":
+    main()
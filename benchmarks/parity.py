@@ -0,0 +1,384 @@
+"""
+Differential testing of the engines against the interpreter, the reference every faster engine has to agree with.
+
+The cases are the validate() calls tests.py makes, recorded while it runs, and random schemas with payloads generate()
+makes for them, half of them broken. Every engine gets every case and has to come up with the same boolean, the same
+error list and the same exception, if any, as the interpreter, and the same boolean when no errors are asked for. Its
+speed relative to the interpreter is recorded per case. A case an engine disagrees on is shrunk to the smallest schema
+and payload it still disagrees on.
+"""
+import copy
+import math
+import random
+import sys
+import time
+import unittest
+
+from tissuebox import SchemaError, _, compile, generate, not_, validate
+from tissuebox.basic import (
+    boolean,
+    date,
+    divisible,
+    email,
+    gt,
+    integer,
+    ipv4,
+    iso8601,
+    lt,
+    max_len,
+    null,
+    numeric,
+    string,
+    url,
+    uuid4,
+)
+from tissuebox.compiler import copy_schema
+
+REFERENCE = "interpreter"
+# An engine makes a `f(payload, errors=None)` validating against the schema it was given, like CompiledSchema.validate
+ENGINES = {
+    REFERENCE: lambda schema: lambda payload, errors=None: validate(payload, schema, errors),
+    "compiled": lambda schema: compile(schema).validate,
+}
+# And a `parse(payload, errors)` of the engines which have one, the interpreter's validates as it converts nothing
+PARSERS = {
+    REFERENCE: lambda schema: lambda payload, errors: payload if validate(payload, schema, errors) else None,
+    "compiled": lambda schema: compile(schema).parse,
+}
+# Test classes whose calls aren't recorded, the ones about the harness itself or too slow to run under it
+SKIPPED = {"TestParity", "TestBenchmarks", "TestMemory"}
+# Time a case for at least this long with each engine
+MIN_TIME = 0.002
+# Schemas and payloads tried while shrinking a case before settling for the smallest found
+SHRINK_BUDGET = 2000
+
+LEAVES = [integer, numeric, string, boolean, null, email, url, uuid4, ipv4, date, iso8601, int, str]
+# Given to every random schema besides the payloads made for it, values of each type whatever the schema asks for
+JUNK = [None, 0, -3, 1.5, 10 ** 9, True, "x", "a@b.co", [], [1], {}, {"f0": 1}]
+# How often scramble() swaps a value
+SCRAMBLE_RATE = 0.3
+
+
+class Case:
+    __slots__ = ("label", "schema", "payload")
+
+    def __init__(self, label, schema, payload):
+        self.label = label
+        self.schema = schema
+        self.payload = payload
+
+
+def recorded(module="tests"):
+    """The cases of the validate() calls the tests of `module` make with only a payload, a schema and an errors list"""
+    tests = __import__(module)
+    cases = []
+    current = [""]
+
+    def recorder(payload, schema, errors=None, *args, **kwargs):
+        if not args and not kwargs:
+            try:
+                cases.append(Case(current[0], copy_schema(schema), copy.deepcopy(payload)))
+            except (TypeError, copy.Error):
+                pass
+        return validate(payload, schema, errors, *args, **kwargs)
+
+    class Result(unittest.TestResult):
+        def startTest(self, test):
+            current[0] = test.id()
+            super().startTest(test)
+
+    suite = unittest.TestSuite(
+        t for group in unittest.defaultTestLoader.loadTestsFromModule(tests) for t in group if type(t).__name__ not in SKIPPED
+    )
+    saved = tests.validate, tests.v
+    tests.validate = tests.v = recorder
+    try:
+        suite.run(Result())
+    finally:
+        tests.validate, tests.v = saved
+    return cases
+
+
+def bound(rnd):
+    return rnd.choice([lt(rnd.randint(-10, 10)), gt(rnd.randint(-10, 10)), divisible(rnd.randint(2, 5))])
+
+
+def random_schema(rnd, depth=2):
+    """A schema of the kinds the README shows, nested at most `depth` levels"""
+    kind = rnd.choice(["leaf", "leaf", "enum", "union", "chain", "early", "not"] + ["dict", "dict", "list", "wildcard"] * (depth > 0))
+    if kind == "leaf":
+        return rnd.choice(LEAVES)
+    if kind == "enum":
+        return set(rnd.sample(["a", "b", "c", 1, 2, True], rnd.randint(1, 3)))
+    if kind == "union":
+        # Bounds next to type checks, whose order the compiled engine may change, and which raise on other types
+        return {rnd.choice(LEAVES + [max_len(5)]) if rnd.random() < 0.6 else bound(rnd) for _ in range(rnd.randint(2, 3))}
+    if kind == "chain":
+        chain = [rnd.choice(LEAVES + [max_len(5)])] + [bound(rnd) for _ in range(rnd.randint(1, 2))]
+        rnd.shuffle(chain)
+        return tuple(chain)
+    if kind == "early":
+        return _(rnd.choice([(string, email), integer, (integer, gt(0))]))
+    if kind == "not":
+        return not_(rnd.choice([null, string, integer]))
+    if kind == "list":
+        return [random_schema(rnd, depth - 1)]
+    if kind == "wildcard":
+        return {"*": random_schema(rnd, depth - 1)}
+    schema = {}
+    for i in range(rnd.randint(1, 4)):
+        key = rnd.choice(["f{}", "f{}.g", "[f{}].g"]).format(i)
+        schema[key] = random_schema(rnd, depth - 1)
+    return schema
+
+
+def scramble(rnd, payload):
+    """
+    `payload` with some of the values in its dicts and lists, at any depth, swapped for junk. Unlike the breaks of
+    generate() these may raise, and often come after a value which already failed
+    """
+    if type(payload) is dict:
+        return {k: copy.deepcopy(rnd.choice(JUNK)) if rnd.random() < SCRAMBLE_RATE else scramble(rnd, v) for k, v in payload.items()}
+    if type(payload) is list:
+        return [copy.deepcopy(rnd.choice(JUNK)) if rnd.random() < SCRAMBLE_RATE else scramble(rnd, v) for v in payload]
+    return payload
+
+
+def generated(n=200, seed=0, payloads=5):
+    """
+    The cases of `n` random schemas, each with `payloads` payloads generate() makes, half of them broken in up to three
+    places, the same payloads scrambled and the junk. A schema nothing passes gets only the junk
+    """
+    rnd = random.Random(seed)
+    cases = []
+    for i in range(n):
+        schema = random_schema(rnd)
+        label = "random #{}".format(i)
+        try:
+            made = list(generate(schema, payloads, seed=rnd.randrange(2 ** 32), invalid_ratio=0.5, broken=3))
+        except SchemaError:
+            # Nothing passes `(string, lt(5))`, say, the junk still shows how the engines turn it down or raise
+            made = []
+        cases.extend(Case(label, schema, p) for p in made + [scramble(rnd, p) for p in made] + copy.deepcopy(JUNK))
+    return cases
+
+
+def attempt(call, payload):
+    """What `call` returns for a copy of `payload`, the name of what it raised if it does"""
+    try:
+        return call(copy.deepcopy(payload))
+    except (Exception, SchemaError) as e:
+        return type(e).__name__
+
+
+def collected(f):
+    def call(payload):
+        errors = []
+        return bool(f(payload, errors)), errors
+
+    return call
+
+
+def parsed(parse):
+    def call(payload):
+        errors = []
+        return parse(payload, errors) is not None, errors
+
+    return call
+
+
+def outcome(engine, schema, payload, parsing=None):
+    """
+    What `engine` says of `payload` with each call, a result or the name of what it raised: `(result, errors)` with an
+    errors list, the boolean without one and, when `parsing`, whether parse() gave a value along with its errors. Each
+    call is made on its own, one raising doesn't hide what the others say. `parsing` defaults to whether it can parse.
+
+    An engine which turns the schema down up front, as compile() does, raises the same with every call
+    """
+    parsing = engine in PARSERS if parsing is None else parsing
+    f = attempt(lambda s: ENGINES[engine](s), copy_schema(schema))
+    if type(f) is str:
+        return (f,) * (3 if parsing else 2)
+    said = [attempt(collected(f), payload), attempt(lambda p: bool(f(p)), payload)]
+    if parsing:
+        parse = attempt(lambda s: PARSERS[engine](s), copy_schema(schema))
+        said.append(parse if type(parse) is str else attempt(parsed(parse), payload))
+    return tuple(said)
+
+
+def best(f, payload):
+    """The time of a call of `f(payload, [])` in seconds, None if it raises"""
+    try:
+        start = time.perf_counter()
+        f(payload, [])
+        once = time.perf_counter() - start
+        number = max(1, int(MIN_TIME / max(once, 1e-7)))
+        start = time.perf_counter()
+        for _ in range(number):
+            f(payload, [])
+        return (time.perf_counter() - start) / number
+    except (Exception, SchemaError):
+        return None
+
+
+def speedup(engine, case):
+    """How many times faster than the interpreter `engine` validates the case"""
+    try:
+        reference, f = ENGINES[REFERENCE](copy_schema(case.schema)), ENGINES[engine](copy_schema(case.schema))
+    except (Exception, SchemaError):
+        return None
+    before, after = best(reference, case.payload), best(f, case.payload)
+    return before / after if before and after else None
+
+
+def disagrees(engine):
+    return lambda schema, payload: outcome(engine, schema, payload) != outcome(REFERENCE, schema, payload, engine in PARSERS)
+
+
+def simpler(schema):
+    """Schemas a step simpler than `schema`: with a field, member or wrapper less, or a simpler part"""
+    if type(schema) is dict:
+        for k in schema:
+            yield {key: value for key, value in schema.items() if key != k}
+        for k, value in schema.items():
+            for s in simpler(value):
+                yield {**schema, k: s}
+    elif type(schema) is list:
+        for i, value in enumerate(schema):
+            for s in simpler(value):
+                yield schema[:i] + [s] + schema[i + 1 :]
+    elif type(schema) is tuple:
+        if len(schema) == 1:
+            yield schema[0]
+        for i in range(len(schema)):
+            if len(schema) > 1:
+                yield schema[:i] + schema[i + 1 :]
+        for i, value in enumerate(schema):
+            for s in simpler(value):
+                yield schema[:i] + (s,) + schema[i + 1 :]
+    elif type(schema) is set and len(schema) > 1:
+        for member in schema:
+            yield schema - {member}
+    elif hasattr(schema, "validator"):
+        yield schema.validator
+
+
+def smaller(payload):
+    """Payloads a step smaller than `payload`: with a key or items less, a shorter string or 0"""
+    if type(payload) is dict:
+        for k in payload:
+            yield {key: value for key, value in payload.items() if key != k}
+        for k, value in payload.items():
+            for s in smaller(value):
+                yield {**payload, k: s}
+    elif type(payload) is list:
+        if len(payload) > 1:
+            yield payload[: len(payload) // 2]
+            yield payload[len(payload) // 2 :]
+        for i in range(len(payload)):
+            yield payload[:i] + payload[i + 1 :]
+        for i, value in enumerate(payload):
+            for s in smaller(value):
+                yield payload[:i] + [s] + payload[i + 1 :]
+    elif type(payload) is str and payload:
+        yield ""
+        if len(payload) > 1:
+            yield payload[: len(payload) // 2]
+    elif type(payload) is int and payload != 0:
+        yield 0
+
+
+def shrink(schema, payload, fails, budget=SHRINK_BUDGET):
+    """The smallest schema and payload, taking a step at a time, `fails(schema, payload)` still holds for"""
+    progress = True
+    while progress and budget > 0:
+        progress = False
+        for s, p in [(s, payload) for s in simpler(schema)] + [(schema, p) for p in smaller(payload)]:
+            budget -= 1
+            if fails(s, p):
+                schema, payload, progress = s, p, True
+                break
+            if budget <= 0:
+                break
+    return schema, payload
+
+
+def source(schema):
+    """`schema` as it would be written in Python, to paste a reproduction"""
+    if type(schema) is dict:
+        return "{" + ", ".join("{!r}: {}".format(k, source(v)) for k, v in schema.items()) + "}"
+    if type(schema) is list:
+        return "[" + ", ".join(source(s) for s in schema) + "]"
+    if type(schema) is tuple:
+        return "(" + ", ".join(source(s) for s in schema) + ("," if len(schema) == 1 else "") + ")"
+    if type(schema) is set:
+        return "{" + ", ".join(sorted(source(s) for s in schema)) + "}"
+    if hasattr(schema, "less_than"):
+        return "lt({!r})".format(schema.less_than)
+    if hasattr(schema, "greater_than"):
+        return "gt({!r})".format(schema.greater_than)
+    if hasattr(schema, "multiple_of"):
+        return "divisible({!r})".format(schema.multiple_of)
+    if hasattr(schema, "validator"):
+        return "{}({})".format("_" if hasattr(schema, "is_early_exit") else "not_", source(schema.validator))
+    if hasattr(schema, "is_tagged"):
+        return "tagged({!r}, {})".format(schema.key, source(schema.branches))
+    if isinstance(schema, type):
+        return schema.__name__
+    if callable(schema):
+        return getattr(schema, "__name__", repr(schema))
+    return repr(schema)
+
+
+def run(cases, engines=None, timed=True, progress=None):
+    """
+    Every case with every engine but the interpreter, `{"cases": ..., "results": [...], "mismatches": [...]}`. A result
+    is `{"label", "engine", "agrees", "speedup"}`, a mismatch holds the shrunk `schema` and `payload` and what the
+    interpreter and the engine said of them
+    """
+    engines = [e for e in (engines or ENGINES) if e != REFERENCE]
+    results, mismatches = [], []
+    for i, case in enumerate(cases):
+        for engine in engines:
+            agrees = outcome(engine, case.schema, case.payload) == outcome(REFERENCE, case.schema, case.payload, engine in PARSERS)
+            results.append({"label": case.label, "engine": engine, "agrees": agrees, "speedup": speedup(engine, case) if timed else None})
+            if not agrees:
+                schema, payload = shrink(case.schema, case.payload, disagrees(engine))
+                mismatches.append(
+                    {
+                        "label": case.label,
+                        "engine": engine,
+                        "schema": schema,
+                        "payload": payload,
+                        "expected": outcome(REFERENCE, schema, payload, engine in PARSERS),
+                        "got": outcome(engine, schema, payload),
+                    }
+                )
+        if progress:
+            progress(i + 1, len(cases))
+    return {"cases": len(cases), "results": results, "mismatches": mismatches}
+
+
+def report(checked, file=None):
+    """Print the agreement and relative speed of each engine, the slowest cases and the shrunk mismatches"""
+    out = file or sys.stdout
+    print("{} cases".format(checked["cases"]), file=out)
+    print("{:<12} {:>8} {:>10} {:>10} {:>10} {:>10}".format("engine", "cases", "mismatches", "geomean", "slowest", "fastest"), file=out)
+    for engine in sorted({r["engine"] for r in checked["results"]}):
+        results = [r for r in checked["results"] if r["engine"] == engine]
+        speeds = [r["speedup"] for r in results if r["speedup"]]
+        wrong = sum(not r["agrees"] for r in results)
+        if speeds:
+            mean = math.exp(sum(math.log(s) for s in speeds) / len(speeds))
+            line = "{:>9.2f}x {:>9.2f}x {:>9.2f}x".format(mean, min(speeds), max(speeds))
+        else:
+            line = "{:>10} {:>10} {:>10}".format("-", "-", "-")
+        print("{:<12} {:>8} {:>10} {}".format(engine, len(results), wrong, line), file=out)
+        slowest = sorted((r for r in results if r["speedup"]), key=lambda r: r["speedup"])[:5]
+        for r in slowest:
+            print("    {:>9.2f}x  {}".format(r["speedup"], r["label"]), file=out)
+    for m in checked["mismatches"]:
+        print("\n{} disagrees on {}:".format(m["engine"], m["label"]), file=out)
+        print("    validate({!r}, {})".format(m["payload"], source(m["schema"])), file=out)
+        print("    {}: {!r}".format(REFERENCE, m["expected"]), file=out)
+        print("    {}: {!r}".format(m["engine"], m["got"]), file=out)
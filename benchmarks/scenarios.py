@@ -0,0 +1,79 @@
+"""
+The README scenarios as benchmarks. Each builds the payload of a size, passing or with every tenth element broken.
+"""
+from tissuebox import _, not_
+from tissuebox.basic import boolean, divisible, email, gt, integer, lt, null, numeric, string, url
+
+SIZES = {"small": 10, "medium": 1000, "huge": 100000}
+STATES = {"ACT", "NSW", "NT", "QLD", "SA", "TAS", "VIC", "WA"}
+
+
+def broken(i, valid):
+    return not valid and i % 10 == 0
+
+
+def hotel(i, valid):
+    return {
+        "name": "Park Sheraton {}".format(i),
+        "available": True,
+        "price_per_night": "270" if broken(i, valid) else 270,
+        "email": "contact@sheraton.com",
+        "web": "www.sheraton.com",
+        "address": {"street": "128 George St", "city": "Sydney", "state": "NSW", "zip": 2000},
+    }
+
+
+HOTEL = {
+    "name": string,
+    "available": boolean,
+    "price_per_night": integer,
+    "email": email,
+    "web": url,
+    "address": {"street": string, "city": string, "state": string, "zip": integer},
+}
+
+DOTTED = {
+    "name": string,
+    "address.street": string,
+    "address.city": string,
+    "address.state": string,
+    "address.zip": integer,
+    "address.geo.lat": numeric,
+    "address.geo.lng": numeric,
+}
+
+
+def dotted(i, valid):
+    geo = {"lat": -33.86, "lng": None if broken(i, valid) else 151.2}
+    return {"name": "Park Sheraton", "address": {"street": "128 George St", "city": "Sydney", "state": "NSW", "zip": 2000, "geo": geo}}
+
+
+def items(element):
+    """A payload builder for a list of `element(i, valid)`"""
+    return lambda n, valid: [element(i, valid) for i in range(n)]
+
+
+def rooms(n, valid):
+    return {"room{}".format(i): {"price": "x" if broken(i, valid) else 100 + i, "email": "room@sheraton.com"} for i in range(n)}
+
+
+# Each scenario is a schema and a builder of its payload of `n` elements, or keys for the wildcard
+SCENARIOS = {
+    "hotel": ([HOTEL], items(hotel)),
+    "dotted": ([DOTTED], items(dotted)),
+    "enum": ([{"state": STATES}], items(lambda i, valid: {"state": "TX" if broken(i, valid) else "NSW"})),
+    "int_array": ([integer], items(lambda i, valid: "x" if broken(i, valid) else i)),
+    "union": ([{integer, string}], items(lambda i, valid: None if broken(i, valid) else i if i % 2 else str(i))),
+    "chain": ([(integer, gt(0), lt(10 ** 9), divisible(5))], items(lambda i, valid: 7 if broken(i, valid) else 5 * (i + 1))),
+    "wildcard": ({"*": {"price": integer, "email": email}}, rooms),
+    "early_exit": ([_((string, email))], items(lambda i, valid: 42 if broken(i, valid) else "staff{}@sheraton.com".format(i))),
+    "not": ([not_(null)], items(lambda i, valid: None if broken(i, valid) else i)),
+}
+
+
+def payload(scenario, size, valid):
+    return SCENARIOS[scenario][1](SIZES[size], valid)
+
+
+def schema(scenario):
+    return SCENARIOS[scenario][0]
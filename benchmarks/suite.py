@@ -0,0 +1,108 @@
+"""
+Runs the scenarios with both engines and compares the results with a baseline.
+
+A result is keyed "scenario/size/pass|fail/engine" and holds the best time of a validate() call in seconds and, for the
+small size, the allocations and bytes of a call as tissuebox.bench.memory() counts them.
+"""
+import json
+import platform
+import time
+import timeit
+from datetime import datetime, timezone
+
+from benchmarks.scenarios import SCENARIOS, SIZES, payload, schema
+from tissuebox import compile, validate
+from tissuebox.bench import ENGINES, memory
+
+# Time a case for at least this long, in as many calls as that takes
+MIN_TIME = 0.2
+# The best of this many rounds, one only for cases slower than SLOW seconds a call
+ROUNDS = 3
+SLOW = 1.0
+# Sizes allocations are counted at, tracing is too slow for the others
+MEMORY_SIZES = ("small",)
+
+
+def engine(name, schema):
+    if name == "compiled":
+        compiled = compile(schema)
+        return lambda p: compiled.validate(p, [])
+    return lambda p: validate(p, schema, [])
+
+
+def best(f, p):
+    """The best time of a call of `f(p)` in seconds"""
+    start = time.perf_counter()
+    f(p)
+    once = time.perf_counter() - start
+    if once > SLOW:
+        return once
+    number = max(1, int(MIN_TIME / max(once, 1e-7)))
+    return min(timeit.repeat(lambda: f(p), number=number, repeat=ROUNDS)) / number
+
+
+def run(scenarios=None, sizes=None, engines=ENGINES, allocations=True, progress=None):
+    """The results of the scenarios at the sizes with the engines, as saved to JSON"""
+    results = {}
+    for scenario in scenarios or SCENARIOS:
+        s = schema(scenario)
+        for size in sizes or SIZES:
+            for valid in (True, False):
+                p = payload(scenario, size, valid)
+                counted = memory(p, s, number=2, engines=engines) if allocations and size in MEMORY_SIZES else {}
+                for name in engines:
+                    key = "/".join((scenario, size, "pass" if valid else "fail", name))
+                    result = {"seconds": best(engine(name, s), p)}
+                    if name in counted:
+                        result["allocations"] = counted[name]["allocations"]
+                        result["bytes"] = counted[name]["bytes"]
+                    results[key] = result
+                    if progress:
+                        progress(key, result)
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "results": results,
+    }
+
+
+def save(report, path):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(baseline, current, threshold=0.2, allocation_threshold=0.2):
+    """
+    `(key, metric, before, after, change)` for every result of `current` also in `baseline`, and the regressions among
+    them: times more than `threshold` and allocations more than `allocation_threshold` slower or higher, as fractions
+    """
+    rows, regressions = [], []
+    before, after = baseline["results"], current["results"]
+    for key in sorted(set(before) & set(after)):
+        for metric, limit in (("seconds", threshold), ("allocations", allocation_threshold)):
+            if metric not in before[key] or metric not in after[key]:
+                continue
+            b, a = before[key][metric], after[key][metric]
+            change = (a - b) / b if b else 0.0
+            row = (key, metric, b, a, change)
+            rows.append(row)
+            if change > limit:
+                regressions.append(row)
+    return rows, regressions
+
+
+def table(rows, file=None):
+    print("{:<36} {:<12} {:>14} {:>14} {:>8}".format("case", "metric", "before", "after", "change"), file=file)
+    for key, metric, b, a, change in rows:
+        if metric == "seconds":
+            b, a = "{:.2f} us".format(b * 1e6), "{:.2f} us".format(a * 1e6)
+        else:
+            b, a = "{:.1f}".format(b), "{:.1f}".format(a)
+        print("{:<36} {:<12} {:>14} {:>14} {:>+7.1%}".format(key, metric, b, a, change), file=file)
@@ -1,10 +1,31 @@
+import copy
+import io
+import re
+import sys
+import threading
+import time
+import warnings
+from collections import OrderedDict, namedtuple
+from dataclasses import dataclass
+from datetime import datetime, timezone
 from decimal import Decimal
+from types import MappingProxyType
+from typing import List
 from unittest import TestCase
 
 from tissuebox import normalise, sort_unique, is_valid_schema, validate as v, not_
-from tissuebox import validate, _, SchemaError
-from tissuebox.basic import integer, string, numeric, email, url, strong_password, divisible, lt
-from tissuebox.basic import uuid4, gt
+from tissuebox import validate, _, SchemaError, expand, compile, parse, validate_into, Record, tagged, SchemaRouter, ValidationTimeout
+from tissuebox import Sample, validate_patch, ValidatedDict, ValidatedList, Profile, generate
+from tissuebox.basic import integer, string, numeric, boolean, email, url, strong_password, divisible, lt, null
+from tissuebox.basic import uuid4, gt, to_decimal, to_datetime, to_lower, ipv4, ipv6, date, iso8601
+from tissuebox.basic import max_len, max_items, max_keys, max_depth, unique, unique_by, sorted_by, references
+from tissuebox.bench import memory, category, CATEGORIES
+from tissuebox.helpers import error_path
+from tissuebox.metrics import Metrics, prometheus, field_of
+from tissuebox.tracing import Tracer, RecordingTracer
+from benchmarks import parity
+from benchmarks.scenarios import SCENARIOS, payload as scenario_payload, schema as scenario_schema
+from benchmarks.suite import compare, run as run_benchmarks
 
 
 class TestMiscellaneous(TestCase):
@@ -1346,3 +1367,1510 @@ class TestUnderscoreValidation(TestCase):
                 "['user'] ['profile'] ['settings'] ['devices'] [0] ['status'] must be integer (but 'invalid')",
             ],
         )
+
+
+class TestAggregation(TestCase):
+    def test_uniform_failures_collapse(self):
+        payload = ["x"] * 1000
+        errors = []
+        assert not validate(payload, [int], errors, aggregate=True)
+        assert errors == ["[0..999] must be integer (1000 failures, 1 distinct value, first: 'x')"]
+        assert errors[0].group.count == 1000
+
+    def test_expand_matches_plain_validation(self):
+        payload = {"rows": [{"c": "x"}, {"c": "y"}, {"c": 3}, {}, {"c": None}]}
+        schema = {"rows": [{"c": int}]}
+
+        errors = []
+        validate(payload, schema, errors, aggregate=True)
+        assert errors == [
+            "['rows'] [0..1, 4] ['c'] must be integer (3 failures, 3 distinct values, first: 'x')",
+            "['rows'] [3] ['c'] is required",
+            "['rows'][3]['c'] is required",
+        ]
+
+        plain = []
+        validate(payload, schema, plain)
+        assert expand(errors) == plain
+
+    def test_bounded(self):
+        from tissuebox.aggregate import MAX_VALUES
+
+        payload = ["x{}".format(i) for i in range(1000)] + [1, "x0"]
+        errors = []
+        compile([int], aggregate=True).validate(payload, errors)
+        assert errors == ["[0..999, 1001] must be integer (1001 failures, more than {} distinct values, first: 'x0')".format(MAX_VALUES)]
+        group = errors[0].group
+        assert len(group.values) == MAX_VALUES and len(group.runs) == 4
+        expanded = expand(errors)
+        assert len(expanded) == 1001 and "[1001] must be integer (but 'x0')" in expanded
+        assert "[999] must be integer (but ...)" in expanded and "[99] must be integer (but 'x99')" in expanded
+
+    def test_nested_lists(self):
+        payload = [["a", "b"], ["c"], [1]]
+        errors = []
+        validate(payload, [[int]], errors, aggregate=True)
+        assert errors == ["[0] [0..1] must be integer (2 failures, 2 distinct values, first: 'a')", "[1] [0] must be integer (but 'c')"]
+
+        plain = []
+        validate(payload, [[int]], plain)
+        assert expand(errors) == plain
+
+
+class TestCompiledSchema(TestCase):
+    def test_same_answers_as_validate(self):
+        schema = {"name": str, "[kids].name": str, "[kids].age": int, "tags": [{int, str}], "price": (integer, divisible(5))}
+        payloads = [
+            {"name": "Roger", "kids": [{"name": "Billy", "age": 10}], "tags": [1, "a"], "price": 25},
+            {"name": 5, "kids": [{"name": "Billy"}, {"age": "10"}], "tags": [1.5], "price": 23},
+            {"kids": {}, "tags": "x"},
+            [],
+        ]
+        compiled = compile(schema)
+        for payload in payloads:
+            expected, errors = [], []
+            assert compiled.validate(payload, errors) == validate(payload, schema, expected)
+            assert errors == expected
+            assert compiled.validate(payload) == validate(payload, schema)
+
+    def test_validate_accepts_compiled_schema(self):
+        compiled = compile({"name": str})
+        errors = []
+        assert not validate({"name": 1}, compiled, errors)
+        assert errors == ["['name'] must be string (but 1)"]
+        with self.assertRaises(ValueError):
+            validate({"name": 1}, compiled, aggregate=True)
+        with self.assertRaises(ValueError):
+            validate({"name": 1}, compiled, field_path=["root"])
+        assert validate({"name": 1}, compile(compiled.schema, aggregate=True)) is False
+
+    def test_invalid_schema(self):
+        self.assertRaises(SchemaError, compile, {"config": {"*": str, "version": int}})
+
+
+class TestParse(TestCase):
+    def test_coercing_tissues(self):
+        schema = {
+            "price": (to_decimal, gt(0)),
+            "at": to_datetime,
+            "email": (email, to_lower),
+            "[items].qty": to_decimal,
+        }
+        payload = {"price": "9.90", "at": "2024-01-02T03:04:05Z", "email": "Bob@Example.com", "items": [{"qty": "2"}], "note": "hi"}
+
+        parsed = parse(payload, schema)
+        assert parsed == {
+            "price": Decimal("9.90"),
+            "at": datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+            "email": "bob@example.com",
+            "items": [{"qty": Decimal("2")}],
+            "note": "hi",
+        }
+
+        # The original payload is left untouched
+        assert payload["price"] == "9.90"
+        assert payload["items"] == [{"qty": "2"}]
+
+    def test_errors(self):
+        schema = {"price": (to_decimal, gt(0)), "[items].qty": to_decimal}
+
+        errors = []
+        assert parse({"price": "abc", "items": [{"qty": "2"}, {"qty": None}]}, schema, errors) is None
+        assert errors == ["['items'] [1] ['qty'] must be decimal (but None)", "['price'] must be decimal (but 'abc')"]
+
+        errors = []
+        assert parse({"price": "-1", "items": []}, schema, errors) is None
+        assert errors == ["['price'] must be greater than 0 (but -1)"]
+
+    def test_compiled_once(self):
+        from tissuebox.compiler import cached
+
+        schema = {"price": (to_decimal, gt(0)), "[items].qty": to_decimal}
+        assert parse({"price": "1", "items": []}, schema) == {"price": Decimal("1"), "items": []}
+        assert cached(schema) is cached(schema)
+        assert cached(copy.deepcopy(schema)) is cached(schema)
+        assert cached({1: integer}) is not cached({True: integer})
+        assert cached({"price": (to_decimal, gt(1))}) is not cached({"price": (to_decimal, gt(1))})
+
+    def test_compile_compiled(self):
+        compiled = compile({"name": string})
+        assert compile(compiled) is compiled
+        with self.assertRaises(ValueError):
+            compile(compiled, extra="forbid")
+        with self.assertRaises(ValueError):
+            compile(compiled, max_len=10)
+
+    def test_validate_pipes_coerced_values(self):
+        errors = []
+        assert not validate({"price": "-1"}, {"price": (to_decimal, gt(0))}, errors)
+        assert errors == ["['price'] must be greater than 0 (but -1)"]
+        assert validate("5", (to_decimal, lt(10)))
+
+
+class TestCompileOptions(TestCase):
+    schema = {"name": str, "address.city": str, "address.country": str, "[kids].grade": int, "meta": {"*": int}}
+    payload = {"name": "Roger", "address": {"city": "Sydney", "zip": 2000}, "kids": [{}, {"grade": 3, "x": 1}], "meta": {"a": 1}, "debug": True}
+
+    def test_defaults(self):
+        compiled = compile(self.schema, defaults={"address.country": "AU", "[kids].grade": 1})
+
+        assert compiled.validate(self.payload)
+        assert compiled.parse(self.payload) == {
+            "name": "Roger",
+            "address": {"city": "Sydney", "zip": 2000, "country": "AU"},
+            "kids": [{"grade": 1}, {"grade": 3, "x": 1}],
+            "meta": {"a": 1},
+            "debug": True,
+        }
+        assert "country" not in self.payload["address"]
+
+    def test_invalid_defaults(self):
+        self.assertRaises(SchemaError, compile, self.schema, defaults={"address.country": 61})
+        self.assertRaises(SchemaError, compile, self.schema, defaults={"address.state": "NSW"})
+
+    def test_strip(self):
+        compiled = compile(self.schema, defaults={"address.country": "AU", "[kids].grade": 1}, extra="strip")
+        assert compiled.parse(self.payload) == {
+            "name": "Roger",
+            "address": {"city": "Sydney", "country": "AU"},
+            "kids": [{"grade": 1}, {"grade": 3}],
+            "meta": {"a": 1},
+        }
+
+    def test_forbid(self):
+        compiled = compile(self.schema, defaults={"address.country": "AU", "[kids].grade": 1}, extra="forbid")
+        errors = []
+        assert not compiled.validate(self.payload, errors)
+        assert errors == ["['address'] ['zip'] is not allowed", "['debug'] is not allowed", "['kids'] [1] ['x'] is not allowed"]
+        assert not compiled.validate(self.payload)
+
+        # Wildcard dicts accept any key
+        assert compiled.validate({"name": "Roger", "address": {"city": "Sydney"}, "kids": [], "meta": {"b": 2, "c": 3}})
+
+    def test_unknown_extra(self):
+        self.assertRaises(SchemaError, compile, self.schema, extra="allow")
+
+
+class TestValidateInto(TestCase):
+    def test_same_class(self):
+        schema = {"name": str, "address.city": str, "[staffs].name": str}
+        payload = {"name": "Park Sheraton", "address": {"city": "Sydney"}, "staffs": [{"name": "Roger"}]}
+        x, y = validate_into(payload, schema), validate_into(payload, schema)
+        assert type(x) is type(y) and type(x.address) is type(y.address)
+        assert x == y
+
+    def test_non_ascii_keys(self):
+        schema = {"a²": int, "ﬁ": int, "fi": int, "名前": {"x": int}, "1x": int}
+        record = validate_into({"a²": 1, "ﬁ": 2, "fi": 3, "名前": {"x": 4}, "1x": 5}, schema)
+        assert all(f.isascii() and f.isidentifier() for f in record._fields)
+        assert [record[k] for k in ["a²", "ﬁ", "fi", "1x"]] == [1, 2, 3, 5] and record["名前"].x == 4
+        assert record._asdict()["fi"] == 3 and record.fi == 3
+
+    schema = {"id": int, "first-name": str, "price": to_decimal, "address.city": str, "[tags].label": str, "meta": {"*": int}}
+
+    def test_records(self):
+        payload = {"id": 1, "first-name": "Roger", "price": "1.5", "address": {"city": "Sydney"}, "tags": [{"label": "a"}], "meta": {"a": 1}}
+        record = validate_into(payload, self.schema)
+
+        assert isinstance(record, Record)
+        assert record.id == 1
+        assert record.first_name == "Roger"
+        assert record["first-name"] == "Roger"
+        assert record.price == Decimal("1.5")
+        assert record.address.city == "Sydney"
+        assert type(record.tags) is tuple and record.tags[0].label == "a"
+        assert record.meta == {"a": 1}
+        assert not hasattr(record, "__dict__")
+
+    def test_records_are_shared_per_schema_node(self):
+        compiled = compile([self.schema], defaults={"price": 0})
+        rows = compiled.validate_into([{"id": i, "first-name": "x", "address": {"city": "y"}, "tags": [], "meta": {}} for i in range(3)])
+        assert len({type(r) for r in rows}) == 1
+        assert [r.id for r in rows] == [0, 1, 2]
+        assert rows[0].price == 0
+
+    def test_errors(self):
+        errors = []
+        assert validate_into({"id": "1", "first-name": "x", "price": "y", "address": {}, "tags": [], "meta": {}}, self.schema, errors) is None
+        assert errors == [
+            "['address'] ['city'] is required",
+            "['address']['city'] is required",
+            "['id'] must be integer (but '1')",
+            "['price'] must be decimal (but 'y')",
+        ]
+
+
+@dataclass
+class Address:
+    city: str
+    zip: int
+
+
+@dataclass
+class Person:
+    name: str
+    address: Address
+    kids: List[str]
+
+
+Point = namedtuple("Point", "x y")
+
+
+class Slotted:
+    __slots__ = ("name", "age")
+
+    def __init__(self, name, age):
+        self.name = name
+        self.age = age
+
+
+class TestAccess(TestCase):
+    schema = {"name": str, "address.city": str, "address.zip": int, "kids": [str]}
+
+    def test_dict_is_the_default(self):
+        payload = MappingProxyType({"name": "Roger", "address": {"city": "Sydney", "zip": 2000}, "kids": ["Bob"]})
+        errors = []
+        assert not compile(self.schema).validate(payload, errors)
+        assert errors == ["must be dict"]
+
+    def test_dataclass(self):
+        compiled = compile(self.schema, access="attr")
+        assert compiled.validate(Person("Roger", Address("Sydney", 2000), ["Bob"]))
+        assert compiled.validate(Person("Roger", Address("Sydney", 2000), ("Bob",)))
+
+        person = Person(1, Address("Sydney", "2000"), ["Bob", 2])
+        as_dict = {"name": 1, "address": {"city": "Sydney", "zip": "2000"}, "kids": ["Bob", 2]}
+        errors, expected = [], []
+        assert not compiled.validate(person, errors)
+        assert not validate(as_dict, self.schema, expected)
+        assert errors == expected
+        assert not compiled.validate(person)
+
+    def test_missing_attributes_are_required(self):
+        errors = []
+        assert not compile({"x": int, "y": int, "z": int}, access="attr").validate(Point(1, "2"), errors)
+        assert errors == ["['y'] must be integer (but '2')", "['z'] is required"]
+
+    def test_slots(self):
+        compiled = compile({"name": str, "age": int}, access="attr", extra="forbid")
+        assert compiled.validate(Slotted("Roger", 30))
+        errors = []
+        assert not compiled.validate(Slotted("Roger", "30"), errors)
+        assert errors == ["['age'] must be integer (but '30')"]
+
+    def test_mapping(self):
+        compiled = compile(self.schema, access="mapping")
+        payload = {"name": "Roger", "address": {"city": "Sydney", "zip": 2000}, "kids": ["Bob"]}
+        assert compiled.validate(MappingProxyType(payload))
+        assert compiled.validate(OrderedDict(payload))
+        assert not compiled.validate(Person("Roger", Address("Sydney", 2000), ["Bob"]))
+
+        errors = []
+        assert not compiled.validate(MappingProxyType({"name": "Roger", "kids": "Bob"}), errors)
+        assert errors == ["['address'] is required", "['kids'] must be list"]
+
+    def test_auto(self):
+        compiled = compile(self.schema, access="auto")
+        assert compiled.validate(Person("Roger", MappingProxyType({"city": "Sydney", "zip": 2000}), ["Bob"]))
+        assert compiled.parse(Person("Roger", Address("Sydney", 2000), ("Bob",))) == {"name": "Roger", "address": {"city": "Sydney", "zip": 2000}, "kids": ["Bob"]}
+
+    def test_strings_are_not_lists(self):
+        assert not compile([str], access="auto").validate("abc")
+        assert compile([str], access="auto").validate(("a", "b"))
+
+    def test_invalid_mode(self):
+        with self.assertRaises(SchemaError):
+            compile({"name": str}, access="objects")
+
+
+class TestTagged(TestCase):
+    event = tagged("type", {"click": {"x": int, "y": int}, "view": {"page": str}, "buy": {"type": str, "amount": (numeric, gt(0))}})
+
+    def errors(self, payload, schema):
+        interpreted, compiled = [], []
+        validate(payload, schema, interpreted)
+        compile(schema).validate(payload, compiled)
+        assert interpreted == compiled
+        return interpreted
+
+    def test_valid(self):
+        for payload in [{"type": "click", "x": 1, "y": 2}, {"type": "view", "page": "home"}, {"type": "buy", "amount": 5}]:
+            assert validate(payload, self.event)
+            assert compile(self.event).validate(payload)
+
+    def test_only_the_matching_branch_reports(self):
+        assert self.errors({"type": "click", "x": 1, "y": "2"}, self.event) == ["['y'] must be integer (but '2')"]
+        assert self.errors({"type": "view"}, self.event) == ["['page'] is required"]
+
+    def test_unknown_and_missing_tags(self):
+        assert self.errors({"type": "scroll"}, self.event) == ["['type'] must be one of 'buy', 'click', 'view' (but 'scroll')"]
+        assert self.errors({"type": ["click"]}, self.event) == ["['type'] must be one of 'buy', 'click', 'view' (but ['click'])"]
+        assert self.errors({"x": 1}, self.event) == ["['type'] is required"]
+        assert self.errors(5, self.event) == ["must be dict"]
+
+    def test_nested(self):
+        schema = {"events": [self.event], "source": {self.event, None}}
+        payload = {"events": [{"type": "view", "page": "a"}, {"type": "click", "x": 1}], "source": None}
+        assert self.errors(payload, schema) == ["['events'] [1] ['y'] is required"]
+        assert not compile(schema).validate(payload)
+
+    def test_invalid_branch(self):
+        assert not is_valid_schema(tagged("type", {"a": {"x": object()}}))
+        with self.assertRaises(SchemaError):
+            compile(tagged("type", {"a": {"x": object()}}))
+
+    def test_tag_survives_extra(self):
+        assert compile(self.event, extra="strip").parse({"type": "view", "page": "a", "junk": 1}) == {"type": "view", "page": "a"}
+        assert compile(self.event, extra="forbid").validate({"type": "view", "page": "a"})
+        assert validate_into({"type": "click", "x": 1, "y": 2}, self.event).type == "click"
+
+
+class TestSchemaRouter(TestCase):
+    def setUp(self):
+        self.router = SchemaRouter()
+        self.router.add("click", {"kind": "click", "x": int, "y": int})
+        self.router.add("view", {"kind": {"view", "visit"}, "page": str})
+        self.router.add("user", {"id": int, "name": str, "address.city": str})
+        self.router.add("order", tagged("kind", {"buy": {"amount": int}, "refund": {"amount": int, "reason": str}}))
+        self.router.add("anything", {"*": int})
+
+    def test_candidates(self):
+        assert self.router.candidates({"kind": "click", "x": 1, "y": "2"}) == ["click", "anything"]
+        assert self.router.candidates({"kind": "visit", "page": "home", "x": 1}) == ["view", "anything"]
+        assert self.router.candidates({"kind": "refund", "amount": 1}) == ["order", "anything"]
+        assert self.router.candidates({"id": 1, "name": "Roger", "address": "x"}) == ["user", "anything"]
+        assert self.router.candidates({"kind": ["click"], "x": 1, "y": 2}) == ["anything"]
+        assert self.router.candidates(5) == ["click", "view", "user", "order", "anything"]
+
+    def test_match(self):
+        assert self.router.match({"kind": "click", "x": 1, "y": 2}) == ["click"]
+        assert self.router.match({"x": 1, "y": 2}) == ["anything"]
+        assert self.router.match({"kind": "click", "x": 1, "y": "2"}) == []
+        assert self.router.match({"kind": "refund", "amount": 1, "reason": "broken"}) == ["order"]
+        assert self.router.match({"id": 1, "name": "Roger", "address": {"city": "Sydney"}}) == ["user"]
+
+    def test_optional_fields_are_not_required(self):
+        router = SchemaRouter()
+        router.add("a", compile({"kind": "a", "page": str}, defaults={"page": "home"}))
+        assert router.match({"kind": "a"}) == ["a"]
+
+    def test_names_are_unique(self):
+        assert "click" in self.router and len(self.router) == 5
+        with self.assertRaises(SchemaError):
+            self.router.add("click", {"x": int})
+
+
+class TestConstraintFusion(TestCase):
+    def test_bounds_are_exposed(self):
+        assert lt(5).less_than == 5
+        assert gt(0).greater_than == 0
+        assert divisible(3).multiple_of == 3
+
+    def test_same_messages(self):
+        schema = {"qty": (integer, gt(0), lt(100), divisible(5))}
+        for value in [5, 95, 0, 100, 7, 2.5, -3, True, "a", 10.0]:
+            interpreted, compiled = [], []
+            try:
+                validate({"qty": value}, schema, interpreted)
+            except TypeError:
+                with self.assertRaises(TypeError):
+                    compile(schema).validate({"qty": value}, compiled)
+                continue
+            compile(schema).validate({"qty": value}, compiled)
+            assert interpreted == compiled
+            assert compile(schema).validate({"qty": value}) == (not interpreted)
+
+    def test_implied_bounds(self):
+        compiled = compile((numeric, gt(0), gt(10), lt(50), lt(20), divisible(2), divisible(4)))
+        assert (compiled.root.lower, compiled.root.upper, compiled.root.steps) == (10, 20, [4])
+        assert compiled.validate(12) and compiled.validate(16.0)
+        errors = []
+        assert not compiled.validate(6, errors)
+        assert errors == ["must be greater than 10 (but 6)", "must be multiple of 4 (but 6)"]
+
+    def test_contradictions(self):
+        for schema in [(gt(10), lt(5)), (integer, gt(4), lt(5)), (integer, gt(10), lt(20), divisible(25))]:
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter("always")
+                compile(schema)
+            assert len(caught) == 1 and "No value can be" in str(caught[0].message)
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            compile((numeric, gt(4), lt(5)))
+            compile((integer, gt(10), lt(20), divisible(5)))
+
+
+class TestOrdering(TestCase):
+    def tracked(self, name, cost=None, safe=True):
+        def f(x, field=None):
+            self.calls.append(name)
+            return isinstance(x, str)
+
+        f.msg = name
+        if cost is not None:
+            f.cost = cost
+        if safe:
+            f.is_safe = True
+        return f
+
+    def setUp(self):
+        self.calls = []
+
+    def test_cheapest_first(self):
+        compiled = compile((self.tracked("slow", 50), self.tracked("default"), self.tracked("fast", 1)))
+        assert not compiled.validate(5)
+        assert self.calls == ["fast"]
+
+        self.calls = []
+        errors = []
+        assert not compiled.validate(5, errors)
+        assert self.calls == ["slow", "default", "fast"]
+        assert errors == ["must be default (but 5)", "must be fast (but 5)", "must be slow (but 5)"]
+
+    def test_unsafe_always_run(self):
+        chain = (self.tracked("slow", 50, safe=False), self.tracked("default"), self.tracked("fast", 1, safe=False))
+        assert not compile(chain).validate(5)
+        assert self.calls == ["default", "slow", "fast"]
+
+        self.calls = []
+        union = {self.tracked("a", safe=False), self.tracked("b")}
+        assert compile(union).validate("x")
+        assert sorted(self.calls) == ["a", "b"]
+
+    def test_coercing_chains_keep_their_order(self):
+        compiled = compile((to_decimal, gt(0)))
+        assert compiled.validate("1.5")
+        assert not compiled.validate("x")
+
+    def test_exceptions_as_interpreted(self):
+        # The interpreter runs every member of a chain and every alternative of a union, a tissue which raises does so
+        # whether or not a cheaper one already decided. Dicts and lists go on past a failing value to the ones which raise
+        cases = [((email, gt(0)), "not an email"), ((integer, lt(5)), "x"), ({string, lt(5)}, "x")]
+        cases += [({"f0": integer, "f1": lt(5)}, {"f0": "x", "f1": "y"}), ([lt(5)], [10, "y"]), ({"*": lt(5)}, {"a": 10, "b": "y"})]
+        cases += [({"f0": integer, "[f1]": {"a": lt(5)}}, {"f0": "x", "f1": [{"a": "y"}]}), ([{"a": integer}], [{}, {"a": 1}, 5])]
+        for schema, payload in cases:
+            with self.assertRaises(TypeError):
+                validate(payload, schema)
+            with self.assertRaises(TypeError):
+                compile(schema).validate(payload)
+            with self.assertRaises(TypeError):
+                compile(schema).validate(payload, [])
+        # Required fields make a dict unsafe, check_required() raises on some payloads which aren't dicts
+        assert compile([integer]).root.safe and compile({"*": integer}).root.safe
+        assert not compile({"a": integer}).root.safe and not compile([lt(5)]).root.safe
+
+    def test_adaptive_unions(self):
+        compiled = compile({integer, string, None})
+        union = compiled.root
+        for _ in range(1000):
+            assert compiled.validate(None)
+        assert union.ordered[0].tissue is null
+        for _ in range(3000):
+            assert compiled.validate("a")
+        assert union.ordered[0].tissue is string
+
+        errors = []
+        assert not compiled.validate(1.5, errors)
+        assert errors == [" must be either integer, null or string (but 1.5)"]
+
+
+class TestPatternKeys(TestCase):
+    schema = {"host": str, re.compile("^x-"): str, re.compile("^[a-z]{2}$"): {"*": str}}
+
+    def errors(self, payload, schema, **options):
+        interpreted, compiled = [], []
+        validate(payload, schema, interpreted)
+        compile(schema, **options).validate(payload, compiled)
+        if not options:
+            assert interpreted == compiled
+        return compiled
+
+    def test_valid(self):
+        payload = {"host": "example.com", "x-id": "1", "en": {"hello": "Hello"}, "fr": {"hello": "Bonjour"}, "Other": 5}
+        assert validate(payload, self.schema)
+        assert compile(self.schema).validate(payload)
+
+    def test_errors(self):
+        payload = {"host": "example.com", "x-id": 1, "en": {"hello": 1}, "eng": 5}
+        assert self.errors(payload, self.schema) == ["['en'] ['hello'] must be string (but 1)", "['x-id'] must be string (but 1)"]
+
+    def test_first_pattern_wins(self):
+        schema = {re.compile("^x"): str, re.compile("^x-"): int}
+        assert self.errors({"x-id": "1"}, schema) == []
+        assert self.errors({"x-id": 1}, schema) == ["['x-id'] must be string (but 1)"]
+
+    def test_pattern_keys_are_not_required(self):
+        assert self.errors({}, {"name": str, re.compile("^x-"): str}) == ["['name'] is required"]
+
+    def test_extra(self):
+        payload = {"host": "example.com", "x-id": "1", "other": 1}
+        assert self.errors(payload, self.schema, extra="forbid") == ["['other'] is not allowed"]
+        assert compile(self.schema, extra="strip").parse(payload) == {"host": "example.com", "x-id": "1"}
+
+    def test_combined(self):
+        assert compile(self.schema).root.patterns.combined is not None
+        # Backreferences would point at the wrong group once merged
+        schema = {re.compile(r"(.)\1"): int, re.compile("^x"): str}
+        assert compile(schema).root.patterns.combined is None
+        assert self.errors({"aa": "1", "xy": 1}, schema) == ["['aa'] must be integer (but '1')", "['xy'] must be string (but 1)"]
+        schema = {re.compile("^x", re.I): str, re.compile("^y"): str}
+        assert compile(schema).root.patterns.combined is None
+        assert self.errors({"X-a": 1, "Y": 1}, schema) == ["['X-a'] must be string (but 1)"]
+
+
+class TestFormats(TestCase):
+    def test_ipv4(self):
+        for x in ["1.2.3.4", "0.0.0.0", "255.255.255.255"]:
+            assert ipv4(x)
+        for x in ["256.1.1.1", "01.2.3.4", "1.2.3", "1.2.3.4.5", " 1.2.3.4", "1.2.3.\u0664", 1234]:
+            assert not ipv4(x)
+
+    def test_ipv6(self):
+        for x in ["::1", "::", "2001:db8::ff00:42:8329", "::ffff:1.2.3.4"]:
+            assert ipv6(x)
+        for x in ["1::2::3", "12345::", "fe80::1%eth0", "g::1", "1.2.3.4", None]:
+            assert not ipv6(x)
+
+    def test_date(self):
+        assert date("2024-02-29")
+        for x in ["2023-02-29", "2024-13-01", "2024-1-01", "2024-01-01T00:00", 20240101]:
+            assert not date(x)
+
+    def test_iso8601(self):
+        for x in ["2024-01-01T10:00", "2024-01-01T10:00:00Z", "2024-01-01 10:00:00.123456+05:30"]:
+            assert iso8601(x)
+        for x in ["2024-01-01T25:00", "2024-01-01T10:00+24:00", "2024-01-01", "2024-01-01T10:00:00.1234567", "2024-02-30T10:00"]:
+            assert not iso8601(x)
+        errors = []
+        assert not validate({"at": "yesterday"}, {"at": iso8601}, errors)
+        assert errors == ["['at'] must be an iso 8601 datetime (but 'yesterday')"]
+
+    def test_url(self):
+        for x in ["http://e.xy", "https://www.example.com/path", "www.abc.de", "http://a-b.cd ef"]:
+            assert url(x)
+        for x in ["http://ab.cd", "http://-ab.cd", "http://ab-.cd", "http://wwwx.com", "www.abc.d", "www.abc. d", "ftp://abc.de"]:
+            assert not url(x)
+
+
+class TestReDoS(TestCase):
+    """Hostile 1MB inputs must be rejected or accepted in linear time"""
+
+    MB = 2**20
+
+    def assert_fast(self, f, x):
+        start = time.perf_counter()
+        f(x)
+        assert time.perf_counter() - start < 0.5, (f.msg, x[:20])
+
+    def test_hostile_inputs(self):
+        a = "a" * self.MB
+        for x in [a, "http://" + a, "https://www." + a + ".", "www." + "a-" * (self.MB // 2), "http://" + "a." * (self.MB // 2), "http://a." + " " * self.MB]:
+            self.assert_fast(url, x)
+        for x in [a + "@", "a@" + "a." * (self.MB // 2) + "!", "a@" + a, "." * self.MB + "@a.a!", a + "@" + a + "." + a + "\u00e9"]:
+            self.assert_fast(email, x)
+        for f in [uuid4, ipv4, ipv6, date, iso8601]:
+            for x in [a, "1" * self.MB, ":" * self.MB, "2024-01-01T" + "0" * self.MB]:
+                self.assert_fast(f, x)
+
+    def test_hostile_payloads(self):
+        schema = {"links": [url], "contact": email}
+        payload = {"links": ["http://" + "a" * 1024] * 1024, "contact": "a" * self.MB}
+        start = time.perf_counter()
+        assert not compile(schema).validate(payload, [])
+        assert time.perf_counter() - start < 1
+
+
+class TestGuards(TestCase):
+    schema = {"email": (email, max_len(254)), "ids": (max_items(3), [integer]), "meta": (max_keys(2), {"*": integer}), "tree": max_depth(2)}
+
+    def errors(self, payload, schema):
+        interpreted, compiled = [], []
+        validate(payload, schema, interpreted)
+        compile(schema).validate(payload, compiled)
+        assert interpreted == compiled
+        assert compile(schema).validate(payload) is not bool(compiled)
+        return compiled
+
+    def test_within_limits(self):
+        assert self.errors({"email": "roger@example.com", "ids": [1, 2], "meta": {"a": 1}, "tree": [[1]]}, self.schema) == []
+
+    def test_guards_stop_the_chain(self):
+        payload = {"email": "a" * 10**7, "ids": ["x"] * 10**6, "meta": {"a": 1, "b": 2, "c": "x"}, "tree": [[[1]]]}
+        start = time.perf_counter()
+        assert self.errors(payload, self.schema) == [
+            "['email'] must be at most 254 characters long (but 10000000)",
+            "['ids'] must have at most 3 items (but 1000000)",
+            "['meta'] must have at most 2 keys (but 3)",
+            "['tree'] must be nested at most 2 levels deep",
+        ]
+        assert time.perf_counter() - start < 0.5
+
+    def test_other_members_still_run(self):
+        assert self.errors({"ids": [1, "2"]}, {"ids": (max_items(3), [integer])}) == ["['ids'] [1] must be integer (but '2')"]
+
+    def test_in_unions(self):
+        assert self.errors("abc", {max_len(2), integer}) == [" must be either at most 2 characters long or integer (but abc)"]
+
+
+class TestLimits(TestCase):
+    schema = {"name": str, "tags": [str], "[items].id": integer, "meta": {"a": {"b": integer}}}
+
+    def test_within_limits(self):
+        compiled = compile(self.schema, max_len=5, max_items=2, max_keys=4, max_depth=3)
+        payload = {"name": "Roger", "tags": ["a"], "items": [{"id": 1}], "meta": {"a": {"b": 1}}}
+        assert compiled.validate(payload)
+        assert compiled.validate(payload, []) and compiled.parse(payload) == payload
+
+    def test_exceeded(self):
+        compiled = compile(self.schema, max_len=5, max_items=2, max_keys=4, max_depth=2)
+        payload = {"name": "Roger Federer", "tags": ["a", "abcdefgh"], "items": [{}, {}, {}], "meta": {"a": {"b": 1}}}
+        errors = []
+        assert not compiled.validate(payload, errors)
+        assert errors == [
+            "['items'] must have at most 2 items (but 3)",
+            "['meta'] ['a'] must be nested at most 2 levels deep",
+            "['name'] must be at most 5 characters long (but 13)",
+            "['tags'] [1] must be at most 5 characters long (but 8)",
+        ]
+        assert not compiled.validate(payload)
+
+        errors = []
+        assert not compile({"*": integer}, max_keys=2).validate({"a": 1, "b": 2, "c": 3}, errors)
+        assert errors == ["must have at most 2 keys (but 3)"]
+
+    def test_invalid_limits(self):
+        for limits in [{"max_len": -1}, {"max_items": "10"}, {"max_depth": 1.5}]:
+            with self.assertRaises(SchemaError):
+                compile({"name": str}, **limits)
+
+
+def slow(x, field=None):
+    time.sleep(0.002)
+    return True
+
+
+slow.msg = "slow"
+
+
+class TestDeadline(TestCase):
+    schema = {"orders": [{"id": integer, "email": (email, slow)}], "meta": {"*": integer}}
+    payload = {"orders": [{"id": i, "email": "a@b.co"} for i in range(200)], "meta": {"a": 1}}
+
+    def engines(self):
+        return [lambda p, s, **kw: validate(p, s, **kw), lambda p, s, **kw: compile(s).validate(p, **kw)]
+
+    def test_within_deadline(self):
+        payload = {"orders": [{"id": "1", "email": "a@b.co"}], "meta": {"a": "b"}}
+        for run in self.engines():
+            errors = []
+            assert not run(payload, self.schema, errors=errors, deadline=10)
+            assert errors == ["['meta'] ['a'] must be integer (but 'b')", "['orders'] [0] ['id'] must be integer (but '1')"]
+            assert run({"orders": self.payload["orders"][:3], "meta": {}}, self.schema, deadline=10)
+
+    def test_timeout(self):
+        for run in self.engines():
+            for errors in [None, []]:
+                with self.assertRaises(ValidationTimeout) as raised:
+                    run(self.payload, self.schema, errors=errors, deadline=0.02)
+                e = raised.exception
+                assert re.fullmatch(r"\['orders'\] \[\d+\]( \['(id|email)'\])?", e.path)
+                assert 0 < e.checked < 200 and e.visited > e.checked
+                assert e.elapsed >= 0.02 and e.deadline == 0.02
+                field, tissue, seconds = e.spent[0]
+                assert (field, tissue) == ("['orders'] [*] ['email']", "slow")
+
+    def test_wildcard_loops(self):
+        payload = {"meta": {str(i): i for i in range(100000)}}
+        for run in self.engines():
+            with self.assertRaises(ValidationTimeout) as raised:
+                run(payload, {"meta": {"*": integer}}, deadline=0.001)
+            assert raised.exception.path.startswith("['meta'] ['")
+            assert raised.exception.checked < 100000
+
+
+class TestSample(TestCase):
+    def run_both(self, payload, schema, sample, **kwargs):
+        interpreted, compiled = [], []
+        validate(payload, schema, interpreted, sample=sample, **kwargs)
+        compile(schema, **kwargs).validate(payload, compiled, sample=sample)
+        assert interpreted == compiled
+        return compiled
+
+    def test_short_lists_in_full(self):
+        sample = Sample(n=5, edges=2)
+        assert self.run_both([1, 2, "3", 4], [integer], sample) == ["[2] must be integer (but '3')"]
+        assert (sample.lists, sample.total, sample.checked, sample.coverage) == (2, 8, 8, 1.0)
+
+    def test_edges_and_sample(self):
+        rows = list(range(10000))
+        rows[1] = rows[-1] = "x"
+        sample = Sample(n=100, edges=5, seed=7)
+        errors = self.run_both({"rows": rows}, {"rows": [integer]}, sample)
+        assert errors == ["['rows'] [1] must be integer (but 'x')", "['rows'] [9999] must be integer (but 'x')"]
+        assert sample.checked == 2 * 110 and sample.total == 2 * 10000
+        assert abs(sample.coverage - 0.011) < 1e-9
+
+    def test_seeded(self):
+        picked = [list(Sample(n=50, edges=0, seed=seed).indices(10000)) for seed in (1, 1, 2)]
+        assert picked[0] == picked[1] != picked[2]
+        assert picked[0] == sorted(picked[0]) and len(set(picked[0])) == 50
+
+        rows = ["x"] * 10000
+        errors = self.run_both(rows, [integer], Sample(n=50, edges=0, seed=1))
+        assert errors == sorted("[{}] must be integer (but 'x')".format(i) for i in picked[0])
+
+    def test_aggregate(self):
+        errors = self.run_both(["x"] * 10000, [integer], Sample(n=10, edges=3), aggregate=True)
+        assert len(errors) == 1 and errors[0].group.count == 16
+
+    def test_check_and_without_sample(self):
+        rows = list(range(10000))
+        rows[5000] = "x"
+        compiled = compile([integer])
+        assert compiled.validate(rows, sample=Sample(n=10, edges=10))
+        assert not compiled.validate(rows) and not compiled.validate(rows, sample=Sample(n=0, edges=5000))
+
+    def test_invalid(self):
+        for kwargs in [{"n": -1}, {"edges": 1.5}]:
+            with self.assertRaises(ValueError):
+                Sample(**kwargs)
+
+
+class TestProjection(TestCase):
+    schema = {"name": str, "address.city": str, "address.zip": integer, "[staffs].name": str, "[staffs].email": email}
+    payload = {"address": {"city": 1, "zip": "x"}, "staffs": [{"name": 2, "email": "x"}]}
+
+    def errors(self, payload, **kwargs):
+        interpreted, compiled = [], []
+        validate(payload, self.schema, interpreted, **kwargs)
+        compile(self.schema).validate(payload, compiled, **kwargs)
+        assert interpreted == compiled
+        assert compile(self.schema).validate(payload, **kwargs) is not bool(compiled)
+        return compiled
+
+    def test_only(self):
+        assert self.errors(self.payload, only=["address.city", "staffs"]) == [
+            "['address'] ['city'] must be string (but 1)",
+            "['staffs'] [0] ['email'] must be a valid email (but 'x')",
+            "['staffs'] [0] ['name'] must be string (but 2)",
+        ]
+        assert self.errors(self.payload, only=["[staffs].email"]) == ["['staffs'] [0] ['email'] must be a valid email (but 'x')"]
+        assert self.errors({}, only=["address.city"]) == ["['address'] is required"]
+        assert self.errors({"address": {"city": "Basel"}}, only=["address.city"]) == []
+
+    def test_exclude(self):
+        assert self.errors(self.payload, exclude=["address", "staffs.name"]) == [
+            "['name'] is required",
+            "['staffs'] [0] ['email'] must be a valid email (but 'x')",
+        ]
+        assert self.errors(self.payload, only=["address"], exclude=["address.zip"]) == ["['address'] ['city'] must be string (but 1)"]
+
+    def test_cached(self):
+        compiled = compile(self.schema)
+        assert compiled.projection(["staffs", "name"]) is compiled.projection(("name", "staffs"))
+        assert compiled.projection(["name"]) is not compiled.projection(exclude=["name"])
+        assert compiled.projection(["name"]).validate({"name": "Roger"})
+
+    def test_cached_interpreted(self):
+        from tissuebox.projection import projected
+
+        assert projected(self.schema, ["staffs", "name"]) is projected(dict(self.schema), ("name", "staffs"))
+        assert projected(self.schema, ["name"]) is not projected(self.schema, exclude=["name"])
+        assert projected({"tags": {1, 2}, "name": str}, ["name"]) == {"name": str}
+
+    def test_cached_across_threads(self):
+        import tissuebox.compiler
+        import tissuebox.projection
+
+        compiled, seen = compile(self.schema), []
+
+        def work(start):
+            for i in range(start, start + 300):
+                seen.append(compiled.projection(exclude=["name"] * (i % 5) + ["address.zip"] * i))
+                validate({}, self.schema, exclude=["name"] * (i % 7 + 1) + ["address.zip"] * i)
+
+        threads = [threading.Thread(target=work, args=(i * 50,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(seen) == 1200
+        assert len(compiled.projections) <= tissuebox.compiler.MAX_PROJECTIONS
+        assert len(tissuebox.projection.projections) <= tissuebox.compiler.MAX_PROJECTIONS
+
+    def test_defaults_outside(self):
+        compiled = compile(self.schema, defaults={"name": "?"})
+        assert compiled.projection(["staffs"]).parse({"staffs": []}) == {"staffs": []}
+        assert compiled.projection(["name"]).parse({}) == {"name": "?"}
+
+    def test_unknown_paths(self):
+        for kwargs in [{"only": ["age"]}, {"exclude": ["address.street"]}, {"only": ["name.first"]}]:
+            with self.assertRaises(SchemaError):
+                validate({}, self.schema, **kwargs)
+            with self.assertRaises(SchemaError):
+                compile(self.schema).validate({}, **kwargs)
+
+
+class TestPatch(TestCase):
+    schema = {"name": str, "address.city": str, "[staffs].name": str, "[staffs].email": email, "meta": {"*": integer}}
+    document = {"name": "Roger", "address": {"city": "Basel"}, "staffs": [{"name": "a", "email": "a@b.co"}], "meta": {"a": 1}}
+
+    def patched(self, patch, change, previous=None, **kwargs):
+        compiled = compile(self.schema, **kwargs)
+        document = copy.deepcopy(self.document)
+        if previous is None:
+            previous = []
+            compiled.validate(document, previous)
+        change(document)
+        full, incremental = [], []
+        compiled.validate(document, full)
+        assert validate_patch(document, patch, compiled, previous, incremental) is not bool(full)
+        assert incremental == full
+        return incremental
+
+    def test_index(self):
+        from tissuebox.patch import Index
+
+        index = Index(["['a'] ['b'] must be integer (but 'x')", "['a'] must be dict", "['c'] [0] is required", "must be dict"])
+        index.remove(("a",), False)
+        assert sorted(index.errors()) == ["['a'] ['b'] must be integer (but 'x')", "['c'] [0] is required", "must be dict"]
+        index.remove(("c",), True)
+        index.remove(("missing", "x"), True)
+        assert sorted(index.errors()) == ["['a'] ['b'] must be integer (but 'x')", "must be dict"]
+
+    def test_cost_follows_the_patch(self):
+        import tissuebox.patch
+
+        schema = {"[staffs].email": email}
+        document = {"staffs": [{"email": "x"} for _ in range(1000)]}
+        previous = []
+        validate(document, schema, previous)
+        calls = []
+        original = tissuebox.patch.error_path
+        tissuebox.patch.error_path = lambda e: calls.append(e) or original(e)
+        try:
+            patch = [{"op": "replace", "path": "/staffs/{}/email".format(i), "value": "a@b.co"} for i in range(20)]
+            for i in range(20):
+                document["staffs"][i]["email"] = "a@b.co"
+            errors = []
+            assert not validate_patch(document, patch, schema, previous, errors)
+        finally:
+            tissuebox.patch.error_path = original
+        full = []
+        validate(document, schema, full)
+        assert errors == full and len(errors) == 980
+        assert len(calls) <= len(previous) + 20
+
+    def test_error_path(self):
+        assert error_path("['staffs'] [0] ['name'] is required") == (("staffs", "0", "name"), "is required")
+        assert error_path("['address']['city'] is required") == (("address", "city"), "is required")
+        assert error_path("must be dict") == ((), "must be dict")
+
+    def test_json_patch(self):
+        def change(d):
+            d["staffs"][0]["email"] = "x"
+            del d["address"]["city"]
+            d["meta"]["b"] = "c"
+
+        patch = [
+            {"op": "replace", "path": "/staffs/0/email", "value": "x"},
+            {"op": "remove", "path": "/address/city"},
+            {"op": "add", "path": "/meta/b", "value": "c"},
+        ]
+        assert self.patched(patch, change) == [
+            "['address'] ['city'] is required",
+            "['address']['city'] is required",
+            "['meta'] ['b'] must be integer (but 'c')",
+            "['staffs'] [0] ['email'] must be a valid email (but 'x')",
+        ]
+
+    def test_list_operations(self):
+        previous = ["['staffs'] [0] ['email'] must be a valid email (but 'x')"]
+
+        def insert(d):
+            d["staffs"][0]["email"] = "x"
+            d["staffs"].insert(0, {"name": 1})
+
+        errors = self.patched([{"op": "add", "path": "/staffs/0", "value": {"name": 1}}], insert, previous)
+        assert errors == [
+            "['staffs'] [0] ['email'] is required",
+            "['staffs'] [0] ['name'] must be string (but 1)",
+            "['staffs'] [1] ['email'] must be a valid email (but 'x')",
+            "['staffs'][0]['email'] is required",
+        ]
+        self.patched([{"op": "add", "path": "/staffs/-", "value": {}}], lambda d: d["staffs"].append({}))
+        self.patched([{"op": "remove", "path": "/staffs/0"}], lambda d: d["staffs"].pop(0))
+
+    def test_appends(self):
+        def append(d):
+            d["staffs"] += [{"name": 1}, {"name": 2}]
+
+        patch = [{"op": "add", "path": "/staffs/-", "value": {"name": 1}}, {"op": "add", "path": "/staffs/-", "value": {"name": 2}}]
+        errors = self.patched(patch, append)
+        assert "['staffs'] [1] ['name'] must be string (but 1)" in errors and "['staffs'] [2] ['name'] must be string (but 2)" in errors
+
+    def test_aggregated_appends(self):
+        def append(d):
+            d["staffs"][0]["name"] = 0
+            d["staffs"].append({"name": 1, "email": "b@b.co"})
+
+        patch = [{"op": "add", "path": "/staffs/-", "value": {"name": 1, "email": "b@b.co"}}]
+        previous = ["['staffs'] [0] ['name'] must be string (but 0)"]
+        errors = self.patched(patch, append, previous, aggregate=True)
+        assert errors == ["['staffs'] [0..1] ['name'] must be string (2 failures, 2 distinct values, first: 0)"]
+
+    def test_merge_patch(self):
+        def change(d):
+            d["address"] = {"town": "Basel"}
+            del d["name"]
+
+        assert self.patched({"address": {"town": "Basel", "city": None}, "name": None}, change, extra="forbid") == [
+            "['address'] ['city'] is required",
+            "['address'] ['town'] is not allowed",
+            "['address']['city'] is required",
+            "['name'] is required",
+        ]
+
+    def test_fixes(self):
+        previous = ["['name'] must be string (but 1)", "['staffs'] [0] ['name'] must be string (but 2)"]
+        errors = []
+        document = copy.deepcopy(self.document)
+        assert validate_patch(document, [{"op": "replace", "path": "/name", "value": "Roger"}], self.schema, previous, errors) is False
+        assert errors == ["['staffs'] [0] ['name'] must be string (but 2)"]
+
+    def test_limits(self):
+        def change(d):
+            d["staffs"].append({"name": "b", "email": "b@b.co"})
+
+        patch = [{"op": "add", "path": "/staffs/-", "value": {"name": "b", "email": "b@b.co"}}]
+        assert self.patched(patch, change, max_items=1) == ["['staffs'] must have at most 1 items (but 2)"]
+        self.patched([{"op": "replace", "path": "", "value": {}}], lambda d: d.clear())
+
+
+class TestProxy(TestCase):
+    schema = compile({"name": str, "address.city": str, "[staffs].name": str, "[staffs].email": email, "tags": [str]})
+
+    def same(self, proxy, schema=None):
+        errors = []
+        assert proxy.valid is (schema or self.schema).validate(proxy.plain(), errors)
+        assert proxy.errors() == errors
+
+    def test_build_up(self):
+        d = ValidatedDict(self.schema)
+        self.same(d)
+        d["name"] = "Roger"
+        d.update(address={}, staffs=[], tags=[])
+        assert d.errors() == ["['address'] ['city'] is required", "['address']['city'] is required"]
+        self.same(d)
+        d["address"]["city"] = "Basel"
+        assert d.valid
+        d["staffs"].append({"name": "a", "email": "x"})
+        assert not d.valid and d.errors() == ["['staffs'] [0] ['email'] must be a valid email (but 'x')"]
+        self.same(d)
+        d["staffs"][0]["email"] = "a@b.co"
+        assert d.valid
+        d["staffs"].insert(0, {"name": 1})
+        self.same(d)
+        del d["staffs"][0]
+        d["tags"].extend(["a", 1])
+        self.same(d)
+        d["tags"][1:] = ["b"]
+        assert d.valid and d == {"name": "Roger", "address": {"city": "Basel"}, "staffs": [{"name": "a", "email": "a@b.co"}], "tags": ["a", "b"]}
+        del d["name"]
+        assert d.errors() == ["['name'] is required"]
+
+    def test_nested(self):
+        schema = compile({"address.geo.lat": integer, "orders": [{"lines": {"sku": str}}], "shop": {"[items]": {"id": integer}}})
+        d = ValidatedDict(schema, {"address": {"geo": {}}, "orders": [{"lines": {}}], "shop": {}})
+        self.same(d, schema)
+        errors = d.errors()
+        assert "['address']['geo']['lat'] is required" in errors and "['orders'][0]['lines']['sku'] is required" in errors
+        assert "['shop']['items'] must be a list" in errors
+        d["shop"]["items"] = [{}]
+        d["address"]["geo"]["lat"] = 1
+        self.same(d, schema)
+        assert d.errors() == [
+            "['orders'] [0] ['lines'] ['sku'] is required",
+            "['orders'] [0] ['lines']['sku'] is required",
+            "['orders'][0]['lines']['sku'] is required",
+            "['shop'] ['items'] [0] ['id'] is required",
+            "['shop'] ['items'][0]['id'] is required",
+            "['shop']['items'][0]['id'] is required",
+        ]
+
+    def test_random_mutations(self):
+        rnd = __import__("random").Random(3)
+        # No numbers where a dict is expected, validate() itself raises on those
+        values = ["a", "a@b.co", {}, [], {"city": 2}, {"name": "n", "email": "e"}, ["x", {"name": 2}], {"name": 3}]
+        d = ValidatedDict(self.schema, {"name": "a", "address": {"city": "b"}, "staffs": [], "tags": []})
+        for _ in range(500):
+            target = d[rnd.choice(list(d))] if d and rnd.random() < 0.6 else d
+            value = copy.deepcopy(rnd.choice(values))
+            if isinstance(target, ValidatedDict):
+                key = rnd.choice(["name", "address", "staffs", "tags", "city", "email", "x"])
+                if key in target and rnd.random() < 0.3:
+                    del target[key]
+                else:
+                    target[key] = value
+            elif isinstance(target, ValidatedList):
+                if target and rnd.random() < 0.3:
+                    target.pop(rnd.randrange(len(target)))
+                else:
+                    target.insert(rnd.randrange(len(target) + 1), value)
+            self.same(d)
+
+    def test_schemas(self):
+        assert ValidatedList([integer], [1, 2]).valid and not ValidatedList([integer], [1, "2"]).valid
+        with self.assertRaises(SchemaError):
+            ValidatedDict([integer])
+        d = ValidatedDict(compile({"a": integer}, extra="forbid"), {"a": 1, "b": 2})
+        assert d.errors() == ["['b'] is not allowed"]
+
+
+class TestConstraints(TestCase):
+    def errors(self, payload, schema):
+        E, C = [], []
+        v(payload, schema, E)
+        compile(schema).validate(payload, C)
+        assert E == C
+        return E
+
+    def test_unique(self):
+        assert self.errors([1, 2, 3], ([integer], unique)) == []
+        assert self.errors([1, 2, 1, 3, 2], ([integer], unique)) == ["must have unique items (but [2] repeats [0], [4] repeats [1])"]
+        assert self.errors({"a": [[1], [1], {"x": 1}, {"x": 1}]}, {"a": unique}) == ["['a'] must have unique items (but [1] repeats [0], [3] repeats [2])"]
+        assert self.errors({"a": "not a list"}, {"a": unique}) == []
+        e = self.errors({"tags": ["x"] * 8}, {"tags": ([string], unique)})
+        assert e == ["['tags'] must have unique items (but [1] repeats [0], [2] repeats [0], [3] repeats [0], [4] repeats [0], [5] repeats [0] and 2 more)"]
+
+    def test_unique_by(self):
+        schema = {"items": ([{"sku": string}], unique_by("sku"))}
+        assert self.errors({"items": [{"sku": "a"}, {"sku": "b"}]}, schema) == []
+        assert self.errors({"items": [{"sku": "a"}, {"sku": "b"}, {"sku": "a"}]}, schema) == ["['items'] must have unique 'sku' (but [2] repeats [0])"]
+        # Items without the key are left to the rest of the schema
+        assert self.errors({"items": [{"sku": "a"}, {}, {}]}, schema) == ["['items'] [1] ['sku'] is required", "['items'] [2] ['sku'] is required"]
+
+    def test_sorted_by(self):
+        assert self.errors([{"n": 1}, {"n": 1}, {"n": 2}], sorted_by("n")) == []
+        assert self.errors([{"n": 1}, {"n": 3}, {"n": 2}], sorted_by("n")) == ["must be sorted by 'n' (but [2] sorts before [1])"]
+        assert self.errors([{"n": 3}, {"n": 2}], sorted_by("n", reverse=True)) == []
+        assert self.errors([{"n": 1}, {"n": "x"}], sorted_by("n")) == ["must be sorted by 'n' (but [1] sorts before [0])"]
+
+    def test_references(self):
+        schema = ({"orders": [{"warehouse": string}], "warehouses": [{"id": string}]}, references("[orders].warehouse", "[warehouses].id"))
+        payload = {"orders": [{"warehouse": "A"}, {"warehouse": "Z"}, {"warehouse": "B"}], "warehouses": [{"id": "A"}, {"id": "B"}]}
+        assert self.errors(payload, schema) == ["must reference existing [warehouses].id (but ['orders'] [1] ['warehouse'] is 'Z')"]
+        payload["warehouses"].append({"id": "Z"})
+        assert self.errors(payload, schema) == []
+        assert self.errors({"x": {"a": {"b": [1, 2]}, "c": 2}}, {"x": references("a.b", "c")}) == ["['x'] must reference existing c (but ['a'] ['b'] [0] is 1)"]
+
+    def test_large(self):
+        # One pass with a hash set, a hundred thousand items take well under a second
+        items = [{"sku": str(i)} for i in range(100000)]
+        start = time.time()
+        assert self.errors(items, ([{"sku": string}], unique_by("sku"))) == []
+        assert time.time() - start < 5
+
+
+class TestProfile(TestCase):
+    schema = {"name": string, "email": not_(null), "staffs": [{"age": (integer, gt(0)), "email": _(email)}]}
+    payload = {"name": "Roger", "email": "a@b.co", "staffs": [{"age": 1, "email": "x"}, {"age": -1, "email": "b@c.co"}, {"age": 3, "email": "c@d.co"}]}
+
+    def test_counts(self):
+        compiled = compile(self.schema)
+        profile = Profile()
+        E = []
+        assert not compiled.validate(self.payload, E, profile=profile)
+        assert E == ["['staffs'] [0] ['email'] must be a valid email (but 'x')", "['staffs'] [1] ['age'] must be greater than 0 (but -1)"]
+        stats = {(path, tissue): (calls, failures) for path, tissue, calls, failures, total, own in profile.rows()}
+        assert stats[("", "")] == (1, 1)
+        assert stats[("['email']", "not null")] == (1, 0)
+        assert stats[("['staffs'] [*]", "")] == (3, 2)
+        assert stats[("['staffs'] [*] ['age']", "greater than 0")] == (3, 1)
+        assert stats[("['staffs'] [*] ['email']", "early exit a valid email")] == (3, 1)
+        assert compiled.validate(self.payload, profile=profile) is False
+        # The elements require fields, which raises on some payloads, so check() goes on past the failing one
+        assert profile.stats[("['staffs'] [*] ", None)][:2] == [6, 4]
+
+    def test_times(self):
+        profile = Profile()
+        compile(self.schema).validate(self.payload, [], profile=profile)
+        rows = profile.rows("total")
+        assert rows[0][0] == ""
+        for path, tissue, calls, failures, total, own in rows:
+            assert 0 <= own <= total
+        # Own times add up to the total time of the top level
+        assert abs(sum(row[5] for row in rows) - rows[0][4]) < 1e-6
+        with self.assertRaises(ValueError):
+            profile.rows("slowest")
+
+    def test_report(self):
+        profile = Profile()
+        compile(self.schema).validate(self.payload, [], profile=profile)
+        out = io.StringIO()
+        profile.report(sort="calls", limit=3, file=out)
+        lines = out.getvalue().splitlines()
+        assert len(lines) == 4 and lines[0].split() == ["path", "tissue", "calls", "failures", "total", "ms", "own", "ms"]
+        assert [line.split()[-4] for line in lines[1:]] == ["3", "3", "3"]
+
+    def test_no_hooks(self):
+        from tissuebox.compiler import Node, Profiled
+
+        def nodes(value):
+            if isinstance(value, Node):
+                yield value
+                for v in vars(value).values():
+                    yield from nodes(v)
+            elif isinstance(value, (list, tuple)):
+                for v in value:
+                    yield from nodes(v)
+
+        compiled = compile(self.schema)
+        compiled.validate(self.payload, [], profile=Profile())
+        assert len(list(nodes(compiled.root))) > 5
+        assert not any(isinstance(node, Profiled) for node in nodes(compiled.root))
+        assert any(isinstance(node, Profiled) for node in nodes(compiled.variant(timed=False, sampled=False, profiled=True)))
+
+
+class TestMetrics(TestCase):
+    schema = {"name": string, "staffs": [{"age": integer}]}
+
+    def test_field_of(self):
+        assert field_of("['staffs'] [3] ['age'] must be integer (but '2')") == "['staffs'] [*] ['age']"
+        assert field_of("[12] ['0'] is required") == "[*] ['0']"
+        assert field_of("must be dict (but 1)") == ""
+
+    def test_record(self):
+        metrics = Metrics()
+        compiled = compile(self.schema, metrics=metrics)
+        E = []
+        assert not compiled.validate({"name": 1, "staffs": [{"age": "1"}, {"age": "2"}]}, E)
+        assert E == ["['name'] must be string (but 1)", "['staffs'] [0] ['age'] must be integer (but '1')", "['staffs'] [1] ['age'] must be integer (but '2')"]
+        assert compiled.validate({"name": "a", "staffs": []})
+        assert not compiled.validate({"name": "a", "staffs": [{"age": None}]})
+        snapshot = metrics.snapshot()
+        assert (snapshot.passed, snapshot.failed, snapshot.count) == (1, 2, 3)
+        # A validation counts once against a field however many elements fail on it
+        assert snapshot.fields == {"['name']": 1, "['staffs'] [*] ['age']": 2}
+        assert sum(snapshot.buckets) == 3 and snapshot.seconds > 0 and snapshot.rate > 0
+
+    def test_no_sink(self):
+        compiled = compile(self.schema)
+        assert compiled.metrics is None and "validate" not in vars(compiled)
+        assert "validate" in vars(compile(self.schema, metrics=Metrics()))
+
+    def test_threads(self):
+        metrics = Metrics()
+        compiled = compile(self.schema, metrics=metrics)
+
+        def work():
+            for i in range(500):
+                compiled.validate({"name": "a", "staffs": [{"age": "1"}] if i % 5 == 0 else []})
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        snapshot = metrics.snapshot()
+        assert len(metrics.shards) == 4
+        assert (snapshot.passed, snapshot.failed) == (1600, 400)
+        assert snapshot.fields == {"['staffs'] [*] ['age']": 400}
+
+    def test_prometheus(self):
+        orders = Metrics(buckets=(0.5, 0.001), labels={"schema": "orders"})
+        users = Metrics(labels={"schema": 'us"ers'})
+        compile(self.schema, metrics=orders).validate({"staffs": [{"age": 1}]})
+        compile(self.schema, metrics=users).validate({"name": "a", "staffs": []})
+        text = prometheus(orders, users)
+        lines = text.splitlines()
+        assert text.endswith("\n")
+        assert 'tissuebox_validations_total{schema="orders",outcome="failed"} 1' in lines
+        assert 'tissuebox_validations_total{schema="us\\"ers",outcome="passed"} 1' in lines
+        assert 'tissuebox_validation_seconds_bucket{schema="orders",le="0.5"} 1' in lines
+        assert 'tissuebox_validation_seconds_bucket{schema="orders",le="+Inf"} 1' in lines
+        assert 'tissuebox_validation_seconds_count{schema="orders"} 1' in lines
+        assert 'tissuebox_field_failures_total{schema="orders",field="[\'name\']"} 1' in lines
+        assert sum(line.startswith("# TYPE") for line in lines) == 3
+
+
+class TestTracing(TestCase):
+    schema = {"name": string, "staffs": [{"age": integer}]}
+    payload = {"name": "Roger", "staffs": [{"age": 1}, {"age": "2"}]}
+
+    def test_sampling(self):
+        tracer = RecordingTracer(every=4)
+        compiled = compile(self.schema, tracer=tracer)
+        for _ in range(10):
+            E = []
+            assert not compiled.validate(self.payload, E)
+            assert E == ["['staffs'] [1] ['age'] must be integer (but '2')"]
+        assert [span.attributes["sampled"] for span in tracer.spans] == [True, False, False, False] * 2 + [True, False]
+        sampled, plain = tracer.spans[:2]
+        assert plain.attributes == {"size": 2, "errors": 1, "nodes": None, "sampled": False} and plain.events == []
+        assert sampled.attributes == {"size": 2, "errors": 1, "nodes": 7, "sampled": True}
+        events = [(e["path"], e["tissue"], e["failed"]) for name, e in sampled.events]
+        assert ("['staffs'] [*] ['age']", "integer", True) in events and ("", None, True) in events
+        assert len(events) == 7 + 3
+
+    def test_fields(self):
+        tracer = RecordingTracer(every=1, fields=True)
+        compile(self.schema, tracer=tracer).validate(self.payload)
+        name, staffs, top = tracer.spans
+        assert [span.name for span in tracer.spans] == ["validate ['name']", "validate ['staffs']", "validate"]
+        assert name.parent is top and staffs.parent is top
+        assert not name.attributes["failed"] and staffs.attributes["failed"]
+
+    def test_never(self):
+        tracer = RecordingTracer(every=0, fields=True)
+        compiled = compile(self.schema, tracer=tracer)
+        assert compiled.validate({"name": "a", "staffs": []})
+        assert [span.attributes for span in tracer.spans] == [{"size": 2, "errors": 0, "nodes": None, "sampled": False}]
+        with self.assertRaises(ValueError):
+            Tracer(every=-1)
+        # The base tracer does nothing
+        assert compile(self.schema, tracer=Tracer(every=1)).validate({"name": "a", "staffs": []})
+
+    def test_timeout(self):
+        tracer = RecordingTracer(every=1)
+        compiled = compile({"items": [integer]}, tracer=tracer)
+        with self.assertRaises(ValidationTimeout):
+            compiled.validate({"items": list(range(100000))}, deadline=0)
+        assert tracer.spans[-1].attributes["error"].startswith("ValidationTimeout")
+
+    def test_with_metrics(self):
+        metrics, tracer = Metrics(), RecordingTracer(every=2)
+        compiled = compile(self.schema, metrics=metrics, tracer=tracer)
+        for _ in range(3):
+            compiled.validate(self.payload)
+        assert metrics.snapshot().failed == 3 and len(tracer.spans) == 3
+
+
+class TestMemory(TestCase):
+    schema = {"name": string, "staffs": [{"age": integer, "email": email}]}
+
+    def payload(self, n, valid=True):
+        return {"name": "Roger", "staffs": [{"age": i if valid else str(i), "email": "a@b.co" if valid else "x"} for i in range(n)]}
+
+    def test_breakdown(self):
+        results = memory(self.payload(20), self.schema, number=2)
+        assert set(results) == {"interpreter", "compiled"}
+        for r in results.values():
+            assert set(r["categories"]) == set(CATEGORIES)
+            assert r["allocations"] == sum(c["allocations"] for c in r["categories"].values())
+            assert r["bytes"] >= r["peak"] > 0
+        interpreter, compiled = results["interpreter"]["categories"], results["compiled"]["categories"]
+        # A path list for each of the 20 elements and the 2 fields in each of them
+        assert interpreter["paths"]["allocations"] >= 60
+        assert interpreter["schema"]["allocations"] > 0
+        assert compiled["paths"]["allocations"] == compiled["schema"]["allocations"] == 0
+
+    def test_messages(self):
+        passing = memory(self.payload(20), self.schema, number=1, engines=["compiled"])["compiled"]
+        failing = memory(self.payload(20, False), self.schema, number=1, engines=["compiled"])["compiled"]
+        assert failing["categories"]["messages"]["allocations"] >= 40 > passing["categories"]["messages"]["allocations"]
+
+    def test_categories(self):
+        # Told by what a line does, whatever its names or layout
+        def sample(trail, k, out, e, schema):
+            found = []
+            deeper = trail + [k]
+            out.append(f"[{k}] {e}")
+            out.append("[{}] ".format(k) + e)
+            schema = normalise(dict(schema))
+            return type(schema) is dict and (k,) + deeper
+
+        code = sample.__code__
+        assert [category(code, code.co_firstlineno + i) for i in range(1, 7)] == ["errors", "paths", "messages", "messages", "schema", "other"]
+        assert category(normalise.__code__, normalise.__code__.co_firstlineno + 2) == "schema"
+        failing = memory(self.payload(20, False), self.schema, number=1, engines=["interpreter"])["interpreter"]
+        assert all(failing["categories"][c]["allocations"] > 0 for c in CATEGORIES)
+
+    def test_budget(self):
+        # Allocation regressions fail here: a passing element costs the compiled engine about 9 allocations
+        n = 100
+        results = memory(self.payload(n), self.schema, number=2)
+        assert results["compiled"]["allocations"] < 30 * n
+        assert results["compiled"]["allocations"] < results["interpreter"]["allocations"] / 2
+
+    def test_tracing_restored(self):
+        previous = sys.gettrace()
+        memory([1], [integer], number=1)
+        assert sys.gettrace() is previous
+        with self.assertRaises(ValueError):
+            memory([1], [integer], engines=["jit"])
+
+
+class TestBenchmarks(TestCase):
+    def test_scenarios(self):
+        for scenario in SCENARIOS:
+            schema = scenario_schema(scenario)
+            for valid in (True, False):
+                payload = scenario_payload(scenario, "small", valid)
+                E, C = [], []
+                assert v(payload, schema, E) is valid, scenario
+                assert compile(schema).validate(payload, C) is valid, scenario
+                assert E == C
+
+    def test_run(self):
+        report = run_benchmarks(["int_array"], ["small"], engines=["compiled"], allocations=True)
+        assert set(report["results"]) == {"int_array/small/pass/compiled", "int_array/small/fail/compiled"}
+        result = report["results"]["int_array/small/pass/compiled"]
+        assert result["seconds"] > 0 and result["allocations"] > 0
+
+    def test_compare(self):
+        baseline = {"results": {"a": {"seconds": 1.0, "allocations": 100}, "b": {"seconds": 1.0}, "gone": {"seconds": 1.0}}}
+        current = {"results": {"a": {"seconds": 1.1, "allocations": 130}, "b": {"seconds": 1.5}, "new": {"seconds": 1.0}}}
+        rows, regressions = compare(baseline, current, threshold=0.2, allocation_threshold=0.1)
+        assert [(key, metric) for key, metric, *rest in rows] == [("a", "seconds"), ("a", "allocations"), ("b", "seconds")]
+        assert [(key, metric) for key, metric, *rest in regressions] == [("a", "allocations"), ("b", "seconds")]
+        assert compare(baseline, baseline)[1] == []
+
+
+class TestGenerate(TestCase):
+    SCHEMA = {
+        "name": string,
+        "age": (integer, gt(17), lt(120)),
+        "score": (numeric, gt(0), lt(1)),
+        "step": (integer, divisible(5), divisible(3), lt(100)),
+        "state": {"NSW", "VIC"},
+        "email": email,
+        "web": url,
+        "id": uuid4,
+        "ip": ipv4,
+        "when": iso8601,
+        "address.geo.lat": numeric,
+        "[staffs].email": _((max_len(40), string, email)),
+        "rooms": {"*": {"price": integer}},
+        "pet": tagged("kind", {"cat": {"lives": integer}, "dog": {"bark.loud": boolean}}),
+    }
+
+    def test_valid(self):
+        compiled = compile(self.SCHEMA)
+        for payload in generate(self.SCHEMA, 100, seed=1):
+            assert v(payload, self.SCHEMA) and compiled.validate(payload)
+            assert 17 < payload["age"] < 120 and 0 < payload["score"] < 1
+            assert payload["step"] % 15 == 0 and payload["step"] < 100
+            assert type(payload["address"]["geo"]) is dict and type(payload["staffs"]) is list
+
+    def test_invalid(self):
+        compiled = compile(self.SCHEMA)
+        payloads = list(generate(self.SCHEMA, 500, seed=2, invalid_ratio=0.2))
+        invalid = [p for p in payloads if not compiled.validate(p)]
+        assert 50 < len(invalid) < 150
+        assert all(not v(p, self.SCHEMA) for p in invalid)
+        assert all(not compiled.validate(p) for p in generate(self.SCHEMA, 50, seed=3, invalid_ratio=1.0))
+
+    def test_broken_in_places(self):
+        compiled = compile(self.SCHEMA)
+        counts = []
+        for payload in generate(self.SCHEMA, 50, seed=3, invalid_ratio=1.0, broken=3):
+            errors = []
+            assert not compiled.validate(payload, errors)
+            counts.append(len(errors))
+        assert max(counts) >= 3
+        with self.assertRaises(ValueError):
+            generate([integer], broken=0)
+
+    def test_seed(self):
+        assert list(generate(self.SCHEMA, 5, seed=4)) == list(generate(self.SCHEMA, 5, seed=4))
+        assert list(generate(self.SCHEMA, 5, seed=4)) != list(generate(self.SCHEMA, 5, seed=5))
+
+    def test_lazy(self):
+        payloads = generate([integer])
+        assert [type(next(payloads)) for _ in range(3)] == [list] * 3
+        with self.assertRaises(ValueError):
+            generate([integer], invalid_ratio=2)
+
+    def test_unknown(self):
+        def even(x, field=None):
+            return isinstance(x, int) and x % 2 == 0
+
+        even.msg = "even"
+        assert all(even(x) for x in generate((integer, even), 10))
+        with self.assertRaises(SchemaError):
+            next(generate((string, integer)))
+
+
+class TestParity(TestCase):
+    def test_generated(self):
+        checked = parity.run(parity.generated(20, seed=1), timed=False)
+        assert checked["cases"] == len(checked["results"]) == len(parity.generated(20, seed=1)) > 20 * len(parity.JUNK)
+        assert checked["mismatches"] == []
+
+    def test_mixed(self):
+        # Bounds mixed with type checks, so some cases raise and the engines have to raise alike
+        with warnings.catch_warnings():
+            # Some of the bounds drawn leave no value, which compile() warns of
+            warnings.simplefilter("ignore")
+            cases = parity.generated(40, seed=2)
+            outcomes = [parity.outcome(parity.REFERENCE, c.schema, c.payload) for c in cases]
+            assert any(o == ("TypeError",) * 3 for o in outcomes) and any(o[1] is True for o in outcomes)
+            assert any(type(c.schema) is tuple and len({hasattr(m, "is_safe") for m in c.schema}) == 2 for c in cases)
+            assert parity.run(cases, timed=False)["mismatches"] == []
+
+    def test_recorded(self):
+        cases = parity.recorded()
+        assert len(cases) > 100
+        assert all(c.label.startswith("tests.") and "TestParity" not in c.label for c in cases)
+        assert parity.run(cases[:50], timed=False)["mismatches"] == []
+
+    def test_calls_compared_apart(self):
+        def hasty(schema):
+            # Gives up on the first failure when no errors are asked for, where the interpreter raises
+            compiled = compile(schema)
+            return lambda payload, errors=None: compiled.validate(payload, errors) if errors is not None else payload[0] < 5
+
+        original = dict(parity.ENGINES)
+        parity.ENGINES["hasty"] = hasty
+        try:
+            expected, got = parity.outcome(parity.REFERENCE, [lt(5)], [10, "y"], False), parity.outcome("hasty", [lt(5)], [10, "y"])
+            checked = parity.run([parity.Case("hasty", [lt(5)], [10, "y"])], engines=["hasty"], timed=False)
+        finally:
+            parity.ENGINES.clear()
+            parity.ENGINES.update(original)
+        # Both raise with an errors list, only the boolean call shows the difference
+        assert expected == ("TypeError", "TypeError") and got == ("TypeError", False)
+        assert len(checked["mismatches"]) == 1
+
+    def test_scramble(self):
+        rnd = __import__("random").Random(0)
+        payload = {"a": [1, 2, {"b": 3}], "c": {"d": 4}}
+        scrambled = [parity.scramble(rnd, payload) for _ in range(20)]
+        assert payload == {"a": [1, 2, {"b": 3}], "c": {"d": 4}}
+        assert all(set(s) == {"a", "c"} for s in scrambled) and any(s != payload for s in scrambled)
+
+    def test_speedup(self):
+        checked = parity.run([parity.Case("int_array", [integer], list(range(100)))])
+        assert checked["results"][0]["speedup"] > 0
+
+    def test_shrink(self):
+        def positive(x):
+            if type(x) is dict:
+                return {k: positive(value) for k, value in x.items()}
+            if type(x) is list:
+                return [positive(value) for value in x]
+            return abs(x) if type(x) is int else x
+
+        def lenient(schema):
+            # Disagrees with the interpreter on negative integers
+            compiled = compile(schema)
+            return lambda payload, errors=None: compiled.validate(positive(payload), errors)
+
+        schema = {"a": string, "b.c": (integer, gt(0), lt(10)), "[d].e": email}
+        payload = {"a": "x", "b": {"c": -5}, "d": [{"e": "a@b.com"}, {"e": "c@d.com"}]}
+        original = dict(parity.ENGINES)
+        parity.ENGINES["lenient"] = lenient
+        try:
+            checked = parity.run([parity.Case("shrink", schema, payload)], engines=["lenient"], timed=False)
+        finally:
+            parity.ENGINES.clear()
+            parity.ENGINES.update(original)
+        [mismatch] = checked["mismatches"]
+        assert mismatch["payload"] == {"b": {"c": -5}}
+        assert parity.source(mismatch["schema"]) == "{'b.c': gt(0)}"
+        assert mismatch["expected"][0][0] is False and mismatch["got"][0][0] is True
+        out = io.StringIO()
+        parity.report(checked, out)
+        assert "validate({'b': {'c': -5}}, {'b.c': gt(0)})" in out.getvalue()
@@ -1,4 +1,9 @@
+import re
+from time import monotonic
+
+from tissuebox.aggregate import AggregatedError, collect, expand, summarise
 from tissuebox.basic import array, boolean, complex_number, dictionary, integer, null, numeric, string
+from tissuebox.deadline import ValidationTimeout, budget
 from tissuebox.helpers import exists, kgattr, sattr
 
 
@@ -17,7 +22,7 @@ def get_required_fields(schema):
     def extract_fields(s, prefix=""):
         if isinstance(s, dict):
             for k, v in s.items():
-                if k == "*":
+                if k == "*" or type(k) is not str:
                     continue
                 new_prefix = f"{prefix}['{k}']" if prefix else f"['{k}']"
                 if isinstance(v, (dict, list)):
@@ -51,6 +56,11 @@ def decorate(payload):
     return payload
 
 
+def words_error(schema):
+    """Whether a tissue returns its own error along with its result"""
+    return hasattr(schema, "is_early_exit") or hasattr(schema, "is_guard") or hasattr(schema, "is_constraint")
+
+
 def msg(schema):
     if schema is None:
         return "null"
@@ -85,6 +95,9 @@ def is_valid_schema(schema):
     if type(schema) in primitives:
         return True
 
+    if hasattr(schema, "is_tagged"):
+        return type(schema.key) is str and all(is_valid_schema(s) for s in schema.branches.values())
+
     if schema in primitives:
         return True
 
@@ -95,7 +108,35 @@ def is_valid_schema(schema):
 
 
 # Modify validate() function to handle early exit validation
-def validate(payload, schema, errors=None, field_path=None):
+def validate(payload, schema, errors=None, field_path=None, aggregate=False, deadline=None, sample=None, only=None, exclude=None):
+    """
+    Validate `payload` against `schema`, collecting the failures into `errors`
+
+    With `aggregate=True` the failures of list elements are grouped by message template, so a list failing the
+    same way a million times yields a single AggregatedError instead of a million strings. Use expand() to get the
+    full per-index list back.
+
+    With `deadline` (seconds) validation raises ValidationTimeout once it runs out of time, telling how far it got.
+    With a `sample` (a Sample) only part of the elements of long lists are validated.
+
+    `only` and `exclude` take field paths written like schema keys, "address.city" or "[staffs].name". Only the fields
+    they select are validated, required ones included. The projection is kept for the next call with the same paths.
+    """
+    if isinstance(schema, CompiledSchema):
+        if aggregate or field_path is not None:
+            raise ValueError("Schema is already compiled, compile its .schema with the options instead")
+        return schema.validate(payload, errors, deadline=deadline, sample=sample, only=only, exclude=exclude)
+
+    if only is not None or exclude:
+        if not is_valid_schema(schema):
+            raise SchemaError("Schema is invalid, Use SchemaInspector to debug the schema")
+        schema = projected(schema, only, exclude)
+
+    return interpret(payload, schema, errors, field_path, aggregate, budget(deadline), sample)
+
+
+def interpret(payload, schema, errors=None, field_path=None, aggregate=False, deadline=None, sample=None):
+    """validate() once its options are dealt with. It recurses into itself, so a plain call pays nothing for them"""
     if errors is None:
         errors = []
     if field_path is None:
@@ -119,9 +160,13 @@ def validate(payload, schema, errors=None, field_path=None):
             for key, value in payload.items():
                 E = []
                 new_path = field_path + [key]
-                validate(value, wildcard_schema, E, new_path)
+                if deadline:
+                    deadline.enter("['{}'] ", key, "['*'] ", element=True)
+                interpret(value, wildcard_schema, E, new_path, aggregate, deadline, sample)
+                if deadline:
+                    deadline.leave()
                 for e in E:
-                    errors.append("['{}'] {}".format(key, e))
+                    errors.append("['{}'] ".format(key) + e)
             sort_unique(errors)
             return not errors
 
@@ -131,9 +176,31 @@ def validate(payload, schema, errors=None, field_path=None):
                     continue
                 E = []
                 new_path = field_path + [k]
-                validate(payload[k], schema[k], E, new_path)
+                if deadline:
+                    deadline.enter("['{}'] ", k, "['{}'] ".format(k))
+                interpret(payload[k], schema[k], E, new_path, aggregate, deadline, sample)
+                if deadline:
+                    deadline.leave()
                 for e in E:
-                    errors.append("['{}'] {}".format(k, e))
+                    errors.append("['{}'] ".format(k) + e)
+
+        patterns = [(k, v) for k, v in schema.items() if isinstance(k, re.Pattern)]
+        if patterns:
+            for key, value in payload.items():
+                if key in schema or type(key) is not str:
+                    continue
+                # The first pattern matching the key decides its schema
+                for pattern, pattern_schema in patterns:
+                    if pattern.match(key):
+                        E = []
+                        if deadline:
+                            deadline.enter("['{}'] ", key, "['{}'] ".format(pattern.pattern), element=True)
+                        interpret(value, pattern_schema, E, field_path + [key], aggregate, deadline, sample)
+                        if deadline:
+                            deadline.leave()
+                        for e in E:
+                            errors.append("['{}'] ".format(key) + e)
+                        break
 
     elif type(schema) is list:
         if type(payload) is not list:
@@ -143,12 +210,22 @@ def validate(payload, schema, errors=None, field_path=None):
         if len(schema) > 1:
             schema = [set(schema)]
 
-        for i, p in enumerate(payload):
+        groups = {}
+        for i in sample.indices(len(payload)) if sample else range(len(payload)):
+            p = payload[i]
             E = []
             new_path = field_path + [str(i)]
-            validate(p, schema[0], E, new_path)
+            if deadline:
+                deadline.enter("[{}] ", i, "[*] ", element=True)
+            interpret(p, schema[0], E, new_path, aggregate, deadline, sample)
+            if deadline:
+                deadline.leave()
             for e in E:
-                errors.append("[{}] {}".format(i, e))
+                if aggregate:
+                    collect(groups, i, e, errors)
+                else:
+                    errors.append("[{}] {}".format(i, e))
+        summarise(groups, errors)
 
     elif type(schema) is tuple:
         # Check if this is an early exit validator
@@ -159,19 +236,51 @@ def validate(payload, schema, errors=None, field_path=None):
                 errors.append(error)
                 return False
         else:
+            guards = [s for s in schema if hasattr(s, "is_guard")]
+            if guards:
+                # Guards run first, whatever their position, and keep the rest of the chain from running on failure
+                E = []
+                for s in guards:
+                    interpret(payload, s, E, field_path, aggregate, deadline, sample)
+                if E:
+                    errors.extend(E)
+                    sort_unique(errors)
+                    return not errors
+                schema = tuple(s for s in schema if not hasattr(s, "is_guard"))
+
             # Regular tuple validation
             all_valid = True
             tuple_errors = []
             for s in schema:
                 E = []
-                if not validate(payload, s, E, field_path):
+                if not interpret(payload, s, E, field_path, aggregate, deadline, sample):
                     tuple_errors.extend(E)
                     all_valid = False
+                    if hasattr(s, "is_coercing"):
+                        # The rest of the chain expects the converted value
+                        break
+                elif hasattr(s, "is_coercing"):
+                    # The rest of the chain sees the converted value
+                    payload = s(payload, field=field_path[-1] if field_path else None)[1]
             if not all_valid:
                 errors.extend(tuple_errors)
 
+    elif hasattr(schema, "is_tagged"):
+        if type(payload) is not dict:
+            errors.append("must be dict")
+            return False
+
+        if schema.key not in payload:
+            errors.append("['{}'] is required".format(schema.key))
+        else:
+            branch = schema.branch(payload[schema.key])
+            if branch is None:
+                errors.append(schema.unknown(payload[schema.key]))
+            else:
+                interpret(payload, branch, errors, field_path, aggregate, deadline, sample)
+
     elif type(schema) is set:
-        if not any([validate(payload, s, field_path=field_path) for s in schema]):
+        if not any([interpret(payload, s, None, field_path, False, deadline, sample) for s in schema]):
             labels = sorted([msg(s) for s in schema])
             if len(schema) > 1:
                 errors.append(" must be either {} or {} (but {})".format(", ".join(labels[:-1]), labels[-1], payload))
@@ -185,18 +294,27 @@ def validate(payload, schema, errors=None, field_path=None):
         result = False
         if callable(schema):
             current_field = field_path[-1] if field_path else None
-            if hasattr(schema, "is_early_exit"):
-                # Handle early exit validator
-                result, error = schema(payload, field=current_field)
+            if deadline:
+                start = monotonic()
+                outcome = schema(payload, field=current_field)
+                deadline.charge(msg(schema), start)
+            else:
+                outcome = schema(payload, field=current_field)
+            if words_error(schema):
+                # Handle early exit validator, guards and constraints, all word their own error
+                result, error = outcome
                 if not result:
                     errors.append(error)
+            elif hasattr(schema, "is_coercing"):
+                # Coercing validator, the converted value only matters to parse()
+                result = outcome[0]
             else:
                 # Regular validator
-                result = schema(payload, field=current_field)
+                result = outcome
         elif is_primitive_value(schema):
             result = schema == payload
 
-        if not result and not hasattr(schema, "is_early_exit"):
+        if not result and not words_error(schema):
             # Add error message for non-early exit validators
             if field_path is None and is_primitive_value(payload) and is_primitive_value(schema):
                 errors.append("{} is not {}".format(decorate(payload), msg(schema)))
@@ -214,6 +332,10 @@ def check_required_fields(schema, payload, errors, path=""):
             return
 
         for k, v in schema.items():
+            if type(k) is not str:
+                # Pattern keys are never required
+                continue
+
             # Handle array notation in key
             actual_key = k[1:-1] if k.startswith("[") and k.endswith("]") else k
             new_path = f"{path}['{actual_key}']" if path else f"['{actual_key}']"
@@ -257,6 +379,9 @@ def normalise(schema, start=None):
         dict_keys = set()
 
         for k in schema.keys():
+            if type(k) is not str:
+                continue
+
             # Handle direct array notation
             if k.startswith("[") and k.endswith("]"):
                 array_keys.add(k[1:-1])
@@ -281,6 +406,9 @@ def normalise(schema, start=None):
 
         # Second pass: Process fields
         for k in list(schema.keys()):
+            if type(k) is not str:
+                continue
+
             if k.startswith("[") and k.endswith("]"):
                 # Handle array notation directly
                 array_key = k[1:-1]
@@ -326,6 +454,7 @@ def not_(validator):
         return not validate(x, validator, field_path=[field] if field else None)
 
     not_.msg = f"not {msg(validator)}"
+    not_.validator = validator
     return not_
 
 
@@ -350,4 +479,45 @@ def _(validator):
 
     early_exit_validator.msg = f"early exit {msg(validator)}"
     early_exit_validator.is_early_exit = True
+    early_exit_validator.validator = validator
     return early_exit_validator
+
+
+def tagged(key, branches):
+    """
+    Discriminated union, the value of the `key` field picks the one schema of `branches` the payload is validated
+    against instead of trying every alternative like a set does
+    """
+
+    def tagged_(x, field=None):
+        return validate(x, tagged_, field_path=[field] if field else None)
+
+    def branch(tag):
+        try:
+            return tagged_.branches.get(tag)
+        except TypeError:
+            # Unhashable tags can't be in branches
+            return None
+
+    def unknown(tag):
+        return "['{}'] must be one of {} (but {})".format(key, tagged_.tags, decorate(tag))
+
+    tagged_.key = key
+    tagged_.branches = dict(branches)
+    tagged_.tags = ", ".join(sorted(str(decorate(t)) for t in branches))
+    tagged_.branch = branch
+    tagged_.unknown = unknown
+    tagged_.msg = "dict tagged by '{}'".format(key)
+    tagged_.is_tagged = True
+    return tagged_
+
+
+from tissuebox.compiler import CompiledSchema, compile, parse, validate_into  # noqa: E402
+from tissuebox.records import Record  # noqa: E402
+from tissuebox.router import SchemaRouter  # noqa: E402
+from tissuebox.sampling import Sample  # noqa: E402
+from tissuebox.projection import project, projected  # noqa: E402
+from tissuebox.patch import validate_patch  # noqa: E402
+from tissuebox.proxy import ValidatedDict, ValidatedList  # noqa: E402
+from tissuebox.profiler import Profile  # noqa: E402
+from tissuebox.generator import generate  # noqa: E402
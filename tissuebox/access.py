@@ -0,0 +1,82 @@
+import dataclasses
+from collections.abc import Mapping, Sequence
+
+ACCESS = ("dict", "mapping", "attr", "auto")
+
+
+def attribute_names(obj):
+    if dataclasses.is_dataclass(obj):
+        return [f.name for f in dataclasses.fields(obj)]
+    if hasattr(obj, "_fields"):
+        return list(obj._fields)
+    names = []
+    for cls in type(obj).__mro__:
+        slots = cls.__dict__.get("__slots__", ())
+        for name in (slots,) if isinstance(slots, str) else slots:
+            if name not in ("__dict__", "__weakref__") and hasattr(obj, name):
+                names.append(name)
+    names.extend(getattr(obj, "__dict__", ()))
+    return names
+
+
+class AttrView:
+    """Reads the attributes of an object through the handful of dict methods the nodes use, without copying them"""
+
+    __slots__ = ("obj",)
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __contains__(self, key):
+        return isinstance(key, str) and hasattr(self.obj, key)
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self.obj, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def keys(self):
+        return dict.fromkeys(attribute_names(self.obj)).keys()
+
+    def items(self):
+        return [(k, getattr(self.obj, k)) for k in self.keys()]
+
+
+class Access:
+    """
+    How dict and list schemas read a payload.
+
+    "mapping" accepts any collections.abc.Mapping for dict schemas, "attr" reads the attributes of dataclasses,
+    namedtuples and `__slots__` objects, "auto" picks per payload. Beyond the "dict" default every non string
+    collections.abc.Sequence passes for a list
+    """
+
+    def __init__(self, mode):
+        self.mode = mode
+
+    def view(self, payload):
+        """The payload as something dict-like or `None` when it can't be read as a dict"""
+        if type(payload) is dict or type(payload) is AttrView:
+            return payload
+        if self.mode != "attr" and isinstance(payload, Mapping):
+            return payload
+        if self.mode != "mapping" and is_object(payload):
+            return AttrView(payload)
+        return None
+
+    def is_list(self, payload):
+        return isinstance(payload, Sequence) and not isinstance(payload, (str, bytes, bytearray))
+
+
+def is_object(payload):
+    if isinstance(payload, tuple):
+        return hasattr(payload, "_fields")
+    if isinstance(payload, (type, str, bytes, bytearray, int, float, complex, list, dict, set, frozenset)) or payload is None:
+        return False
+    return dataclasses.is_dataclass(payload) or hasattr(payload, "__dict__") or hasattr(type(payload), "__slots__")
+
+
+def access(mode):
+    """`None` for the plain dict/list default so the nodes can keep their exact type checks"""
+    return None if mode == "dict" else Access(mode)
@@ -0,0 +1,131 @@
+from array import array
+
+MAX_RUNS = 5
+# Distinct offending values a group keeps, those past them are only counted. Indices are kept as compact arrays
+MAX_VALUES = 100
+
+
+def split_value(e):
+    """Split `must be integer (but 'x')` into its template and the offending value"""
+    template, sep, value = e.partition(" (but ")
+    if sep and value.endswith(")"):
+        return template, value[:-1]
+    return e, None
+
+
+class ErrorGroup:
+    """
+    Every failure of one message template across the indices of a single list. The runs of consecutive indices are kept
+    as start and end pairs and the value of each failure as the number of one of the first MAX_VALUES distinct values,
+    MAX_VALUES standing for any other
+    """
+
+    def __init__(self, template):
+        self.template = template
+        self.count = 0
+        self.runs = array("L")
+        self.values = {}
+        self.overflow = False
+        self.value_ids = array("H")
+
+    def add(self, i, value):
+        self.count += 1
+        runs = self.runs
+        if runs and runs[-1] == i - 1:
+            runs[-1] = i
+        else:
+            runs.extend((i, i))
+        if value is not None:
+            n = self.values.get(value)
+            if n is None:
+                if len(self.values) < MAX_VALUES:
+                    n = self.values[value] = len(self.values)
+                else:
+                    n, self.overflow = MAX_VALUES, True
+            self.value_ids.append(n)
+
+    def indices(self):
+        runs = self.runs
+        for r in range(0, len(runs), 2):
+            yield from range(runs[r], runs[r + 1] + 1)
+
+    def expand(self):
+        """
+        Yield the per-index errors exactly as a non aggregated validate() would report them, but for the values past the
+        first MAX_VALUES distinct ones, which are given as `...`
+        """
+        if not self.values:
+            for i in self.indices():
+                yield "[{}] {}".format(i, self.template)
+            return
+        values = list(self.values) + ["..."]
+        for i, v in zip(self.indices(), self.value_ids):
+            yield "[{}] {} (but {})".format(i, self.template, values[v])
+
+    def __str__(self):
+        pairs = len(self.runs) // 2
+        runs = self.runs[: 2 * MAX_RUNS]
+        runs = ["{}..{}".format(s, e) if s != e else str(s) for s, e in zip(runs[::2], runs[1::2])]
+        if pairs > MAX_RUNS:
+            runs.append("...")
+        details = "{} failures".format(self.count)
+        if self.values:
+            distinct = len(self.values)
+            if self.overflow:
+                details += ", more than {} distinct values".format(distinct)
+            else:
+                details += ", {} distinct value{}".format(distinct, "" if distinct == 1 else "s")
+            details += ", first: {}".format(next(iter(self.values)))
+        return "[{}] {} ({})".format(", ".join(runs), self.template, details)
+
+
+class AggregatedError(str):
+    """
+    A summary line standing in for a whole ErrorGroup.
+
+    Parents prefix their child errors with `"['key'] " + e`, `__radd__` keeps the group attached along the way so the
+    full per-index list can be recovered with expand()
+    """
+
+    def __new__(cls, group, prefix=""):
+        self = super().__new__(cls, prefix + str(group))
+        self.group = group
+        self.prefix = prefix
+        return self
+
+    def __radd__(self, other):
+        return AggregatedError(self.group, other + self.prefix)
+
+    def expand(self):
+        return [self.prefix + e for e in self.group.expand()]
+
+
+def collect(groups, i, e, errors):
+    """Route the error `e` of list index `i` to its group, already aggregated errors are passed through as is"""
+    if isinstance(e, AggregatedError):
+        errors.append("[{}] ".format(i) + e)
+        return
+    template, value = split_value(e)
+    group = groups.get(template)
+    if group is None:
+        group = groups[template] = ErrorGroup(template)
+    group.add(i, value)
+
+
+def summarise(groups, errors):
+    for group in groups.values():
+        if group.count == 1:
+            errors.extend(group.expand())
+        else:
+            errors.append(AggregatedError(group))
+
+
+def expand(errors):
+    """Turn an aggregated error list back into the full per-index list"""
+    expanded = []
+    for e in errors:
+        if isinstance(e, AggregatedError):
+            expanded.extend(e.expand())
+        else:
+            expanded.append(e)
+    return sorted(set(expanded))
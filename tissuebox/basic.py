@@ -1,5 +1,8 @@
+import ipaddress
 import re
-from decimal import Decimal
+from collections.abc import Mapping
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
 
 
 def integer(x, field=None):
@@ -9,6 +12,8 @@ def integer(x, field=None):
 
 
 integer.msg = "integer"
+integer.cost = 1
+integer.is_safe = True
 
 
 def numeric(x, field=None):
@@ -18,6 +23,8 @@ def numeric(x, field=None):
 
 
 numeric.msg = "numeric"
+numeric.cost = 1
+numeric.is_safe = True
 
 
 def complex_number(x, field=None):
@@ -25,6 +32,8 @@ def complex_number(x, field=None):
 
 
 complex_number.msg = "complex number"
+complex_number.cost = 1
+complex_number.is_safe = True
 
 
 def string(x, field=None):
@@ -32,6 +41,8 @@ def string(x, field=None):
 
 
 string.msg = "string"
+string.cost = 1
+string.is_safe = True
 
 
 def array(x, field=None):
@@ -39,6 +50,8 @@ def array(x, field=None):
 
 
 array.msg = "list"
+array.cost = 1
+array.is_safe = True
 
 
 def dictionary(x, field=None):
@@ -46,6 +59,8 @@ def dictionary(x, field=None):
 
 
 dictionary.msg = "dictionary"
+dictionary.cost = 1
+dictionary.is_safe = True
 
 
 def boolean(x, field=None):
@@ -53,6 +68,8 @@ def boolean(x, field=None):
 
 
 boolean.msg = "boolean"
+boolean.cost = 1
+boolean.is_safe = True
 
 
 def null(x, field=None):
@@ -60,39 +77,138 @@ def null(x, field=None):
 
 
 null.msg = "null"
+null.cost = 1
+null.is_safe = True
+
+
+UUID4 = re.compile(r"[a-f0-9]{8}-?[a-f0-9]{4}-?4[a-f0-9]{3}-?[89ab][a-f0-9]{3}-?[a-f0-9]{12}\Z", re.I)
+EMAIL = re.compile(r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$")
+URL = re.compile(r"(?:https?://(?:www\.|(?!www))|www\.)([a-zA-Z0-9-]*)")
+DATE = re.compile(r"(\d{4})-(\d{2})-(\d{2})\Z", re.ASCII)
+DATETIME = re.compile(
+    r"(\d{4})-(\d{2})-(\d{2})[T ](\d{2}):(\d{2})(?::(\d{2})(?:\.\d{1,6})?)?(?:Z|[+-](\d{2}):(\d{2}))?\Z", re.ASCII
+)
+IPV6_CHARS = frozenset("0123456789abcdefABCDEF:.")
 
 
 def uuid4(x, field=None):
-    if not isinstance(x, str):
+    if not isinstance(x, str) or not 32 <= len(x) <= 36:
         return False
-    regex = re.compile("^[a-f0-9]{8}-?[a-f0-9]{4}-?4[a-f0-9]{3}-?[89ab][a-f0-9]{3}-?[a-f0-9]{12}\Z", re.I)
-    return bool(regex.match(x))
+    return bool(UUID4.match(x))
 
 
 uuid4.msg = "a valid uuid"
+uuid4.cost = 20
+uuid4.is_safe = True
 
 
 def email(x, field=None):
-    if not isinstance(x, str):
+    if not isinstance(x, str) or "@" not in x or not x.isascii():
         return False
-    return bool(re.match(r"(^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$)", x))
+    return bool(EMAIL.match(x))
 
 
 email.msg = "a valid email"
+email.cost = 20
+email.is_safe = True
 
 
 def url(x, field=None):
+    """
+    `http://`, `https://` or `www.` then a host label of 1 or at least 3 letters, digits or dashes (not at either end)
+    followed by a dot and 2 non whitespace characters, anything may come after that.
+
+    URL only finds the scheme and the label, in a single pass with nothing after the label to backtrack over, the
+    rest is checked by hand
+    """
     if not isinstance(x, str):
         return False
-    return bool(
-        re.match(
-            r"(https?:\/\/(?:www\.|(?!www))[a-zA-Z0-9][a-zA-Z0-9-]+[a-zA-Z0-9]\.[^\s]{2,}|www\.[a-zA-Z0-9][a-zA-Z0-9-]+[a-zA-Z0-9]\.[^\s]{2,}|https?:\/\/(?:www\.|(?!www))[a-zA-Z0-9]\.[^\s]{2,}|www\.[a-zA-Z0-9]\.[^\s]{2,})",
-            x,
-        )
-    )
+    match = URL.match(x)
+    if match is None:
+        return False
+    start, end = match.span(1)
+    if end - start in (0, 2) or x[start] == "-" or x[end - 1] == "-" or not x.startswith(".", end):
+        return False
+    return len(x) > end + 2 and not x[end + 1].isspace() and not x[end + 2].isspace()
 
 
 url.msg = "a valid url"
+url.cost = 30
+url.is_safe = True
+
+
+def ipv4(x, field=None):
+    """Dotted quad, without leading zeros which some parsers read as octal"""
+    if not isinstance(x, str) or not 7 <= len(x) <= 15:
+        return False
+    parts = x.split(".")
+    if len(parts) != 4:
+        return False
+    for part in parts:
+        if not part.isascii() or not part.isdigit() or int(part) > 255 or (len(part) > 1 and part[0] == "0"):
+            return False
+    return True
+
+
+ipv4.msg = "a valid ipv4 address"
+ipv4.cost = 5
+ipv4.is_safe = True
+
+
+def ipv6(x, field=None):
+    if not isinstance(x, str) or not 2 <= len(x) <= 45 or ":" not in x or not IPV6_CHARS.issuperset(x):
+        return False
+    try:
+        ipaddress.IPv6Address(x)
+    except ValueError:
+        return False
+    return True
+
+
+ipv6.msg = "a valid ipv6 address"
+ipv6.cost = 20
+ipv6.is_safe = True
+
+
+def date(x, field=None):
+    """`YYYY-MM-DD` naming a day which exists"""
+    if not isinstance(x, str) or len(x) != 10:
+        return False
+    match = DATE.match(x)
+    if match is None:
+        return False
+    try:
+        datetime(*map(int, match.groups()))
+    except ValueError:
+        return False
+    return True
+
+
+date.msg = "an iso 8601 date"
+date.cost = 5
+date.is_safe = True
+
+
+def iso8601(x, field=None):
+    """`YYYY-MM-DDTHH:MM[:SS[.ffffff]]` with an optional `Z` or `±HH:MM` offset, naming a time which exists"""
+    if not isinstance(x, str) or not 16 <= len(x) <= 32:
+        return False
+    match = DATETIME.match(x)
+    if match is None:
+        return False
+    year, month, day, hour, minute, second, offset_hours, offset_minutes = match.groups()
+    if offset_hours is not None and (int(offset_hours) > 23 or int(offset_minutes) > 59):
+        return False
+    try:
+        datetime(int(year), int(month), int(day), int(hour), int(minute), int(second or 0))
+    except ValueError:
+        return False
+    return True
+
+
+iso8601.msg = "an iso 8601 datetime"
+iso8601.cost = 5
+iso8601.is_safe = True
 
 
 def lt(n):
@@ -100,6 +216,8 @@ def lt(n):
         return x < n
 
     lt.msg = f"less than {n}"
+    lt.cost = 2
+    lt.less_than = n
     return lt
 
 
@@ -108,6 +226,8 @@ def gt(n):
         return x > n
 
     gt.msg = f"greater than {n}"
+    gt.cost = 2
+    gt.greater_than = n
     return gt
 
 
@@ -116,6 +236,8 @@ def divisible(n):
         return numeric(x) and numeric(n) and x % n == 0
 
     divisible.msg = f"multiple of {n}"
+    divisible.cost = 2
+    divisible.multiple_of = n
     return divisible
 
 
@@ -135,4 +257,270 @@ def strong_password(min_len=8):
         return has_upper and has_lower and has_digit and has_special
 
     f.msg = f"a strong password (min {min_len} chars with uppercase, lowercase, number, and special character)"
+    f.cost = 20
+    f.is_safe = True
     return f
+
+
+LEN_MESSAGE = "must be at most {} characters long (but {})"
+ITEMS_MESSAGE = "must have at most {} items (but {})"
+KEYS_MESSAGE = "must have at most {} keys (but {})"
+DEPTH_MESSAGE = "must be nested at most {} levels deep"
+
+
+def size_guard(n, kinds, message, label):
+    def guard(x, field=None):
+        if isinstance(x, kinds) and len(x) > n:
+            return False, message.format(n, len(x))
+        return True, None
+
+    guard.msg = label.format(n)
+    guard.is_guard = True
+    guard.cost = 0
+    return guard
+
+
+def max_len(n):
+    """
+    Guard against strings longer than `n`. Guards run before the other members of their `()` chain and a failing one
+    stops the chain, a 10MB string never reaches the regex of `(max_len(254), email)`
+    """
+    return size_guard(n, (str, bytes, bytearray), LEN_MESSAGE, "at most {} characters long")
+
+
+def max_items(n):
+    """Guard against lists and tuples of more than `n` items, `(max_items(100), [integer])`"""
+    return size_guard(n, (list, tuple), ITEMS_MESSAGE, "at most {} items")
+
+
+def max_keys(n):
+    """Guard against dicts of more than `n` keys"""
+    return size_guard(n, Mapping, KEYS_MESSAGE, "at most {} keys")
+
+
+def too_deep(x, n):
+    """Whether dicts, lists and tuples nest more than `n` levels deep in `x`, without recursing"""
+    stack = [(x, 1)]
+    while stack:
+        value, depth = stack.pop()
+        if isinstance(value, Mapping):
+            children = value.values()
+        elif isinstance(value, (list, tuple)):
+            children = value
+        else:
+            continue
+        if depth > n:
+            return True
+        stack.extend((child, depth + 1) for child in children if isinstance(child, (Mapping, list, tuple)))
+    return False
+
+
+def max_depth(n):
+    """
+    Guard against dicts, lists and tuples nesting more than `n` levels deep. Unlike the other guards it has to look
+    inside the payload, it stops at the first container found too deep
+    """
+
+    def guard(x, field=None):
+        if too_deep(x, n):
+            return False, DEPTH_MESSAGE.format(n)
+        return True, None
+
+    guard.msg = "nested at most {} levels deep".format(n)
+    guard.is_guard = True
+    guard.cost = 5
+    return guard
+
+
+# Constraints across the items of a list or the fields of a document. Each makes a single pass with a hash set or a
+# running value and words its own error, listing at most MAX_REPORTED offending indices
+MAX_REPORTED = 5
+
+
+def freeze(x):
+    """A hashable stand-in for `x`, equal to the stand-in of another value whenever the values are equal"""
+    if isinstance(x, Mapping):
+        return "dict", frozenset((k, freeze(v)) for k, v in x.items())
+    if isinstance(x, list):
+        return "list", tuple(freeze(v) for v in x)
+    if isinstance(x, tuple):
+        return "tuple", tuple(freeze(v) for v in x)
+    if isinstance(x, (set, frozenset)):
+        return "set", frozenset(x)
+    return x
+
+
+def duplicates(values):
+    """`(index, index of the first occurrence)` of every repeated value among `(index, value)` pairs"""
+    seen = {}
+    found = []
+    for i, value in values:
+        try:
+            first = seen.setdefault(freeze(value), i)
+        except TypeError:
+            # Unhashable and not a container, such values can't be told apart by hashing
+            continue
+        if first != i:
+            found.append((i, first))
+    return found
+
+
+def listing(found, template):
+    shown = ", ".join(template.format(*f) for f in found[:MAX_REPORTED])
+    if len(found) > MAX_REPORTED:
+        shown += " and {} more".format(len(found) - MAX_REPORTED)
+    return shown
+
+
+def keyed(x, key):
+    """`(index, item[key])` of the dict items of `x` that have `key`"""
+    return ((i, item[key]) for i, item in enumerate(x) if isinstance(item, Mapping) and key in item)
+
+
+def unique(x, field=None):
+    if not isinstance(x, (list, tuple)):
+        return True, None
+    found = duplicates(enumerate(x))
+    if found:
+        return False, "must have unique items (but {})".format(listing(found, "[{}] repeats [{}]"))
+    return True, None
+
+
+unique.msg = "unique items"
+unique.is_constraint = True
+unique.cost = 50
+
+
+def unique_by(key):
+    """Constraint that no two dict items of a list have the same value at `key`, `([{"sku": str}], unique_by("sku"))`"""
+
+    def unique_by(x, field=None):
+        if not isinstance(x, (list, tuple)):
+            return True, None
+        found = duplicates(keyed(x, key))
+        if found:
+            return False, "must have unique '{}' (but {})".format(key, listing(found, "[{}] repeats [{}]"))
+        return True, None
+
+    unique_by.msg = "unique '{}'".format(key)
+    unique_by.is_constraint = True
+    unique_by.cost = 50
+    return unique_by
+
+
+def sorted_by(key, reverse=False):
+    """Constraint that the dict items of a list come in ascending, or with `reverse` descending, order of `key`"""
+
+    def sorted_by(x, field=None):
+        if not isinstance(x, (list, tuple)):
+            return True, None
+        found = []
+        previous = None
+        for i, value in keyed(x, key):
+            if previous is not None:
+                try:
+                    wrong = value > previous[1] if reverse else value < previous[1]
+                except TypeError:
+                    wrong = True
+                if wrong:
+                    found.append((i, previous[0]))
+            previous = i, value
+        if found:
+            return False, "must be sorted by '{}' (but {})".format(key, listing(found, "[{}] sorts before [{}]"))
+        return True, None
+
+    sorted_by.msg = "sorted by '{}'{}".format(key, " descending" if reverse else "")
+    sorted_by.is_constraint = True
+    sorted_by.cost = 50
+    return sorted_by
+
+
+def values_at(x, path, where=""):
+    """`(location, value)` of every value `path` leads to in `x`, going through every item of the lists on the way"""
+    if isinstance(x, (list, tuple)):
+        for i, item in enumerate(x):
+            yield from values_at(item, path, "{}[{}] ".format(where, i))
+    elif not path:
+        yield where.rstrip(), x
+    elif isinstance(x, Mapping) and path[0] in x:
+        yield from values_at(x[path[0]], path[1:], "{}['{}'] ".format(where, path[0]))
+
+
+def references(source, target):
+    """
+    Constraint that every value at the `source` path is one of the values at the `target` path, both relative to
+    the value it's put on: `({...}, references("[orders].warehouse_id", "[warehouses].id"))`. Paths are written like
+    schema keys and go through every item of the lists on the way
+    """
+    source_path = tuple(p.strip("[]") for p in source.split("."))
+    target_path = tuple(p.strip("[]") for p in target.split("."))
+
+    def references(x, field=None):
+        known = set()
+        for where, value in values_at(x, target_path):
+            try:
+                known.add(freeze(value))
+            except TypeError:
+                pass
+        found = []
+        for where, value in values_at(x, source_path):
+            try:
+                if freeze(value) in known:
+                    continue
+            except TypeError:
+                pass
+            found.append((where, "'{}'".format(value) if type(value) is str else value))
+        if found:
+            return False, "must reference existing {} (but {})".format(target, listing(found, "{} is {}"))
+        return True, None
+
+    references.msg = "references to {}".format(target)
+    references.is_constraint = True
+    references.cost = 50
+    return references
+
+
+def to_decimal(x, field=None):
+    if isinstance(x, bool) or not isinstance(x, (int, float, str, Decimal)):
+        return False, x
+    try:
+        value = Decimal(str(x))
+    except InvalidOperation:
+        return False, x
+    if not value.is_finite():
+        return False, x
+    return True, value
+
+
+to_decimal.msg = "decimal"
+to_decimal.cost = 5
+to_decimal.is_safe = True
+to_decimal.is_coercing = True
+
+
+def to_datetime(x, field=None):
+    if not isinstance(x, str):
+        return False, x
+    try:
+        # fromisoformat() only learnt about the `Z` suffix in Python 3.11
+        return True, datetime.fromisoformat(x[:-1] + "+00:00" if x.endswith("Z") else x)
+    except ValueError:
+        return False, x
+
+
+to_datetime.msg = "an iso 8601 datetime"
+to_datetime.cost = 5
+to_datetime.is_safe = True
+to_datetime.is_coercing = True
+
+
+def to_lower(x, field=None):
+    if not isinstance(x, str):
+        return False, x
+    return True, x.lower()
+
+
+to_lower.msg = "string"
+to_lower.cost = 2
+to_lower.is_safe = True
+to_lower.is_coercing = True
@@ -0,0 +1,208 @@
+"""
+Measurements of what validation costs, used by the benchmarks in benchmarks/ and by the tests.
+
+memory() counts the bytes and allocations of a validate() call of each engine with tracemalloc, broken down by what
+they go to.
+"""
+import dis
+import gc
+import sys
+import tracemalloc
+from functools import lru_cache
+from pathlib import Path
+
+from tissuebox import compile, validate
+
+PACKAGE = str(Path(__file__).resolve().parent)
+ENGINES = ("interpreter", "compiled")
+CATEGORIES = ("errors", "paths", "messages", "schema", "other")
+# tracemalloc.reset_peak() came with Python 3.9, without it only the net growth of a step is seen
+RESET = hasattr(tracemalloc, "reset_peak")
+# Calls made before counting, for the caches and such of the first calls to settle
+WARM_UP = 3
+
+# Functions whose allocations all go to one category, in them and on the lines calling them
+FUNCTIONS = {
+    "normalise": "schema",
+    "copy_schema": "schema",
+    "expand": "schema",
+    "is_valid_schema": "schema",
+    "prefix": "messages",
+    "decorate": "messages",
+}
+ADD = {"BINARY_ADD", "INPLACE_ADD"}
+BUILD = {"BUILD_LIST", "BUILD_TUPLE"}
+FORMAT = {"FORMAT_VALUE", "BUILD_STRING"}
+LOOKUP = {"LOAD_ATTR", "LOAD_METHOD"}
+
+
+@lru_cache(maxsize=None)
+def operations(code):
+    """The instructions of `code` by the line they are on"""
+    lines = {}
+    line = None
+    for instruction in dis.get_instructions(code):
+        start = instruction.line_number if hasattr(instruction, "line_number") else instruction.starts_line
+        if start is not None:
+            line = start
+        lines.setdefault(line, []).append(instruction)
+    return lines
+
+
+def added(instruction):
+    return instruction.opname in ADD or (instruction.opname == "BINARY_OP" and instruction.argrepr in ("+", "+="))
+
+
+def category(code, lineno):
+    """
+    What the allocations of a line go to, told by the function it's in and the operations on it: a list or tuple built
+    to be added to another is a path, formatting makes a message, an empty list or an append grows the errors
+    """
+    if code.co_name in FUNCTIONS:
+        return FUNCTIONS[code.co_name]
+    instructions = operations(code).get(lineno, [])
+    for instruction in instructions:
+        if instruction.opname in ("LOAD_GLOBAL", "LOAD_NAME") and instruction.argval in FUNCTIONS:
+            return FUNCTIONS[instruction.argval]
+    for instruction, after in zip(instructions, instructions[1:]):
+        if instruction.opname in BUILD and instruction.arg and added(after):
+            return "paths"
+    for instruction in instructions:
+        if instruction.opname in FORMAT or (instruction.opname in LOOKUP and instruction.argval == "format"):
+            return "messages"
+    for instruction in instructions:
+        if (instruction.opname == "BUILD_LIST" and not instruction.arg) or (instruction.opname in LOOKUP and instruction.argval in ("append", "extend")):
+            return "errors"
+    return "other"
+
+
+class Allocations:
+    """
+    Counts what is allocated line by line: every time a line of tissuebox runs, the growth of the memory tracemalloc
+    traces since the line before is put against that line, along with what the functions outside of tissuebox it
+    called allocated. Several allocations in one step count as one and memory freed before more is allocated hides
+    as much, so the counts are lower bounds. Frames and other costs of tracing itself are left out as far as can be
+    """
+
+    def __init__(self):
+        self.bytes = dict.fromkeys(CATEGORIES, 0)
+        self.allocations = dict.fromkeys(CATEGORIES, 0)
+        self.categories = {}
+        self.where = None
+        self.last = 0
+        # Made once, a bound method made on every event would count as an allocation of the line
+        self.tracer = self.line
+
+    def call(self, frame, event, arg):
+        if frame.f_code.co_filename.startswith(PACKAGE) and frame.f_code.co_filename != __file__:
+            # The frame object handed to the trace function is a cost of tracing, not of the call
+            self.last += sys.getsizeof(frame)
+            self.line(frame, event, arg)
+            return self.tracer
+        return None
+
+    def line(self, frame, event, arg):
+        # With reset_peak() the peak since the line before catches what was allocated even if something as big was
+        # freed right after, like the previous path of a loop when the next one is made
+        grown = tracemalloc.get_traced_memory()[1 if RESET else 0] - self.last
+        if self.where is not None and grown > 0:
+            self.bytes[self.where] += grown
+            self.allocations[self.where] += 1
+        if event == "return":
+            frame = frame.f_back
+        if frame is None or not frame.f_code.co_filename.startswith(PACKAGE):
+            self.where = None
+        else:
+            self.where = self.categories.get((frame.f_code, frame.f_lineno)) or self.classify(frame)
+        # What this function holds would be freed once it returns and hide as much allocated by the next line, so it
+        # goes first. The tuple get_traced_memory() returns is gone by the time the peak is reset
+        self.last = tracemalloc.get_traced_memory()[0]
+        if RESET:
+            tracemalloc.reset_peak()
+        return self.tracer
+
+    def classify(self, frame):
+        return self.categories.setdefault((frame.f_code, frame.f_lineno), category(frame.f_code, frame.f_lineno))
+
+
+def runner(engine, schema):
+    """A function validating a payload against `schema` with `engine`, collecting the errors"""
+    if engine == "compiled":
+        compiled = compile(schema)
+        return lambda payload: compiled.validate(payload, [])
+    if engine == "interpreter":
+        return lambda payload: validate(payload, schema, [])
+    raise ValueError("engine must be one of {} (but {!r})".format(", ".join(ENGINES), engine))
+
+
+def peak(f, payload, number):
+    """The most memory, in bytes above what was in use before, a call of `f` took at once, averaged over `number` calls"""
+    total = 0
+    for _ in range(number):
+        if RESET:
+            tracemalloc.reset_peak()
+        else:
+            tracemalloc.clear_traces()
+        before = tracemalloc.get_traced_memory()[0]
+        f(payload)
+        total += tracemalloc.get_traced_memory()[1] - before
+    return total / number
+
+
+def memory(payload, schema, number=10, engines=ENGINES):
+    """
+    The memory a validate() of `payload` against `schema` takes with each engine, averaged over `number` calls:
+    `{engine: {"bytes": ..., "allocations": ..., "peak": ..., "categories": {category: {"bytes": ..., "allocations": ...}}}}`
+
+    `bytes` and `allocations` add up what was allocated during a call, whether or not it was freed before the end, and
+    are broken down into error lists, path lists, formatted messages, schema copies and the rest. `peak` is the most
+    held at once. Errors are collected and messages formatted, as validate() with an errors list does
+    """
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    previous = sys.gettrace()
+    collecting = gc.isenabled()
+    # A collection in the middle of a call frees memory that hides as much allocated, the counts would vary run to run
+    gc.disable()
+    results = {}
+    try:
+        for engine in engines:
+            f = runner(engine, schema)
+            # Warm up caches, compiled variants and the like
+            for _ in range(WARM_UP):
+                f(payload)
+            top = peak(f, payload, number)
+            counts = Allocations()
+            sys.settrace(counts.call)
+            try:
+                for _ in range(number):
+                    f(payload)
+            finally:
+                sys.settrace(previous)
+            results[engine] = {
+                "bytes": sum(counts.bytes.values()) / number,
+                "allocations": sum(counts.allocations.values()) / number,
+                "peak": top,
+                "categories": {
+                    c: {"bytes": counts.bytes[c] / number, "allocations": counts.allocations[c] / number} for c in CATEGORIES
+                },
+            }
+    finally:
+        if collecting:
+            gc.enable()
+        if not tracing:
+            tracemalloc.stop()
+    return results
+
+
+def report(results, file=None):
+    """Print what memory() returned as a table, one row per engine and category"""
+    out = file or sys.stdout
+    print("{:<12} {:<9} {:>12} {:>12}".format("engine", "category", "bytes/call", "allocs/call"), file=out)
+    for engine, r in results.items():
+        for c in CATEGORIES:
+            counts = r["categories"][c]
+            print("{:<12} {:<9} {:>12.0f} {:>12.1f}".format(engine, c, counts["bytes"], counts["allocations"]), file=out)
+        print("{:<12} {:<9} {:>12.0f} {:>12.1f}".format(engine, "total", r["bytes"], r["allocations"]), file=out)
+        print("{:<12} {:<9} {:>12.0f}".format(engine, "peak", r["peak"]), file=out)
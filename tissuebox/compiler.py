@@ -0,0 +1,1373 @@
+import copy
+import re
+import threading
+import warnings
+from collections.abc import Mapping
+from math import floor, gcd, isinf
+from time import monotonic, perf_counter
+
+from tissuebox import SchemaError, decorate, is_valid_schema, msg, normalise, primitives, sort_unique
+from tissuebox.access import ACCESS, access
+from tissuebox.aggregate import collect, summarise
+from tissuebox.basic import DEPTH_MESSAGE, ITEMS_MESSAGE, KEYS_MESSAGE, LEN_MESSAGE, integer, numeric
+from tissuebox.deadline import budget
+from tissuebox.records import record_class
+
+LEAF, DICT, ITEMS, LIST = range(4)
+EXTRA = ("ignore", "strip", "forbid")
+LIMITS = ("max_depth", "max_items", "max_len", "max_keys")
+
+# Relative cost of a tissue without a `.cost`, the checks of tissuebox.basic go from 1 for an isinstance() to 30
+DEFAULT_COST = 10
+CONTAINER_COST = 100
+# Or unions re-rank their alternatives by hits after this many checks
+ADAPT_EVERY = 1000
+
+# Projections a compiled schema, and validate() for plain ones, keeps, the oldest goes first
+MAX_PROJECTIONS = 128
+# Schemas parse() and validate_into() keep compiled, the oldest goes first
+MAX_COMPILED = 128
+
+# Taken to add to and evict from the caches of projections, compiled and plain
+projections_lock = threading.Lock()
+
+# The deadline, sample and profile of the validate() call running on this thread, for the nodes of the tree variants using them
+current = threading.local()
+
+
+def copy_schema(schema):
+    """Copy the containers of a schema so normalise() never touches the caller's dicts"""
+    if type(schema) is dict:
+        return {k: copy_schema(v) for k, v in schema.items()}
+    if type(schema) is list:
+        return [copy_schema(s) for s in schema]
+    if type(schema) is tuple:
+        return tuple(copy_schema(s) for s in schema)
+    return schema
+
+
+def tokens(key):
+    """`[kids].name` -> ('kids', 'name'), the path of a schema key with list markers dropped"""
+    return tuple(part[1:-1] if part.startswith("[") and part.endswith("]") else part for part in key.split("."))
+
+
+def required_plan(schema, path=(), optional=frozenset()):
+    """
+    Precompute the walk check_required_fields() does over a dict schema, `None` when there is nothing to check.
+
+    Fields whose path is in `optional` may be missing without an error
+    """
+    if "*" in schema:
+        return None
+
+    plan = []
+    for k, v in schema.items():
+        if type(k) is not str:
+            continue
+        field_path = path + tokens(k)
+        required = field_path not in optional
+        if k.startswith("[") and k.endswith("]"):
+            key = k[1:-1]
+            sub = required_plan(v, field_path, optional) if isinstance(v, dict) else None
+            plan.append((LIST, key, "['{}']".format(key), sub, required))
+        elif isinstance(v, dict):
+            plan.append((DICT, k, "['{}']".format(k), required_plan(v, field_path, optional), required))
+        elif isinstance(v, list):
+            item = v[0] if v else None
+            sub = required_plan(item, field_path, optional) if isinstance(item, dict) else None
+            plan.append((ITEMS, k, "['{}']".format(k), sub, required))
+        else:
+            plan.append((LEAF, k, "['{}']".format(k), None, required))
+    return plan
+
+
+def check_required(plan, payload, errors, path="", access=None, max_items=None):
+    """
+    Same messages as check_required_fields() without re-deriving them from the schema on every call. Lists longer
+    than `max_items` aren't walked, their node reports them
+    """
+    if access is not None:
+        # What can't be read as a dict is reported as such by its node, there are no fields to look for
+        payload = access.view(payload)
+        if payload is None:
+            return
+    for kind, key, label, sub, required in plan:
+        if kind is LIST:
+            if key not in payload:
+                if required:
+                    errors.append(path + label + " must be a list")
+            elif not is_list(payload[key], access):
+                errors.append(path + label + " must be a list")
+            elif sub and (max_items is None or len(payload[key]) <= max_items):
+                for i, item in enumerate(payload[key]):
+                    check_required(sub, item, errors, "{}{}[{}]".format(path, label, i), access, max_items)
+            continue
+
+        if key not in payload:
+            if required:
+                errors.append(path + label + " is required")
+        elif not sub:
+            continue
+        elif kind is DICT:
+            check_required(sub, payload[key], errors, path + label, access, max_items)
+        elif kind is ITEMS and is_list(payload[key], access) and (max_items is None or len(payload[key]) <= max_items):
+            for i, item in enumerate(payload[key]):
+                check_required(sub, item, errors, "{}{}[{}]".format(path, label, i), access, max_items)
+
+
+def is_list(payload, access):
+    return isinstance(payload, list) or (access is not None and access.is_list(payload))
+
+
+def prefix(errors, n, p):
+    errors[n:] = [p + e for e in errors[n:]]
+
+
+class Node:
+    """
+    A compiled schema element.
+
+    validate() appends the same messages validate() of the interpreter would, check() answers with a boolean only and
+    stops on the first failure, parse() returns the payload rebuilt with the converted values of coercing tissues.
+
+    Like the interpreter, validate() returns `False` when it bails out on a payload of the wrong container type, the
+    errors are left unsorted in that case. A `safe` node never raises, whatever the payload, so check() may skip it
+    or run it out of order.
+    """
+
+    coercing = False
+    guard = False
+    safe = False
+    cost = DEFAULT_COST
+
+    def check(self, payload, field):
+        E = []
+        self.validate(payload, E, field)
+        return not E
+
+    def parse(self, payload, errors, field):
+        self.validate(payload, errors, field)
+        return payload
+
+
+class Literal(Node):
+    cost = 1
+    safe = True
+
+    def __init__(self, value):
+        self.value = value
+        self.label = msg(value)
+
+    def validate(self, payload, errors, field):
+        if not self.value == payload:
+            errors.append("must be {} (but {})".format(self.label, decorate(payload)))
+
+    def check(self, payload, field):
+        return bool(self.value == payload)
+
+
+class Tissue(Node):
+    def __init__(self, tissue):
+        self.tissue = tissue
+        self.label = msg(tissue)
+        self.cost = getattr(tissue, "cost", DEFAULT_COST)
+        self.safe = hasattr(tissue, "is_safe")
+
+    def validate(self, payload, errors, field):
+        if not self.tissue(payload, field=field):
+            errors.append("must be {} (but {})".format(self.label, decorate(payload)))
+
+    def check(self, payload, field):
+        return bool(self.tissue(payload, field=field))
+
+
+class EarlyExit(Node):
+    def __init__(self, tissue):
+        self.tissue = tissue
+        self.cost = getattr(tissue, "cost", DEFAULT_COST)
+
+    def validate(self, payload, errors, field):
+        result, error = self.tissue(payload, field=field)
+        if not result:
+            errors.append(error)
+
+    def check(self, payload, field):
+        return bool(self.tissue(payload, field=field)[0])
+
+
+class Guard(EarlyExit):
+    guard = True
+
+    def __init__(self, tissue):
+        super().__init__(tissue)
+        self.cost = getattr(tissue, "cost", 0)
+
+
+class Limit(Node):
+    """A compile() wide limit, probed with len() before the node it wraps gets to do any work"""
+
+    def __init__(self, node, n, kinds, message):
+        self.node = node
+        self.n = n
+        self.kinds = kinds
+        self.message = message
+        self.coercing = node.coercing
+        self.safe = node.safe
+        self.cost = node.cost
+
+    def exceeded(self, payload):
+        return isinstance(payload, self.kinds) and len(payload) > self.n
+
+    def validate(self, payload, errors, field):
+        if self.exceeded(payload):
+            errors.append(self.message.format(self.n, len(payload)))
+            return
+        return self.node.validate(payload, errors, field)
+
+    def check(self, payload, field):
+        return not self.exceeded(payload) and self.node.check(payload, field)
+
+    def parse(self, payload, errors, field):
+        if self.exceeded(payload):
+            errors.append(self.message.format(self.n, len(payload)))
+            return payload
+        return self.node.parse(payload, errors, field)
+
+
+class TooDeep(Limit):
+    """Stands in front of a dict or list schema nested deeper than max_depth, any container there is too deep"""
+
+    def exceeded(self, payload):
+        return isinstance(payload, self.kinds)
+
+
+class Step(Node):
+    """Counts a value against the deadline and keeps track of where in the payload validation is"""
+
+    def __init__(self, node, segment, field, element):
+        self.node = node
+        self.segment = segment
+        self.field = field
+        self.element = element
+        self.coercing = node.coercing
+        self.safe = node.safe
+        self.cost = node.cost
+
+    def validate(self, payload, errors, field):
+        budget = current.budget
+        budget.enter(self.segment, field, self.field, self.element)
+        result = self.node.validate(payload, errors, field)
+        budget.leave()
+        return result
+
+    def check(self, payload, field):
+        budget = current.budget
+        budget.enter(self.segment, field, self.field, self.element)
+        result = self.node.check(payload, field)
+        budget.leave()
+        return result
+
+
+class Timed(Node):
+    """Puts the time a tissue takes against the field it runs on"""
+
+    def __init__(self, node):
+        self.node = node
+        self.label = msg(node.tissue)
+        self.coercing = node.coercing
+        self.guard = node.guard
+        self.safe = node.safe
+        self.cost = node.cost
+
+    def validate(self, payload, errors, field):
+        start = monotonic()
+        result = self.node.validate(payload, errors, field)
+        current.budget.charge(self.label, start)
+        return result
+
+    def check(self, payload, field):
+        start = monotonic()
+        result = self.node.check(payload, field)
+        current.budget.charge(self.label, start)
+        return result
+
+    def parse(self, payload, errors, field):
+        start = monotonic()
+        result = self.node.parse(payload, errors, field)
+        current.budget.charge(self.label, start)
+        return result
+
+
+class Profiled(Node):
+    """
+    Counts the runs, failures and time of the field it's reached through or, with a `label`, of the tissue it wraps
+    against the Profile of the running validation
+    """
+
+    def __init__(self, node, field, label=None):
+        self.node = node
+        self.field = field
+        self.label = label
+        self.coercing = node.coercing
+        self.guard = node.guard
+        self.safe = node.safe
+        self.cost = node.cost
+
+    def validate(self, payload, errors, field):
+        profile = current.profile
+        n = len(errors)
+        start = profile.enter(self.field)
+        failed = True
+        try:
+            result = self.node.validate(payload, errors, field)
+            failed = result is False or len(errors) > n
+            return result
+        finally:
+            profile.leave(self.label, start, failed)
+
+    def check(self, payload, field):
+        profile = current.profile
+        start = profile.enter(self.field)
+        result = False
+        try:
+            result = self.node.check(payload, field)
+            return result
+        finally:
+            profile.leave(self.label, start, not result)
+
+    def parse(self, payload, errors, field):
+        profile = current.profile
+        n = len(errors)
+        start = profile.enter(self.field)
+        failed = True
+        try:
+            result = self.node.parse(payload, errors, field)
+            failed = len(errors) > n
+            return result
+        finally:
+            profile.leave(self.label, start, failed)
+
+
+class Coerce(Tissue):
+    coercing = True
+
+    def validate(self, payload, errors, field):
+        self.parse(payload, errors, field)
+
+    def check(self, payload, field):
+        return bool(self.tissue(payload, field=field)[0])
+
+    def parse(self, payload, errors, field):
+        result, value = self.tissue(payload, field=field)
+        if not result:
+            errors.append("must be {} (but {})".format(self.label, decorate(payload)))
+            return payload
+        return value
+
+
+class And(Node):
+    """
+    A `()` chain. validate() runs every member anyway. check() stops at the first failure among the safe members, so
+    it runs them cheapest first, except in chains with coercing tissues where each member needs the value of the one
+    before. The members which may raise are all run in declared order, as the interpreter does, whatever the others say
+    """
+
+    def __init__(self, nodes):
+        self.guards = [node for node in nodes if node.guard]
+        self.nodes = nodes = [node for node in nodes if not node.guard]
+        self.coercing = any(node.coercing for node in nodes)
+        self.safe = all(node.safe for node in self.guards + nodes)
+        self.cost = sum(node.cost for node in nodes)
+        self.ordered = sorted((node for node in nodes if node.safe), key=lambda node: node.cost)
+        self.unsafe = [node for node in nodes if not node.safe]
+
+    def guarded(self, payload, errors, field):
+        """Run the guards, which come before the other members wherever they are declared, False if any fails"""
+        n = len(errors)
+        for node in self.guards:
+            node.validate(payload, errors, field)
+        return len(errors) == n
+
+    def validate(self, payload, errors, field):
+        if self.guards and not self.guarded(payload, errors, field):
+            return
+        if self.coercing:
+            self.parse(payload, errors, field)
+            return
+        for node in self.nodes:
+            node.validate(payload, errors, field)
+
+    def check(self, payload, field):
+        for node in self.guards:
+            if not node.check(payload, field):
+                return False
+        if not self.coercing:
+            return checked(self.ordered, self.unsafe, payload, field)
+        passed = True
+        for node in self.nodes:
+            if node.coercing:
+                E = []
+                payload = node.parse(payload, E, field)
+                if E:
+                    # The interpreter stops the chain here too
+                    return False
+            elif passed or not node.safe:
+                passed = node.check(payload, field) and passed
+        return passed
+
+    def parse(self, payload, errors, field):
+        if self.guards and not self.guarded(payload, errors, field):
+            return payload
+        for node in self.nodes:
+            n = len(errors)
+            value = node.parse(payload, errors, field)
+            if len(errors) == n:
+                payload = value
+            elif node.coercing:
+                # The rest of the chain expects the converted value
+                break
+        return payload
+
+
+def first_pass(nodes, payload, field):
+    for node in nodes:
+        if node.check(payload, field):
+            return node
+    return None
+
+
+class Range(Node):
+    """
+    A chain of an integer/numeric check with lt, gt and divisible fused into one predicate.
+
+    Only the tightest bounds and the least common multiple of integer divisors are evaluated, for int and float
+    payloads. Anything else, and every failure, goes through the original members so the messages and exceptions
+    don't change
+    """
+
+    def __init__(self, nodes, integral, lower, upper, steps):
+        self.nodes = nodes
+        self.integral = integral
+        self.lower = lower
+        self.upper = upper
+        self.steps = steps
+        self.int_steps = all(type(n) is int for n in steps)
+        self.safe = all(node.safe for node in nodes)
+        self.ordered = [node for node in nodes if node.safe]
+        self.unsafe = [node for node in nodes if not node.safe]
+        self.cost = 2
+
+    def fits(self, payload):
+        """True or False when the fused predicate can answer, `None` when only the members can"""
+        t = type(payload)
+        if t is float:
+            if self.integral:
+                return False
+        elif t is not int or not self.int_steps:
+            return None
+        if self.lower is not None and not payload > self.lower:
+            return False
+        if self.upper is not None and not payload < self.upper:
+            return False
+        for n in self.steps:
+            if payload % n != 0:
+                return False
+        return True
+
+    def validate(self, payload, errors, field):
+        if self.fits(payload) is not True:
+            for node in self.nodes:
+                node.validate(payload, errors, field)
+
+    def check(self, payload, field):
+        result = self.fits(payload)
+        if result is None:
+            return checked(self.ordered, self.unsafe, payload, field)
+        return result
+
+
+def fuse(nodes):
+    """A Range for a chain made only of integer/numeric, lt, gt and divisible, `None` for any other chain"""
+    if len(nodes) < 2 or not all(type(node) is Tissue for node in nodes):
+        return None
+
+    integral, lower, upper, steps = False, None, None, []
+    for node in nodes:
+        tissue = node.tissue
+        bound = getattr(tissue, "greater_than", getattr(tissue, "less_than", getattr(tissue, "multiple_of", None)))
+        if tissue is integer:
+            integral = True
+        elif tissue is numeric:
+            continue
+        elif type(bound) not in (int, float) or bound != bound:
+            # Decimal, bool and NaN bounds behave differently enough to leave them to the members
+            return None
+        elif hasattr(tissue, "greater_than"):
+            lower = bound if lower is None else max(lower, bound)
+        elif hasattr(tissue, "less_than"):
+            upper = bound if upper is None else min(upper, bound)
+        elif bound:
+            steps.append(bound)
+        else:
+            return None
+
+    if lower is None and upper is None and not steps:
+        return None
+
+    if steps and all(type(n) is int for n in steps):
+        step = 1
+        for n in steps:
+            step = step * abs(n) // gcd(step, abs(n))
+        steps = [step]
+
+    if empty(integral, lower, upper, steps):
+        warnings.warn("No value can be {}".format(", ".join(msg(node.tissue) for node in nodes)))
+    return Range(nodes, integral, lower, upper, steps)
+
+
+def empty(integral, lower, upper, steps):
+    if lower is None or upper is None:
+        return False
+    if lower >= upper:
+        return True
+    if isinf(lower) or isinf(upper):
+        return False
+    if steps and type(steps[0]) is int:
+        step = steps[0]
+    elif integral:
+        step = 1
+    else:
+        return False
+    return not (floor(lower) // step + 1) * step < upper
+
+
+def all_pass(nodes, payload, field):
+    for node in nodes:
+        if not node.check(payload, field):
+            return False
+    return True
+
+
+def checked(safe, unsafe, payload, field):
+    """
+    Whether every node passes. The `safe` nodes stop at the first failure, the others all run whatever happens so
+    they raise what the interpreter, which runs every member of a chain, would
+    """
+    passed = all_pass(safe, payload, field)
+    for node in unsafe:
+        passed = node.check(payload, field) and passed
+    return passed
+
+
+class Or(Node):
+    """
+    A `{}` union. check() tries the safe alternatives most often hit first, re-ranking them every ADAPT_EVERY checks,
+    and stops at the first that passes. The alternatives which may raise are all run, as the interpreter runs every
+    one. The message doesn't depend on the order and parse() keeps the declared one since it returns the first
+    conversion that succeeds
+    """
+
+    def __init__(self, nodes, schema):
+        self.nodes = nodes
+        self.schema = schema
+        self.coercing = any(node.coercing for node in nodes)
+        self.safe = all(node.safe for node in nodes)
+        self.cost = sum(node.cost for node in nodes)
+        self.ordered = [node for node in nodes if node.safe]
+        self.unsafe = [node for node in nodes if not node.safe]
+        self.hits = dict.fromkeys(self.ordered, 0)
+        self.calls = 0
+
+    def message(self, payload):
+        labels = sorted([msg(s) for s in self.schema])
+        if len(self.schema) > 1:
+            return " must be either {} or {} (but {})".format(", ".join(labels[:-1]), labels[-1], payload)
+        return " must be {} (but {})".format(labels[0], payload)
+
+    def validate(self, payload, errors, field):
+        if not self.check(payload, field):
+            errors.append(self.message(payload))
+
+    def check(self, payload, field):
+        node = first_pass(self.ordered, payload, field)
+        passed = node is not None
+        for other in self.unsafe:
+            passed = other.check(payload, field) or passed
+        if node is not None and len(self.ordered) > 1:
+            self.hit(node)
+        return passed
+
+    def hit(self, node):
+        self.hits[node] += 1
+        self.calls += 1
+        if self.calls >= ADAPT_EVERY:
+            self.ordered = sorted(self.hits, key=self.hits.__getitem__, reverse=True)
+            # Halve the counts so the ranking follows shifts in the traffic
+            self.hits = {n: h // 2 for n, h in self.hits.items()}
+            self.calls = 0
+
+    def parse(self, payload, errors, field):
+        if not self.coercing:
+            self.validate(payload, errors, field)
+            return payload
+        for node in self.nodes:
+            E = []
+            value = node.parse(payload, E, field)
+            if not E:
+                return value
+        errors.append(self.message(payload))
+        return payload
+
+
+BACKREFERENCE = re.compile(r"\\[1-9]|\(\?P=")
+
+
+class Patterns:
+    """
+    Picks the schema of a key by the first of the pattern keys it matches.
+
+    The patterns are merged into a single alternation with one named group each, so a key is classified by one
+    match() call. Patterns which can't be merged faithfully, with differing flags or backreferences, are tried one by
+    one instead
+    """
+
+    def __init__(self, patterns):
+        self.patterns = patterns
+        self.groups = {"_p{}".format(i): node for i, (pattern, node) in enumerate(patterns)}
+        self.combined = combine([pattern for pattern, node in patterns])
+
+    def node(self, key):
+        """The node for `key`, `None` when no pattern matches it"""
+        if type(key) is not str:
+            return None
+        if self.combined is not None:
+            match = self.combined.match(key)
+            return None if match is None else self.groups[match.lastgroup]
+        for pattern, node in self.patterns:
+            if pattern.match(key):
+                return node
+        return None
+
+
+def combine(patterns):
+    flags = {pattern.flags for pattern in patterns}
+    if len(flags) > 1 or any(type(p.pattern) is not str or BACKREFERENCE.search(p.pattern) for p in patterns):
+        return None
+    flags = flags.pop()
+    # A verbose pattern may end in a comment which would swallow the closing parenthesis
+    end = "\n" if flags & re.VERBOSE else ""
+    try:
+        return re.compile("|".join("(?P<_p{}>{}{})".format(i, p.pattern, end) for i, p in enumerate(patterns)), flags)
+    except re.error:
+        return None
+
+
+class Dict(Node):
+    cost = CONTAINER_COST
+    max_items = None
+
+    def __init__(self, plan, fields, wildcard, defaults=None, extra="ignore", access=None, patterns=None):
+        self.plan = plan
+        self.fields = [(k, "['{}'] ".format(k), node) for k, node in fields]
+        self.lookup = {k: (p, node) for k, p, node in self.fields}
+        self.allowed = frozenset(self.lookup)
+        self.wildcard = wildcard
+        self.defaults = defaults or {}
+        self.extra = "ignore" if wildcard is not None else extra
+        self.access = access
+        self.patterns = Patterns(patterns) if patterns else None
+        # check_required() raises on some payloads which aren't dicts, a dict requiring fields is never safe
+        nodes = [node for k, p, node in self.fields] + [node for pattern, node in patterns or ()]
+        self.safe = not plan and all(node.safe for node in nodes + [wildcard] if node is not None)
+
+    def view(self, payload):
+        """The payload as something dict-like, `None` when it isn't one"""
+        if type(payload) is dict:
+            return payload
+        return None if self.access is None else self.access.view(payload)
+
+    def forbidden(self, payload, errors):
+        for key in payload.keys() - self.allowed:
+            if self.patterns is None or self.patterns.node(key) is None:
+                errors.append("['{}'] is not allowed".format(key))
+
+    def others(self, payload):
+        """The payload items whose key isn't a field but matches a pattern, along with the pattern's node"""
+        lookup, patterns = self.lookup, self.patterns
+        for key, value in payload.items():
+            if key not in lookup:
+                node = patterns.node(key)
+                if node is not None:
+                    yield key, value, node
+
+    def validate(self, payload, errors, field):
+        view = self.view(payload)
+        if self.plan:
+            check_required(self.plan, payload if view is None else view, errors, "", self.access, self.max_items)
+
+        if view is None:
+            errors.append("must be dict")
+            return False
+        payload = view
+
+        if self.extra == "forbid":
+            self.forbidden(payload, errors)
+
+        if self.wildcard is not None:
+            node = self.wildcard
+            for key, value in payload.items():
+                n = len(errors)
+                node.validate(value, errors, key)
+                if len(errors) > n:
+                    prefix(errors, n, "['{}'] ".format(key))
+            return
+
+        for key, p, node in self.fields:
+            if key in payload:
+                n = len(errors)
+                node.validate(payload[key], errors, key)
+                if len(errors) > n:
+                    prefix(errors, n, p)
+
+        if self.patterns is not None:
+            for key, value, node in self.others(payload):
+                n = len(errors)
+                node.validate(value, errors, key)
+                if len(errors) > n:
+                    prefix(errors, n, "['{}'] ".format(key))
+
+    def check(self, payload, field):
+        # After a failure only the values whose node may raise are still checked, as the interpreter checks them all
+        view = self.view(payload)
+        passed = True
+        if self.plan:
+            E = []
+            check_required(self.plan, payload if view is None else view, E, "", self.access, self.max_items)
+            passed = not E
+
+        if view is None:
+            return False
+        payload = view
+
+        if passed and self.extra == "forbid" and not payload.keys() <= self.allowed:
+            if self.patterns is None or any(self.patterns.node(k) is None for k in payload.keys() - self.allowed):
+                passed = False
+
+        if self.wildcard is not None:
+            node = self.wildcard
+            if node.safe:
+                return passed and all(node.check(value, key) for key, value in payload.items())
+            for key, value in payload.items():
+                passed = node.check(value, key) and passed
+            return passed
+
+        for key, p, node in self.fields:
+            if key in payload and (passed or not node.safe):
+                passed = node.check(payload[key], key) and passed
+
+        if self.patterns is not None:
+            for key, value, node in self.others(payload):
+                if passed or not node.safe:
+                    passed = node.check(value, key) and passed
+        return passed
+
+    def parse(self, payload, errors, field):
+        view = self.view(payload)
+        if self.plan:
+            check_required(self.plan, payload if view is None else view, errors, "", self.access, self.max_items)
+
+        if view is None:
+            errors.append("must be dict")
+            return payload
+        payload = view
+
+        if self.extra == "forbid":
+            self.forbidden(payload, errors)
+
+        parsed = {}
+        for key, value in payload.items():
+            if self.wildcard is not None:
+                node, p = self.wildcard, None
+            else:
+                p, node = self.lookup.get(key, (None, None))
+                if node is None and self.patterns is not None:
+                    node = self.patterns.node(key)
+                if node is None:
+                    if self.extra == "ignore":
+                        parsed[key] = value
+                    continue
+            n = len(errors)
+            parsed[key] = node.parse(value, errors, key)
+            if len(errors) > n:
+                prefix(errors, n, p or "['{}'] ".format(key))
+
+        for key, value in self.defaults.items():
+            if key not in payload:
+                parsed[key] = copy.deepcopy(value)
+        return parsed
+
+
+class List(Node):
+    cost = CONTAINER_COST
+
+    def __init__(self, item, aggregate=False, access=None):
+        self.item = item
+        self.aggregate = aggregate
+        self.access = access
+        self.safe = item is None or item.safe
+
+    def is_list(self, payload):
+        return type(payload) is list or (self.access is not None and self.access.is_list(payload))
+
+    def elements(self, payload):
+        return enumerate(payload)
+
+    def validate(self, payload, errors, field):
+        if not self.is_list(payload):
+            errors.append("must be list")
+            return False
+
+        item = self.item
+        if item is None:
+            return
+
+        if self.aggregate:
+            groups = {}
+            for i, p in self.elements(payload):
+                E = []
+                item.validate(p, E, str(i))
+                for e in E:
+                    collect(groups, i, e, errors)
+            summarise(groups, errors)
+            return
+
+        for i, p in self.elements(payload):
+            n = len(errors)
+            item.validate(p, errors, str(i))
+            if len(errors) > n:
+                prefix(errors, n, "[{}] ".format(i))
+
+    def check(self, payload, field):
+        if not self.is_list(payload):
+            return False
+
+        item = self.item
+        if item is None:
+            return True
+
+        if item.safe:
+            return all(item.check(p, str(i)) for i, p in self.elements(payload))
+        # Every element is checked, one may raise as it does with the interpreter
+        passed = True
+        for i, p in self.elements(payload):
+            passed = item.check(p, str(i)) and passed
+        return passed
+
+    def parse(self, payload, errors, field):
+        if not self.is_list(payload):
+            errors.append("must be list")
+            return payload
+
+        item = self.item
+        if item is None:
+            return list(payload)
+
+        parsed = []
+        for i, p in enumerate(payload):
+            n = len(errors)
+            parsed.append(item.parse(p, errors, str(i)))
+            if len(errors) > n:
+                prefix(errors, n, "[{}] ".format(i))
+        return parsed
+
+
+class SampledList(List):
+    """Validates the elements the sample of the call picks, validation only"""
+
+    def elements(self, payload):
+        return ((i, payload[i]) for i in current.sample.indices(len(payload)))
+
+
+class Tagged(Node):
+    """One dict lookup on the tag picks the branch, the other branches are never looked at"""
+
+    cost = CONTAINER_COST
+
+    def __init__(self, tissue, branches, access=None):
+        self.tissue = tissue
+        self.key = tissue.key
+        self.branches = branches
+        self.access = access
+
+    def select(self, payload, errors):
+        """The branch node for the payload, `None` after reporting why there isn't one"""
+        if type(payload) is dict:
+            view = payload
+        else:
+            view = None if self.access is None else self.access.view(payload)
+        if view is None:
+            errors.append("must be dict")
+            return None
+        if self.key not in view:
+            errors.append("['{}'] is required".format(self.key))
+            return None
+        tag = view[self.key]
+        try:
+            node = self.branches.get(tag)
+        except TypeError:
+            node = None
+        if node is None:
+            errors.append(self.tissue.unknown(tag))
+        return node
+
+    def validate(self, payload, errors, field):
+        node = self.select(payload, errors)
+        if node is not None:
+            node.validate(payload, errors, field)
+
+    def check(self, payload, field):
+        node = self.select(payload, [])
+        return node is not None and node.check(payload, field)
+
+    def parse(self, payload, errors, field):
+        node = self.select(payload, errors)
+        return payload if node is None else node.parse(payload, errors, field)
+
+
+class RecordDict(Dict):
+    """parse() builds an instance of a generated `__slots__` record class instead of a dict"""
+
+    def __init__(self, plan, fields, path, defaults=None, extra="ignore", access=None):
+        super().__init__(plan, fields, None, defaults, extra, access)
+        self.record = record_class(path, [k for k, p, node in self.fields])
+
+    def parse(self, payload, errors, field):
+        view = self.view(payload)
+        if self.plan:
+            check_required(self.plan, payload if view is None else view, errors, "", self.access, self.max_items)
+
+        if view is None:
+            errors.append("must be dict")
+            return payload
+        payload = view
+
+        if self.extra == "forbid":
+            self.forbidden(payload, errors)
+
+        values = []
+        for key, p, node in self.fields:
+            if key in payload:
+                n = len(errors)
+                values.append(node.parse(payload[key], errors, key))
+                if len(errors) > n:
+                    prefix(errors, n, p)
+            else:
+                values.append(copy.deepcopy(self.defaults.get(key)))
+        return self.record(*values)
+
+
+class TupleList(List):
+    """parse() builds a tuple instead of a list"""
+
+    def parse(self, payload, errors, field):
+        parsed = super().parse(payload, errors, field)
+        return tuple(parsed) if type(parsed) is list else parsed
+
+
+class Builder:
+    """Turns a normalised schema into nodes, carrying the compile() options down the tree"""
+
+    def __init__(
+        self,
+        aggregate=False,
+        defaults=None,
+        extra="ignore",
+        access_mode="dict",
+        limits=None,
+        records=False,
+        timed=False,
+        sampled=False,
+        profiled=False,
+    ):
+        if extra not in EXTRA:
+            raise SchemaError("extra must be one of {} (but {!r})".format(", ".join(EXTRA), extra))
+        if access_mode not in ACCESS:
+            raise SchemaError("access must be one of {} (but {!r})".format(", ".join(ACCESS), access_mode))
+        self.access = access(access_mode)
+        self.limits = limits or {}
+        for name, n in self.limits.items():
+            if name not in LIMITS or type(n) is not int or n < 0:
+                raise SchemaError("{} must be a non negative integer (but {!r})".format(name, n))
+        self.records = records
+        self.timed = timed
+        self.sampled = sampled
+        self.profiled = profiled
+        self.aggregate = aggregate
+        self.extra = extra
+        self.defaults = {tokens(k): v for k, v in (defaults or {}).items()}
+        self.optional = frozenset(self.defaults)
+        self.unused = set(self.defaults)
+
+    def build(self, schema, path=(), depth=0, step=None):
+        """
+        The node of a value, `depth` containers deep, behind the max_len limit. For deadline bound validation `step`
+        is the (segment, field, element) the value is reached through, see Budget.enter()
+        """
+        node = self.node(schema, path, depth)
+        if "max_len" in self.limits and type(schema) not in (dict, list) and not hasattr(schema, "is_tagged"):
+            node = Limit(node, self.limits["max_len"], (str, bytes, bytearray), LEN_MESSAGE)
+        if self.timed and step:
+            node = Step(node, *step)
+        if self.profiled:
+            node = Profiled(node, step[1] if step else "")
+        return node
+
+    def container(self, node, depth, kinds, limit, message):
+        """Put the max_depth limit, or failing that the size limit of the container, in front of a dict or list node"""
+        if "max_depth" in self.limits and depth >= self.limits["max_depth"]:
+            return TooDeep(node, self.limits["max_depth"], (Mapping, list, tuple), DEPTH_MESSAGE)
+        if limit in self.limits:
+            return Limit(node, self.limits[limit], kinds, message)
+        return node
+
+    def node(self, schema, path=(), depth=0):
+        if type(schema) is dict:
+            return self.container(self.dict_node(schema, path, depth), depth, Mapping, "max_keys", KEYS_MESSAGE)
+
+        if type(schema) is list:
+            if len(schema) > 1:
+                schema = [set(schema)]
+            item = self.build(schema[0], path, depth + 1, ("[{}] ", "[*] ", True)) if schema else None
+            kind = TupleList if self.records else SampledList if self.sampled else List
+            node = kind(item, self.aggregate, self.access)
+            return self.container(node, depth, (list, tuple), "max_items", ITEMS_MESSAGE)
+
+        if type(schema) is tuple:
+            if schema and hasattr(schema[0], "is_early_exit"):
+                return self.leaf(EarlyExit(schema[0]))
+            nodes = [self.node(s, path, depth) for s in schema]
+            guards = [node for node in nodes if node.guard]
+            fused = fuse([node for node in nodes if not node.guard])
+            if fused is None:
+                return And(nodes)
+            return And(guards + [fused]) if guards else fused
+
+        if type(schema) is set:
+            return Or([self.node(s, path, depth) for s in schema], schema)
+
+        if hasattr(schema, "is_tagged"):
+            branches = {tag: self.node(self.branch(schema.key, tag, s), path, depth) for tag, s in schema.branches.items()}
+            return Tagged(schema, branches, self.access)
+
+        if schema in primitives:
+            schema = primitives[schema]
+
+        if callable(schema):
+            if hasattr(schema, "is_guard"):
+                return self.leaf(Guard(schema))
+            if hasattr(schema, "is_early_exit") or hasattr(schema, "is_constraint"):
+                return self.leaf(EarlyExit(schema))
+            if hasattr(schema, "is_coercing"):
+                return self.leaf(Coerce(schema))
+            return self.leaf(Tissue(schema))
+
+        return Literal(schema)
+
+    def leaf(self, node):
+        label = msg(node.tissue)
+        if self.timed:
+            node = Timed(node)
+        if self.profiled:
+            node = Profiled(node, "", label)
+        return node
+
+    def dict_node(self, schema, path, depth):
+        schema = normalise(schema.copy())
+        plan = required_plan(schema, path, self.optional)
+        if "*" in schema:
+            node = Dict(plan, [], self.build(schema["*"], path, depth + 1, ("['{}'] ", "['*'] ", True)), access=self.access)
+        else:
+            fields = [
+                (k, self.build(v, path + (k,), depth + 1, ("['{}'] ", "['{}'] ".format(k), False)))
+                for k, v in schema.items()
+                if type(k) is str
+            ]
+            patterns = [
+                (k, self.build(v, path + (k.pattern,), depth + 1, ("['{}'] ", "['{}'] ".format(k.pattern), True)))
+                for k, v in schema.items()
+                if isinstance(k, re.Pattern)
+            ]
+            defaults = self.field_defaults(path, fields)
+            if patterns:
+                # Keys matching the patterns aren't known up front, such dicts stay dicts
+                node = Dict(plan, fields, None, defaults, self.extra, self.access, patterns)
+            elif self.records:
+                node = RecordDict(plan, fields, path, defaults, self.extra, self.access)
+            else:
+                node = Dict(plan, fields, None, defaults, self.extra, self.access)
+        # The required walk of the dict goes through its `[list].field` lists, only as long as they are within limits
+        node.max_items = self.limits.get("max_items")
+        return node
+
+    def branch(self, key, tag, schema):
+        """A copy of a tagged branch that also declares its tag, so extra="strip" and "forbid" leave the tag alone"""
+        schema = copy_schema(schema)
+        if type(schema) is dict and "*" not in schema and key not in schema:
+            schema[key] = tag
+        return schema
+
+    def field_defaults(self, path, fields):
+        defaults = {}
+        for k, node in fields:
+            if path + (k,) not in self.defaults:
+                continue
+            value = self.defaults[path + (k,)]
+            if not node.check(value, k):
+                raise SchemaError("Default {!r} of {} doesn't match its schema".format(value, ".".join(path + (k,))))
+            defaults[k] = value
+            self.unused.discard(path + (k,))
+        return defaults
+
+    def done(self):
+        if self.unused:
+            raise SchemaError("Defaults {} don't match any field".format(sorted(".".join(p) for p in self.unused)))
+
+
+class CompiledSchema:
+    """
+    A schema checked, normalised and turned into a tree of nodes once, ready to validate many payloads.
+
+    Validation gives the same answers and messages as validate() while skipping the per-call schema work
+    """
+
+    def __init__(self, schema, aggregate=False, defaults=None, extra="ignore", access="dict", limits=None, metrics=None, tracer=None):
+        if not is_valid_schema(schema):
+            raise SchemaError("Schema is invalid, Use SchemaInspector to debug the schema")
+        self.schema = schema
+        self.options = (aggregate, defaults, extra, access, limits)
+        self.variants = {}
+        self.projections = {}
+        builder = Builder(*self.options)
+        self.root = builder.build(copy_schema(schema))
+        builder.done()
+        self.metrics = metrics
+        self.tracer = tracer
+        if metrics is not None or tracer is not None:
+            # Set on the instance only, schemas compiled without a sink or a tracer don't pay for them
+            self.validate = self.observed
+
+    def variant(self, **options):
+        """The tree built with extra Builder options, built on first use"""
+        key = tuple(sorted(options.items()))
+        if key not in self.variants:
+            self.variants[key] = Builder(*self.options, **options).build(copy_schema(self.schema))
+        return self.variants[key]
+
+    def projection(self, only=None, exclude=None):
+        """
+        The compiled part of the schema the `only` paths lead to, less the parts the `exclude` paths lead to. Required
+        fields outside of it aren't checked. Compiled once per set of paths
+        """
+        key = None if only is None else frozenset(only), frozenset(exclude or ())
+        projected = self.projections.get(key)
+        if projected is None:
+            aggregate, defaults, extra, access, limits = self.options
+            only_paths = None if only is None else [tokens(p) for p in only]
+            exclude_paths = [tokens(p) for p in exclude or ()]
+            defaults = {k: v for k, v in (defaults or {}).items() if within(tokens(k), only_paths, exclude_paths)}
+            projected = CompiledSchema(project(self.schema, only, exclude), aggregate, defaults, extra, access, limits)
+            with projections_lock:
+                if len(self.projections) >= MAX_PROJECTIONS:
+                    del self.projections[next(iter(self.projections))]
+                projected = self.projections.setdefault(key, projected)
+        return projected
+
+    def validate(self, payload, errors=None, deadline=None, sample=None, only=None, exclude=None, profile=None):
+        """
+        With `deadline` (seconds) validation raises ValidationTimeout once it runs out of time, with a `sample` (a
+        Sample) only part of the elements of long lists are validated. `only` and `exclude` validate a projection(),
+        a `profile` (a Profile) adds up where the time goes
+        """
+        if only is not None or exclude:
+            return self.projection(only, exclude).validate(payload, errors, deadline, sample, profile=profile)
+        if deadline is not None or sample is not None or profile is not None:
+            return self.validate_with(payload, errors, budget(deadline), sample, profile)
+        if errors is None:
+            return self.root.check(payload, None)
+        if self.root.validate(payload, errors, None) is not False:
+            sort_unique(errors)
+        return not errors
+
+    def validate_with(self, payload, errors, deadline, sample, profile=None):
+        """
+        Validate on the variant of the tree that counts and times every value, samples long lists or profiles every
+        field and tissue, as needed. Only these variants have the hooks, the tree validate() uses otherwise has none
+        """
+        root = self.variant(timed=deadline is not None, sampled=sample is not None, profiled=profile is not None)
+        previous = getattr(current, "budget", None), getattr(current, "sample", None), getattr(current, "profile", None)
+        current.budget, current.sample, current.profile = deadline, sample, profile
+        try:
+            if errors is None:
+                return root.check(payload, None)
+            if root.validate(payload, errors, None) is not False:
+                sort_unique(errors)
+            return not errors
+        finally:
+            current.budget, current.sample, current.profile = previous
+
+    def observed(self, payload, errors=None, *args, **kwargs):
+        """
+        validate() reporting its time and errors to the metrics sink and its span to the tracer, errors are always
+        collected to that end. The validations the tracer samples run with a Trace as their profile
+        """
+        tracer = self.tracer
+        span = trace = None
+        if tracer is not None:
+            span = tracer.start("validate")
+            if tracer.sampled() and len(args) < 5 and kwargs.get("profile") is None:
+                trace = kwargs["profile"] = Trace(tracer, span)
+        E = []
+        start = perf_counter()
+        try:
+            CompiledSchema.validate(self, payload, E, *args, **kwargs)
+        except Exception as e:
+            if span is not None:
+                tracer.end(span, size=size(payload), error=repr(e), sampled=trace is not None)
+            raise
+        seconds = perf_counter() - start
+        if self.metrics is not None:
+            self.metrics.record(seconds, E)
+        if span is not None:
+            nodes = None if trace is None else trace.nodes
+            tracer.end(span, size=size(payload), errors=len(E), nodes=nodes, sampled=trace is not None)
+        if errors is None:
+            return not E
+        errors.extend(E)
+        sort_unique(errors)
+        return not errors
+
+    def parse(self, payload, errors=None):
+        """Validate and convert in one traversal, returns a new structure or `None` when the payload is invalid"""
+        if errors is None:
+            errors = []
+        value = self.root.parse(payload, errors, None)
+        if not bails(self.root, payload):
+            sort_unique(errors)
+        return None if errors else value
+
+    def validate_into(self, payload, errors=None):
+        """
+        Like parse() but dicts come out as instances of `__slots__` record classes generated for each dict schema and
+        lists as tuples. Wildcard dicts stay dicts since their keys aren't known up front
+        """
+        if errors is None:
+            errors = []
+        root = self.variant(records=True)
+        value = root.parse(payload, errors, None)
+        if not bails(root, payload):
+            sort_unique(errors)
+        return None if errors else value
+
+
+def bails(node, payload):
+    """Whether validate() gives up on `payload` at the top, a container of the wrong type, leaving the errors unsorted"""
+    while isinstance(node, Limit):
+        if node.exceeded(payload):
+            return False
+        node = node.node
+    if isinstance(node, Dict):
+        return node.view(payload) is None
+    return isinstance(node, List) and not node.is_list(payload)
+
+
+def compile(
+    schema,
+    aggregate=False,
+    defaults=None,
+    extra="ignore",
+    access="dict",
+    max_depth=None,
+    max_items=None,
+    max_len=None,
+    max_keys=None,
+    metrics=None,
+    tracer=None,
+):
+    """
+    Compile `schema` for repeated use.
+
+    `defaults` maps field paths, written the same way as schema keys, to the values parse() fills in when the field is
+    missing. Such fields are no longer required. `extra` decides what happens to payload keys the schema doesn't know
+    about: "ignore" passes them through, "strip" drops them from the parse() output and "forbid" reports them.
+    Wildcard dicts accept every key regardless.
+
+    `access` widens what passes for a dict or a list: "mapping" reads any collections.abc.Mapping, "attr" reads the
+    attributes of dataclasses, namedtuples and `__slots__` objects and "auto" takes whichever fits the payload. Other than
+    with the default "dict", any non string collections.abc.Sequence is a list. Payloads are read in place, not copied.
+
+    `max_len`, `max_items` and `max_keys` cap every string, list and dict the schema looks at, `max_depth` how deeply
+    dicts and lists may nest. Each is checked with a len() or isinstance() probe before any other work on the value
+
+    `metrics` is a sink, such as a tissuebox.metrics.Metrics, whose `record(seconds, errors)` is called after every
+    validate(), `tracer` a tissuebox.tracing.Tracer that gets a span for every validate()
+    """
+    limits = {"max_depth": max_depth, "max_items": max_items, "max_len": max_len, "max_keys": max_keys}
+    if isinstance(schema, CompiledSchema):
+        options = (aggregate, defaults, extra, access, metrics, tracer) + tuple(limits.values())
+        if options != (False, None, "ignore", "dict", None, None, None, None, None, None):
+            raise ValueError("Schema is already compiled, compile its .schema with the options instead")
+        return schema
+    return CompiledSchema(schema, aggregate, defaults, extra, access, {k: v for k, v in limits.items() if v is not None}, metrics, tracer)
+
+
+def fingerprint(schema):
+    """
+    A hashable stand-in for `schema`, equal for schemas built alike. Values carry their type so that `{1}` isn't
+    `{True}`, tissues are told apart by identity
+    """
+    if type(schema) is dict:
+        return dict, tuple((fingerprint(k), fingerprint(v)) for k, v in schema.items())
+    if type(schema) in (list, tuple):
+        return type(schema), tuple(fingerprint(s) for s in schema)
+    if type(schema) is set:
+        return set, frozenset(fingerprint(s) for s in schema)
+    if type(schema) in primitives:
+        return type(schema), schema
+    return schema
+
+
+compiled_schemas = {}
+compiled_lock = threading.Lock()
+
+
+def cached(schema):
+    """`schema` compiled with the default options, once for every schema built alike"""
+    if isinstance(schema, CompiledSchema):
+        return schema
+    try:
+        key = fingerprint(schema)
+        compiled = compiled_schemas.get(key)
+    except TypeError:
+        # A tissue which can't be hashed
+        return compile(schema)
+    if compiled is None:
+        compiled = compile(schema)
+        with compiled_lock:
+            if len(compiled_schemas) >= MAX_COMPILED:
+                del compiled_schemas[next(iter(compiled_schemas))]
+            compiled = compiled_schemas.setdefault(key, compiled)
+    return compiled
+
+
+def parse(payload, schema, errors=None):
+    """compile(schema).parse(), the schema is compiled on the first call only"""
+    return cached(schema).parse(payload, errors)
+
+
+def validate_into(payload, schema, errors=None):
+    """compile(schema).validate_into(), the schema and its record classes are made on the first call only"""
+    return cached(schema).validate_into(payload, errors)
+
+
+from tissuebox.projection import project, within  # noqa: E402
+from tissuebox.tracing import Trace, size  # noqa: E402
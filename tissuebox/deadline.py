@@ -0,0 +1,68 @@
+from time import monotonic
+
+CHECK_EVERY = 64
+
+
+class ValidationTimeout(Exception):
+    """
+    Raised when validation runs past its deadline.
+
+    `path` is where it was when time ran out, `visited` and `checked` how many values and list or wildcard elements it
+    got through, `spent` the time taken by each tissue as `(field, tissue, seconds)`, slowest first. List indices are
+    folded into `[*]` so the cost of a field adds up across elements
+    """
+
+    def __init__(self, budget):
+        self.deadline = budget.seconds
+        self.elapsed = monotonic() - budget.start
+        self.path = "".join(segment.format(key) for segment, key, field in budget.stack).rstrip()
+        self.visited = budget.visited
+        self.checked = budget.checked
+        self.spent = sorted(((f.rstrip(), t, s) for (f, t), s in budget.spent.items()), key=lambda x: -x[2])
+        super().__init__("Validation ran past its {}s deadline at {} after {} values ({} elements)".format(
+            self.deadline, self.path or "the top level", self.visited, self.checked))
+
+
+class Budget:
+    """The clock and progress of one deadline bound validation"""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.start = monotonic()
+        self.expires = self.start + seconds
+        self.visited = 0
+        self.checked = 0
+        self.stack = []
+        self.field = ""
+        self.spent = {}
+
+    def enter(self, segment, key, field, element=False):
+        """
+        Step into `key` of the payload, `segment` is how it's written in a path and `field` the same step with list
+        indices folded. The path is only formatted when time runs out
+        """
+        self.stack.append((segment, key, self.field))
+        self.field += field
+        self.visited += 1
+        if element:
+            self.checked += 1
+        if not self.visited % CHECK_EVERY and monotonic() > self.expires:
+            raise ValidationTimeout(self)
+
+    def leave(self):
+        self.field = self.stack.pop()[2]
+
+    def charge(self, tissue, start):
+        """Put the time since `start` against `tissue` at the current field"""
+        end = monotonic()
+        key = self.field, tissue
+        self.spent[key] = self.spent.get(key, 0) + end - start
+        if end > self.expires:
+            raise ValidationTimeout(self)
+
+
+def budget(deadline):
+    """A Budget for `deadline` seconds, or `deadline` itself when a caller already started one"""
+    if deadline is None or isinstance(deadline, Budget):
+        return deadline
+    return Budget(deadline)
@@ -0,0 +1,296 @@
+"""
+Payloads made up from a schema, for throughput tests and fuzzing.
+
+generate() walks the normalised schema and makes a value for each part of it: one of the type for primitives, a member
+of an enum, a number within the bounds of an `lt`, `gt` and `divisible` chain, an address of the right shape for the
+formats, and dicts and lists for dotted and `[key]` fields. Payloads are made one at a time as they are asked for, so
+any number of them can be streamed to a file without holding them in memory.
+"""
+import ipaddress
+import math
+import random
+import uuid
+from datetime import datetime, timedelta
+
+from tissuebox import SchemaError, is_primitive_type, is_primitive_value, msg, normalise, primitives, validate
+from tissuebox.basic import (
+    array,
+    boolean,
+    complex_number,
+    date,
+    dictionary,
+    email,
+    integer,
+    ipv4,
+    ipv6,
+    iso8601,
+    null,
+    numeric,
+    string,
+    to_datetime,
+    to_decimal,
+    to_lower,
+    url,
+    uuid4,
+)
+from tissuebox.compiler import compile, copy_schema
+
+# How far from a bound, or from 0 without any, numbers are picked
+WINDOW = 1000
+# Values tried before giving up on a chain which the generated ones don't pass, or on breaking a payload
+TRIES = 20
+EPOCH = datetime(2000, 1, 1)
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+# Values tried, in turn, for tissues nothing is known of and as the wrong value of a mutation
+CANDIDATES = [0, 1, -1, 1.5, 10 ** 9, "", "a", "Sheraton", "Str0ng!Passw0rd#", True, False, None, [], {}, [None], {"a": None}]
+WRONG = [None, "not valid", -1, 10 ** 9, 1.5, True, [], {}, [None], {"a": None}, "", 0]
+
+
+def word(rnd, low=3, high=10):
+    return "".join(rnd.choice(LETTERS) for _ in range(rnd.randint(low, high)))
+
+
+def number(rnd, lower=None, upper=None, step=None, integral=False):
+    """A number above `lower` and below `upper`, a multiple of `step`, None if there's none"""
+    low = lower if lower is not None else (upper - WINDOW if upper is not None else 0)
+    high = upper if upper is not None else low + WINDOW
+    if step:
+        step = abs(step)
+        first, last = math.floor(low / step) + 1, math.ceil(high / step) - 1
+        if first > last:
+            return None
+        return rnd.randint(first, min(last, first + WINDOW)) * step
+    if integral:
+        first, last = math.floor(low) + 1, math.ceil(high) - 1
+        if first > last:
+            return None
+        return rnd.randint(first, min(last, first + WINDOW))
+    x = round(rnd.uniform(low, high), 2)
+    return x if low < x < high else (low + high) / 2
+
+
+def moment(rnd):
+    return EPOCH + timedelta(seconds=rnd.randint(0, 30 * 365 * 86400))
+
+
+# What makes a value of each basic tissue
+KNOWN = {
+    integer: lambda rnd: rnd.randint(-WINDOW, WINDOW),
+    numeric: lambda rnd: rnd.randint(-WINDOW, WINDOW) if rnd.random() < 0.5 else round(rnd.uniform(-WINDOW, WINDOW), 2),
+    complex_number: lambda rnd: complex(rnd.randint(-9, 9), rnd.randint(-9, 9)),
+    string: word,
+    boolean: lambda rnd: rnd.random() < 0.5,
+    null: lambda rnd: None,
+    array: lambda rnd: [rnd.randint(0, 9) for _ in range(rnd.randint(0, 3))],
+    dictionary: lambda rnd: {word(rnd): rnd.randint(0, 9) for _ in range(rnd.randint(0, 3))},
+    email: lambda rnd: "{}@{}.com".format(word(rnd), word(rnd)),
+    url: lambda rnd: "https://www.{}.com/{}".format(word(rnd), word(rnd)),
+    uuid4: lambda rnd: str(uuid.UUID(int=rnd.getrandbits(128), version=4)),
+    ipv4: lambda rnd: ".".join(str(rnd.randint(0, 255)) for _ in range(4)),
+    ipv6: lambda rnd: str(ipaddress.IPv6Address(rnd.getrandbits(128))),
+    date: lambda rnd: moment(rnd).date().isoformat(),
+    iso8601: lambda rnd: moment(rnd).isoformat() + "Z",
+    to_decimal: lambda rnd: "{}.{:02}".format(rnd.randint(0, WINDOW), rnd.randint(0, 99)),
+    to_datetime: lambda rnd: moment(rnd).isoformat() + "Z",
+    to_lower: word,
+}
+
+
+def label(schema):
+    """`schema` written out without the addresses repr() gives functions, to order the members of a set the same each run"""
+    if type(schema) is dict:
+        return "{" + ", ".join(sorted("{!r}: {}".format(k, label(v)) for k, v in schema.items())) + "}"
+    if type(schema) is set:
+        return "{" + ", ".join(sorted(label(s) for s in schema)) + "}"
+    if type(schema) in (list, tuple):
+        return type(schema).__name__ + "(" + ", ".join(label(s) for s in schema) + ")"
+    return repr(schema) if is_primitive_value(schema) else msg(schema)
+
+
+def ranged(schema):
+    return hasattr(schema, "less_than") or hasattr(schema, "greater_than") or hasattr(schema, "multiple_of")
+
+
+class Generator:
+    """
+    Makes the payloads of a normalised schema with its own random numbers. While a payload is made every place a value
+    went is noted as a site, `(container, key, schema, required)`, for mutate() to pick from
+    """
+
+    def __init__(self, schema, rnd, max_items=3):
+        self.schema = schema
+        self.rnd = rnd
+        self.max_items = max_items
+        self.checks = {}
+        self.branches = {}
+        self.sites = []
+
+    def accepts(self, schema, x):
+        # Sub-schemas are kept alive by self.schema so their ids stay theirs
+        check = self.checks.get(id(schema))
+        if check is None:
+            check = self.checks[id(schema)] = compile(schema).validate
+        try:
+            return check(x)
+        except TypeError:
+            # A value the schema can't compare, a string given to `gt`, isn't one it accepts
+            return False
+
+    def payload(self):
+        self.sites = [(None, None, self.schema, False)]
+        return self.value(self.schema)
+
+    def value(self, schema):
+        if type(schema) is dict:
+            return self.document(schema)
+        if type(schema) is list:
+            return self.items(schema)
+        if type(schema) is set:
+            member = self.rnd.choice(sorted(schema, key=label))
+            return member if is_primitive_value(member) else self.value(member)
+        if type(schema) is tuple:
+            return self.chain(schema)
+        if is_primitive_value(schema):
+            return schema
+        if is_primitive_type(schema):
+            return self.value(primitives[schema])
+        if hasattr(schema, "is_tagged"):
+            return self.tagged(schema)
+        if hasattr(schema, "is_early_exit") and hasattr(schema, "validator"):
+            return self.value(schema.validator)
+        if schema in KNOWN:
+            return KNOWN[schema](self.rnd)
+        return self.chain(schema)
+
+    def document(self, schema):
+        d = {}
+        if "*" in schema:
+            for _ in range(self.rnd.randint(1, self.max_items)):
+                self.field(d, word(self.rnd), schema["*"], False)
+            return d
+        for k, v in schema.items():
+            # Pattern keys are never required, nothing is made for them
+            if type(k) is str:
+                self.field(d, k, v, True)
+        return d
+
+    def field(self, container, key, schema, required):
+        container[key] = self.value(schema)
+        self.sites.append((container, key, schema, required))
+
+    def items(self, schema):
+        if not schema:
+            return KNOWN[array](self.rnd)
+        items = [None] * self.rnd.randint(0, self.max_items)
+        for i in range(len(items)):
+            self.field(items, i, self.rnd.choice(schema), False)
+        return items
+
+    def tagged(self, schema):
+        # The branches normalised and the tags as an enum, made once as accepts() goes by their ids
+        if id(schema) not in self.branches:
+            normalised = {tag: normalise(copy_schema(branch)) for tag, branch in schema.branches.items()}
+            self.branches[id(schema)] = (set(schema.branches), normalised)
+        tags, branches = self.branches[id(schema)]
+        tag = self.rnd.choice(sorted(tags, key=repr))
+        d = self.value(branches[tag])
+        d[schema.key] = tag
+        self.sites.append((d, schema.key, tags, True))
+        return d
+
+    def chain(self, schema):
+        """A value passing every member of the chain, numbers are bounded by the ranges, the rest is tried until one passes"""
+        chain = schema if type(schema) is tuple else (schema,)
+        members = [m for m in chain if not hasattr(m, "is_guard")]
+        if any(ranged(m) for m in members):
+            lower = max((m.greater_than for m in members if hasattr(m, "greater_than")), default=None)
+            upper = min((m.less_than for m in members if hasattr(m, "less_than")), default=None)
+            steps = [m.multiple_of for m in members if hasattr(m, "multiple_of")]
+            integral = any(m is integer or m is int for m in members)
+            step = steps[0] if len(steps) == 1 else None
+            if len(steps) > 1 and all(type(s) is int for s in steps):
+                step = 1
+                for s in steps:
+                    step = step * abs(s) // math.gcd(step, abs(s))
+            for _ in range(TRIES):
+                x = number(self.rnd, lower, upper, step, integral)
+                if x is not None and self.accepts(schema, x):
+                    return x
+        sources = [m for m in members if not ranged(m) and (type(m) in (dict, list, set, tuple) or m in KNOWN or is_primitive_type(m))]
+        for _ in range(TRIES if sources else 0):
+            for source in sources:
+                x = self.value(source)
+                if self.accepts(schema, x):
+                    return x
+        for x in CANDIDATES:
+            if self.accepts(schema, x):
+                return x
+        raise SchemaError("Can't generate a value which is {}".format(" and ".join(msg(m) for m in chain)))
+
+    def wrong(self, schema):
+        """A value `schema` doesn't accept, None if it takes anything"""
+        for x in self.rnd.sample(WRONG, len(WRONG)):
+            try:
+                # Both engines have to turn it down, and not fail on it as they do on some types, `lt` given a dict
+                if not self.accepts(schema, x) and not validate(x, schema):
+                    return x
+            except TypeError:
+                continue
+        return None
+
+    def mutate(self, payload, broken=1):
+        """`payload` broken at up to `broken` of its sites, by values of the wrong type or range or required fields left out"""
+        for _ in range(broken):
+            payload = self.damage(payload)
+        return payload
+
+    def damage(self, payload):
+        for _ in range(TRIES):
+            container, key, schema, required = self.rnd.choice(self.sites)
+            if container is None:
+                x = self.wrong(schema)
+                if x is not None:
+                    return x
+                continue
+            if type(container) is dict and key not in container:
+                # Left out by an earlier break of the same payload
+                continue
+            if required and self.rnd.random() < 0.25:
+                kept = container.pop(key)
+            else:
+                x = self.wrong(schema)
+                if x is None:
+                    continue
+                kept, container[key] = container[key], x
+            if not self.accepts(self.schema, payload):
+                return payload
+            container[key] = kept
+        return payload
+
+
+def generate(schema, n=None, seed=0, invalid_ratio=0.0, max_items=3, broken=1):
+    """
+    Payloads for `schema`, `n` of them or endlessly, made one at a time as they are asked for. The same `seed` makes
+    the same payloads.
+
+    About `invalid_ratio` of them are broken in one place, or in up to `broken` places: a value of the wrong type or out
+    of range, or a required field left out. Each is checked, one which can't be broken (`{"x": {integer,
+    not_(integer)}}`, say) stays valid. Lists have up to `max_items` items, and wildcard dicts as many keys
+    """
+    if not 0.0 <= invalid_ratio <= 1.0:
+        raise ValueError("invalid_ratio must be between 0 and 1 (but {})".format(invalid_ratio))
+    if broken < 1:
+        raise ValueError("broken must be at least 1 (but {})".format(broken))
+    rnd = random.Random(seed)
+    return payloads(Generator(normalise(copy_schema(schema)), rnd, max_items), n, rnd, invalid_ratio, broken)
+
+
+def payloads(generator, n, rnd, invalid_ratio, broken):
+    i = 0
+    while n is None or i < n:
+        payload = generator.payload()
+        if invalid_ratio and rnd.random() < invalid_ratio:
+            payload = generator.mutate(payload, rnd.randint(1, broken) if broken > 1 else 1)
+        yield payload
+        i += 1
@@ -31,3 +31,21 @@ def kgattr(d, sofar, *attrs):
 
 def regex_in(r, l):
     return bool(list(filter(re.compile(r).match, l)))
+
+
+ERROR_PATH = re.compile(r"\[(?:'((?:[^']|'(?!\]))*)'|(\d+))\] ?")
+
+
+def error_path(e):
+    """
+    Split an error into the path it's about and its message: `"['staffs'] [0] ['name'] is required"` ->
+    `(('staffs', '0', 'name'), 'is required')`. Keys and indices both come out as strings, like JSON pointer tokens
+    """
+    path = []
+    i = 0
+    while True:
+        m = ERROR_PATH.match(e, i)
+        if m is None:
+            return tuple(path), e[i:]
+        path.append(m.group(1) if m.group(2) is None else m.group(2))
+        i = m.end()
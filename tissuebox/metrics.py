@@ -0,0 +1,159 @@
+import threading
+from bisect import bisect_left
+from time import monotonic
+
+from tissuebox.helpers import ERROR_PATH
+
+# Upper bounds in seconds of the latency histogram buckets, one more bucket takes everything slower
+BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def field_of(e):
+    """The field an error is about with list indices folded: `"['staffs'] [3] ['age'] ..."` -> `"['staffs'] [*] ['age']"`"""
+    path = []
+    i = 0
+    while True:
+        m = ERROR_PATH.match(e, i)
+        if m is None:
+            return " ".join(path)
+        path.append("['{}']".format(m.group(1)) if m.group(2) is None else "[*]")
+        i = m.end()
+
+
+class Shard:
+    """What one thread has counted so far, only ever written by that thread"""
+
+    __slots__ = ("passed", "failed", "seconds", "buckets", "fields")
+
+    def __init__(self, n):
+        self.passed = 0
+        self.failed = 0
+        self.seconds = 0.0
+        self.buckets = [0] * n
+        self.fields = {}
+
+
+class Snapshot:
+    """The counts of a Metrics at one point in time, `buckets` holds the count of each histogram bucket, not cumulative"""
+
+    def __init__(self, passed, failed, seconds, buckets, fields, elapsed):
+        self.passed = passed
+        self.failed = failed
+        self.seconds = seconds
+        self.buckets = buckets
+        self.fields = fields
+        self.elapsed = elapsed
+
+    @property
+    def count(self):
+        return self.passed + self.failed
+
+    @property
+    def rate(self):
+        """Validations per second since the Metrics was made"""
+        return self.count / self.elapsed if self.elapsed else 0.0
+
+    def __repr__(self):
+        return "Snapshot(passed={}, failed={}, {:.1f}/s)".format(self.passed, self.failed, self.rate)
+
+
+class Metrics:
+    """
+    In-memory metrics sink for compile(metrics=...): passed and failed validations, a latency histogram and, for each
+    field with list indices folded into `[*]`, how many validations failed on it.
+
+    Each thread counts into a shard of its own so record() takes no lock, snapshot() adds the shards up. `labels` are
+    put on every sample prometheus() writes, to tell apart the metrics of several schemas
+    """
+
+    def __init__(self, buckets=BUCKETS, labels=None):
+        self.buckets = tuple(sorted(buckets))
+        self.labels = dict(labels or {})
+        self.start = monotonic()
+        self.local = threading.local()
+        self.shards = []
+        # Only taken when a thread makes its shard
+        self.lock = threading.Lock()
+
+    def shard(self):
+        shard = getattr(self.local, "shard", None)
+        if shard is None:
+            shard = self.local.shard = Shard(len(self.buckets) + 1)
+            with self.lock:
+                self.shards.append(shard)
+        return shard
+
+    def record(self, seconds, errors):
+        """Count one validation that took `seconds` and found `errors`"""
+        shard = self.shard()
+        if errors:
+            shard.failed += 1
+            fields = shard.fields
+            for field in {field_of(e) for e in errors}:
+                fields[field] = fields.get(field, 0) + 1
+        else:
+            shard.passed += 1
+        shard.seconds += seconds
+        shard.buckets[bisect_left(self.buckets, seconds)] += 1
+
+    def snapshot(self):
+        with self.lock:
+            shards = list(self.shards)
+        passed = failed = 0
+        seconds = 0.0
+        buckets = [0] * (len(self.buckets) + 1)
+        fields = {}
+        for shard in shards:
+            passed += shard.passed
+            failed += shard.failed
+            seconds += shard.seconds
+            for i, n in enumerate(list(shard.buckets)):
+                buckets[i] += n
+            for field, n in shard.fields.copy().items():
+                fields[field] = fields.get(field, 0) + n
+        return Snapshot(passed, failed, seconds, buckets, fields, monotonic() - self.start)
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def labelled(labels, **extra):
+    pairs = list(labels.items()) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join('{}="{}"'.format(k, escape(v)) for k, v in pairs) + "}"
+
+
+def prometheus(*sinks, prefix="tissuebox"):
+    """The counts of one or more Metrics in the Prometheus text exposition format"""
+    snapshots = [(sink, sink.snapshot()) for sink in sinks]
+    lines = [
+        "# HELP {}_validations_total Validations by outcome".format(prefix),
+        "# TYPE {}_validations_total counter".format(prefix),
+    ]
+    for sink, snapshot in snapshots:
+        for outcome in ("passed", "failed"):
+            lines.append("{}_validations_total{} {}".format(prefix, labelled(sink.labels, outcome=outcome), getattr(snapshot, outcome)))
+
+    lines += [
+        "# HELP {}_validation_seconds Time taken by a validation".format(prefix),
+        "# TYPE {}_validation_seconds histogram".format(prefix),
+    ]
+    for sink, snapshot in snapshots:
+        total = 0
+        for bound, n in zip(sink.buckets + (float("inf"),), snapshot.buckets):
+            total += n
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append("{}_validation_seconds_bucket{} {}".format(prefix, labelled(sink.labels, le=le), total))
+        lines.append("{}_validation_seconds_sum{} {!r}".format(prefix, labelled(sink.labels), snapshot.seconds))
+        lines.append("{}_validation_seconds_count{} {}".format(prefix, labelled(sink.labels), snapshot.count))
+
+    lines += [
+        "# HELP {}_field_failures_total Validations failing on each field".format(prefix),
+        "# TYPE {}_field_failures_total counter".format(prefix),
+    ]
+    for sink, snapshot in snapshots:
+        for field, n in sorted(snapshot.fields.items()):
+            lines.append("{}_field_failures_total{} {}".format(prefix, labelled(sink.labels, field=field), n))
+    return "\n".join(lines) + "\n"
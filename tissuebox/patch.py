@@ -0,0 +1,273 @@
+from tissuebox import sort_unique
+from tissuebox.aggregate import AggregatedError
+from tissuebox.compiler import DICT, Dict, Limit, List, cached, check_required, is_list
+from tissuebox.helpers import error_path
+
+
+def pointer(p):
+    """`"/staffs/0/name"` -> `('staffs', '0', 'name')`"""
+    return tuple(t.replace("~1", "/").replace("~0", "~") for t in p.split("/")[1:])
+
+
+def resolve(document, path):
+    """The value at `path`, `None` when there isn't one"""
+    for token in path:
+        if isinstance(document, dict):
+            document = document.get(token)
+        elif isinstance(document, list) and token.isdigit() and int(token) < len(document):
+            document = document[int(token)]
+        else:
+            return None
+    return document
+
+
+def changes(document, patch):
+    """
+    What a patch touched in the patched `document`, as (path, deep, keys) triples. `deep` when the whole value at path
+    may have changed rather than just its keys, `keys` when the keys of the container holding it may have.
+
+    A list patch is a JSON Patch (RFC 6902), a dict one a JSON merge patch (RFC 7396)
+    """
+    if isinstance(patch, dict):
+        found = []
+        merged(patch, (), found)
+        return found
+
+    # The k-th of m appends to a list landed at len - m + k, counted down as they're met
+    appends = {}
+    for op in patch:
+        if op["op"] in ("add", "copy") and op["path"].endswith("/-"):
+            appends[op["path"]] = appends.get(op["path"], 0) + 1
+
+    found = []
+    for op in patch:
+        kind = op["op"]
+        if kind == "test":
+            continue
+        for p in [op["path"], op["from"]] if kind == "move" else [op["path"]]:
+            path = pointer(p)
+            if kind == "replace" or not path:
+                found.append((path, True, False))
+                continue
+            parent = resolve(document, path[:-1])
+            if isinstance(parent, list):
+                if path[-1] == "-" and kind in ("add", "copy"):
+                    appends[p] -= 1
+                    found.append((path[:-1] + (str(len(parent) - 1 - appends[p]),), True, True))
+                else:
+                    # The elements after an insertion or a removal all move, the whole list is affected
+                    found.append((path[:-1], True, False))
+            else:
+                found.append((path, True, True))
+    return found
+
+
+def merged(patch, path, found):
+    for key, value in patch.items():
+        if isinstance(value, dict) and value:
+            found.append((path + (key,), False, True))
+            merged(value, path + (key,), found)
+        else:
+            found.append((path + (key,), True, True))
+
+
+class Index:
+    """
+    Errors filed by the path they're about, in a tree of dicts following the path, so the errors under a path are
+    found and dropped without going over the others. The errors about a node itself are kept under the `None` key
+    """
+
+    def __init__(self, errors=()):
+        self.root = {}
+        # An aggregated error stands for the whole list it's about
+        self.aggregated = []
+        for e in errors:
+            self.add(e)
+
+    def add(self, e):
+        path = error_path(e)[0]
+        if isinstance(e, AggregatedError):
+            self.aggregated.append((path, e))
+        node = self.root
+        for token in path:
+            node = node.setdefault(token, {})
+        node.setdefault(None, []).append(e)
+
+    def remove(self, path, deep):
+        """Drop the errors about `path` and, when `deep`, those about anything under it"""
+        parent, node = None, self.root
+        for token in path:
+            parent, node = node, node.get(token)
+            if node is None:
+                return
+        if deep:
+            del parent[path[-1]]
+            n = len(path)
+            self.aggregated = [(p, e) for p, e in self.aggregated if p[:n] != path]
+        elif node.pop(None, None):
+            self.aggregated = [(p, e) for p, e in self.aggregated if p != path]
+
+    def clear(self):
+        self.root = {}
+        self.aggregated = []
+
+    def errors(self):
+        found = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            for token, value in node.items():
+                if token is None:
+                    found.extend(value)
+                else:
+                    stack.append(value)
+        return found
+
+
+def unwrap(node, value):
+    """The node behind the Limit wrappers, `None` when one of them rejects the value"""
+    while isinstance(node, Limit):
+        if node.exceeded(value):
+            return None
+        node = node.node
+    return node
+
+
+def walk(root, document, path, keys):
+    """
+    Follow `path` down the nodes and the document. Returns the part of `path` that can be revalidated on its own, the
+    (container, value, segment) of each level above it and the node and value at its end, `None` for either if missing.
+
+    Nodes the walk can't see through (chains, unions, tagged unions), aggregating lists, whose groups span their
+    elements, and limits that may now be exceeded or not end the path early, the whole value there is revalidated
+    """
+    levels = []
+    node, value = root, document
+    for d, token in enumerate(path):
+        inner = unwrap(node, value)
+        if isinstance(inner, Dict) and (inner is node or not keys or d < len(path) - 1):
+            view = inner.view(value)
+            if view is None:
+                return path[:d], levels, node, value, True
+            levels.append((inner, view, "['{}'] ".format(token)))
+            if token not in view:
+                return path[: d + 1], levels, None, None, d < len(path) - 1
+            if inner.wildcard is not None:
+                node = inner.wildcard
+            elif token in inner.lookup:
+                node = inner.lookup[token][1]
+            else:
+                node = inner.patterns.node(token) if inner.patterns is not None else None
+            value = view[token]
+        elif isinstance(inner, List) and not inner.aggregate and (inner is node or not keys or d < len(path) - 1):
+            if not inner.is_list(value) or not token.isdigit() or int(token) >= len(value):
+                return path[:d], levels, node, value, True
+            levels.append((inner, value, "[{}] ".format(token)))
+            node, value = inner.item, value[int(token)]
+        else:
+            return path[:d], levels[:d], node, value, True
+        if node is None and d < len(path) - 1:
+            # A key the schema doesn't know about, nothing under it gets validated
+            return path[: d + 1], levels, None, value, True
+    return path, levels, node, value, False
+
+
+def check_branch(plan, payload, rest, errors, path, access, max_items, deep):
+    """
+    The errors check_required() reports under the field at `rest`, without walking the rest of the plan. Without
+    `deep` only those about the field itself
+    """
+    if access is not None:
+        payload = access.view(payload)
+        if payload is None:
+            return
+    for kind, key, label, sub, required in plan:
+        if key != rest[0]:
+            continue
+        if len(rest) == 1:
+            check_required([(kind, key, label, sub if deep else None, required)], payload, errors, path, access, max_items)
+        elif key not in payload or not sub:
+            continue
+        elif kind is DICT:
+            if isinstance(payload[key], dict) or access is not None:
+                check_branch(sub, payload[key], rest[1:], errors, path + label, access, max_items, deep)
+        elif is_list(payload[key], access) and (max_items is None or len(payload[key]) <= max_items):
+            items, token = payload[key], rest[1]
+            if token.isdigit() and int(token) < len(items):
+                item_path = "{}{}[{}]".format(path, label, token)
+                if len(rest) > 2:
+                    check_branch(sub, items[int(token)], rest[2:], errors, item_path, access, max_items, deep)
+                elif deep:
+                    check_required(sub, items[int(token)], errors, item_path, access, max_items)
+
+
+def revalidate(compiled, document, path, deep, keys, errors):
+    """Replace the errors about what changed at `path` in the Index `errors`, all of them when it comes to the top level"""
+    for p, e in errors.aggregated:
+        if path[: len(p)] == p:
+            path, deep = p, True
+
+    path, levels, node, value, truncated = walk(compiled.root, document, path, keys)
+    deep = deep or truncated
+    if not path:
+        E = []
+        compiled.validate(document, E)
+        errors.clear()
+        for e in E:
+            errors.add(e)
+        return
+
+    n = len(path)
+    errors.remove(path, deep)
+    segments = [segment for container, v, segment in levels]
+
+    found = []
+    if deep and node is not None:
+        E = []
+        node.validate(value, E, path[-1])
+        found.extend(E)
+    elif node is not None:
+        inner = unwrap(node, value)
+        view = inner.view(value) if isinstance(inner, Dict) else None
+        if view is None:
+            return revalidate(compiled, document, path, True, keys, errors)
+        for key in inner.lookup:
+            # Fields missing from a dict the patch may have just created
+            if key not in view:
+                revalidate(compiled, document, path + (key,), True, False, errors)
+    prefix = "".join(segments)
+    for e in found:
+        errors.add(prefix + e)
+
+    for d, (container, view, segment) in enumerate(levels):
+        if not isinstance(container, Dict):
+            continue
+        E = []
+        if container.plan:
+            check_branch(container.plan, view, path[d:], E, "", container.access, container.max_items, deep)
+        if d == n - 1 and container.extra == "forbid":
+            key = path[-1]
+            if key in view and key not in container.allowed and (container.patterns is None or container.patterns.node(key) is None):
+                E.append("['{}'] is not allowed".format(key))
+        for e in E:
+            errors.add("".join(segments[:d]) + e)
+
+
+def validate_patch(document, patch, schema, previous, errors=None):
+    """
+    Validate `document` after `patch` was applied to it, knowing `previous`, the errors of the document before. Only the
+    values the patch changed are validated again, along with the required fields along their paths, so the work goes
+    with the size of the patch rather than the size of the document.
+
+    `patch` is a JSON Patch (a list of operations) or a JSON merge patch (a dict). Returns what validate() would
+    """
+    compiled = cached(schema)
+    if errors is None:
+        errors = []
+    index = Index(previous)
+    for path, deep, keys in changes(document, patch):
+        revalidate(compiled, document, path, deep, keys, index)
+    result = index.errors()
+    sort_unique(result)
+    errors.extend(result)
+    return not result
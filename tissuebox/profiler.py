@@ -0,0 +1,63 @@
+import sys
+from time import perf_counter
+
+COLUMNS = ("calls", "failures", "total", "own")
+
+
+class Profile:
+    """
+    Where compiled validation spends its time: for each field and each tissue run on it, how many times it ran, how
+    many of those failed, the time it took all told and the time it took itself, less that of the fields and tissues
+    under it. List indices are folded into `[*]` so the work of a field adds up across elements.
+
+    Pass it to CompiledSchema.validate(), it keeps adding up across calls
+    """
+
+    def __init__(self):
+        self.stats = {}
+        self.field = ""
+        self.stack = []
+
+    def enter(self, field):
+        self.stack.append([self.field, 0.0])
+        self.field += field
+        return perf_counter()
+
+    def leave(self, tissue, start, failed):
+        elapsed = perf_counter() - start
+        previous, inner = self.stack.pop()[:2]
+        key = self.field, tissue
+        stats = self.stats.get(key)
+        if stats is None:
+            stats = self.stats[key] = [0, 0, 0.0, 0.0]
+        stats[0] += 1
+        stats[1] += failed
+        stats[2] += elapsed
+        stats[3] += elapsed - inner
+        self.field = previous
+        if self.stack:
+            self.stack[-1][1] += elapsed
+
+    def rows(self, sort="own"):
+        """`(path, tissue, calls, failures, total, own)` for each field and tissue, the highest `sort` column first"""
+        if sort not in COLUMNS:
+            raise ValueError("sort must be one of {} (but {!r})".format(", ".join(COLUMNS), sort))
+        column = COLUMNS.index(sort)
+        rows = [(field.rstrip(), tissue or "", *stats) for (field, tissue), stats in self.stats.items()]
+        rows.sort(key=lambda row: -row[2 + column])
+        return rows
+
+    def report(self, sort="own", limit=None, file=None):
+        """Print the rows() as a table, the first `limit` of them"""
+        rows = self.rows(sort)[:limit]
+        table = [("path", "tissue", "calls", "failures", "total ms", "own ms")]
+        table += [(p or "<root>", t, str(c), str(f), "{:.3f}".format(s * 1000), "{:.3f}".format(o * 1000)) for p, t, c, f, s, o in rows]
+        widths = [max(len(row[i]) for row in table) for i in range(6)]
+        for row in table:
+            cells = [row[i].ljust(widths[i]) if i < 2 else row[i].rjust(widths[i]) for i in range(6)]
+            print("  ".join(cells).rstrip(), file=file or sys.stdout)
+
+    def clear(self):
+        self.stats.clear()
+        self.field = ""
+        del self.stack[:]
@@ -0,0 +1,89 @@
+from tissuebox import SchemaError, normalise
+from tissuebox.compiler import MAX_PROJECTIONS, copy_schema, fingerprint, projections_lock, tokens
+
+# The projections validate() made of plain schemas, by the schema's fingerprint and the paths
+projections = {}
+
+
+def project(schema, only=None, exclude=None):
+    """
+    The part of `schema` the `only` paths lead to, less the parts the `exclude` paths lead to. Paths are written like
+    schema keys, "address.city" or "[staffs].name", and go on through the item of a list schema
+    """
+    schema = copy_schema(schema)
+    if only is not None:
+        schema = select(schema, [tokens(p) for p in only], ())
+    if exclude:
+        schema = drop(schema, [tokens(p) for p in exclude], ())
+    return {} if schema is None else schema
+
+
+def projected(schema, only=None, exclude=None):
+    """project() made once for every schema built alike and set of paths"""
+    try:
+        key = fingerprint(schema), None if only is None else frozenset(only), frozenset(exclude or ())
+        found = projections.get(key)
+    except TypeError:
+        # A tissue which can't be hashed
+        return project(schema, only, exclude)
+    if found is None:
+        found = project(schema, only, exclude)
+        with projections_lock:
+            if len(projections) >= MAX_PROJECTIONS:
+                del projections[next(iter(projections))]
+            found = projections.setdefault(key, found)
+    return found
+
+
+def heads(schema, paths, where):
+    """The paths grouped by the field they start with, every field has to be in the normalised dict `schema`"""
+    grouped = {}
+    for p in paths:
+        if p[0] not in schema:
+            raise SchemaError("{} doesn't match any field".format(".".join(where + p[:1])))
+        grouped.setdefault(p[0], []).append(p[1:])
+    return grouped
+
+
+def descend(schema, paths, where):
+    """The schema as a normalised dict to go on into, or the item of the list it is"""
+    if type(schema) is dict:
+        return normalise(schema)
+    if not (type(schema) is list and len(schema) == 1):
+        raise SchemaError("{} doesn't lead to a field".format(".".join(where + paths[0])))
+    return schema
+
+
+def select(schema, paths, where):
+    if () in paths:
+        return schema
+    schema = descend(schema, paths, where)
+    if type(schema) is list:
+        return [select(schema[0], paths, where)]
+    grouped = heads(schema, paths, where)
+    return {k: select(v, grouped[k], where + (k,)) for k, v in schema.items() if k in grouped}
+
+
+def drop(schema, paths, where):
+    """`None` when the whole of `schema` is excluded"""
+    if () in paths:
+        return None
+    schema = descend(schema, paths, where)
+    if type(schema) is list:
+        return [drop(schema[0], paths, where)]
+    grouped = heads(schema, paths, where)
+    kept = {}
+    for k, v in schema.items():
+        if k in grouped:
+            v = drop(v, grouped[k], where + (k,))
+            if v is None:
+                continue
+        kept[k] = v
+    return kept
+
+
+def within(path, only, exclude):
+    """Whether the field at the token path `path` is kept whole by a projection on token paths"""
+    if only is not None and not any(path[: len(p)] == p for p in only):
+        return False
+    return not any(path[: len(p)] == p for p in exclude)
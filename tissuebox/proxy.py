@@ -0,0 +1,245 @@
+from collections.abc import MutableMapping, MutableSequence, Sequence
+
+from tissuebox import SchemaError, sort_unique
+from tissuebox.compiler import CompiledSchema, Dict, List, Node, check_required, compile
+
+
+class Entry:
+    """What is known of one value of a proxy: its own errors and, for a nested dict or list, the proxy holding it"""
+
+    __slots__ = ("errors", "child")
+
+    def __init__(self, errors, child):
+        self.errors = errors
+        self.child = child
+
+    def failing(self):
+        return bool(self.errors) or (self.child is not None and not self.child.valid)
+
+
+class Validated:
+    """
+    Validation state shared by ValidatedDict and ValidatedList. `failing` holds the entries with errors, the proxy is
+    valid when there are none and no required field is missing, so `valid` takes constant time whatever the size
+    """
+
+    def __init__(self, schema, kind):
+        if isinstance(schema, Node):
+            node = schema
+        else:
+            node = (schema if isinstance(schema, CompiledSchema) else compile(schema)).root
+        if type(node) is not kind:
+            raise SchemaError("{} needs a {} schema".format(type(self).__name__, "dict" if kind is Dict else "list"))
+        self.node = node
+        self.owner = None
+        self.failing = set()
+        self.missing = set()
+
+    @property
+    def valid(self):
+        return not self.failing and not self.missing
+
+    def entry(self, node, value, field):
+        """Validate `value` against `node`, nested dicts and lists whose schema is a plain dict or list get a proxy"""
+        if isinstance(value, Validated):
+            value = value.plain()
+        if type(node) is Dict and type(value) is dict:
+            child = ValidatedDict(node, value)
+        elif type(node) is List and type(value) is list:
+            child = ValidatedList(node, value)
+        else:
+            errors = []
+            node.validate(value, errors, field)
+            sort_unique(errors)
+            return value, Entry(errors, None)
+        entry = Entry([], child)
+        child.owner = self, entry
+        return child, entry
+
+    def track(self, entry):
+        if entry.failing():
+            self.failing.add(entry)
+
+    def untrack(self, entry):
+        self.failing.discard(entry)
+        if entry.child is not None:
+            entry.child.owner = None
+
+    def refresh(self, entry):
+        """A nested proxy changed its validity"""
+        before = self.valid
+        if entry.failing():
+            self.failing.add(entry)
+        else:
+            self.failing.discard(entry)
+        self.notify(before)
+
+    def notify(self, before):
+        """Tell the parent proxy once a change is done, if it made this one valid or invalid"""
+        if self.owner is not None and self.valid != before:
+            parent, entry = self.owner
+            parent.refresh(entry)
+
+    def describe(self, segment, entry):
+        if entry.child is not None:
+            return [segment + e for e in entry.child.errors()]
+        return [segment + e for e in entry.errors]
+
+
+class ValidatedDict(Validated, MutableMapping):
+    """
+    A dict that validates every value as it's set against the node of its key in a compiled dict schema and keeps
+    track of the required fields still missing. `valid` answers at once, `errors()` lists what is wrong.
+
+    Nested dicts and lists are kept in proxies of their own, so changing them is tracked too
+    """
+
+    def __init__(self, schema, data=None):
+        super().__init__(schema, Dict)
+        node = self.node
+        self.plan = {step[1]: step for step in node.plan or ()}
+        self.missing = {key for key, (kind, k, label, sub, required) in self.plan.items() if required}
+        self.data = {}
+        self.entries = {}
+        if data:
+            self.update(data)
+
+    def field(self, key):
+        """The node of `key`, `None` for a key the schema doesn't know"""
+        node = self.node
+        if node.wildcard is not None:
+            return node.wildcard
+        if key in node.lookup:
+            return node.lookup[key][1]
+        return node.patterns.node(key) if node.patterns is not None and type(key) is str else None
+
+    def __setitem__(self, key, value):
+        before = self.valid
+        if key in self.entries:
+            self.untrack(self.entries.pop(key))
+        node = self.field(key)
+        if node is None:
+            entry = Entry(["is not allowed"] if self.node.extra == "forbid" else [], None)
+        else:
+            value, entry = self.entry(node, value, key)
+        self.data[key] = value
+        self.entries[key] = entry
+        self.missing.discard(key)
+        self.track(entry)
+        self.notify(before)
+
+    def __delitem__(self, key):
+        before = self.valid
+        del self.data[key]
+        entry = self.entries.pop(key)
+        if key in self.plan and self.plan[key][4]:
+            self.missing.add(key)
+        self.untrack(entry)
+        self.notify(before)
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def errors(self):
+        """The errors of the whole dict, worded the way validate() words them"""
+        errors = ["['{}'] is required".format(key) for key in self.missing]
+        for key, entry in self.entries.items():
+            if entry in self.failing:
+                errors.extend(self.describe("['{}'] ".format(key), entry))
+                if key in self.plan and self.plan[key][3]:
+                    # validate() words the fields missing further down from here as well, "['address']['city'] is required"
+                    value = self.data[key]
+                    payload = {key: value.plain() if isinstance(value, Validated) else value}
+                    check_required([self.plan[key]], payload, errors, "", self.node.access, self.node.max_items)
+        sort_unique(errors)
+        return errors
+
+    def plain(self):
+        """A plain dict of plain values"""
+        return {k: v.plain() if isinstance(v, Validated) else v for k, v in self.data.items()}
+
+    def __repr__(self):
+        return "ValidatedDict({!r}, valid={})".format(self.data, self.valid)
+
+
+class ValidatedList(Validated, MutableSequence):
+    """A list that validates every element as it goes in against the item node of a compiled list schema"""
+
+    def __init__(self, schema, data=None):
+        super().__init__(schema, List)
+        self.data = []
+        self.entries = []
+        if data:
+            self.extend(data)
+
+    def make(self, value, i):
+        if self.node.item is None:
+            return value, Entry([], None)
+        return self.entry(self.node.item, value, str(i))
+
+    def __setitem__(self, i, value):
+        before = self.valid
+        if isinstance(i, slice):
+            old = self.entries[i]
+            start = i.indices(len(self.data))[0]
+            made = [self.make(v, start + n) for n, v in enumerate(value)]
+            self.data[i] = [v for v, e in made]
+            self.entries[i] = [e for v, e in made]
+        else:
+            old = [self.entries[i]]
+            self.data[i], self.entries[i] = self.make(value, i)
+            made = [(None, self.entries[i])]
+        for entry in old:
+            self.untrack(entry)
+        for v, entry in made:
+            self.track(entry)
+        self.notify(before)
+
+    def __delitem__(self, i):
+        before = self.valid
+        old = self.entries[i] if isinstance(i, slice) else [self.entries[i]]
+        del self.data[i]
+        del self.entries[i]
+        for entry in old:
+            self.untrack(entry)
+        self.notify(before)
+
+    def insert(self, i, value):
+        before = self.valid
+        value, entry = self.make(value, i)
+        self.data.insert(i, value)
+        self.entries.insert(i, entry)
+        self.track(entry)
+        self.notify(before)
+
+    def __getitem__(self, i):
+        return self.data[i]
+
+    def __len__(self):
+        return len(self.data)
+
+    def __eq__(self, other):
+        if isinstance(other, Sequence) and not isinstance(other, (str, bytes)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def errors(self):
+        """The errors of the whole list, worded the way validate() words them"""
+        errors = []
+        for i, entry in enumerate(self.entries):
+            if entry in self.failing:
+                errors.extend(self.describe("[{}] ".format(i), entry))
+        sort_unique(errors)
+        return errors
+
+    def plain(self):
+        return [v.plain() if isinstance(v, Validated) else v for v in self.data]
+
+    def __repr__(self):
+        return "ValidatedList({!r}, valid={})".format(self.data, self.valid)
@@ -0,0 +1,126 @@
+from collections import Counter
+from collections.abc import Mapping
+
+from tissuebox import SchemaError
+from tissuebox.compiler import Dict, Limit, Literal, Or, Tagged, compile
+
+
+def literal_values(node):
+    """The values a field is pinned to by a literal or a set of literals, `None` when it accepts anything else"""
+    if isinstance(node, Literal):
+        nodes = [node]
+    elif isinstance(node, Or) and all(isinstance(n, Literal) for n in node.nodes):
+        nodes = node.nodes
+    else:
+        return None
+    try:
+        return {n.value for n in nodes}
+    except TypeError:
+        return None
+
+
+def fingerprint(root):
+    """The top level keys a payload must have and the literal values some of them must hold to stand a chance"""
+    while isinstance(root, Limit):
+        root = root.node
+    if isinstance(root, Tagged):
+        return {root.key}, {root.key: set(root.branches)}
+    if not isinstance(root, Dict) or not root.plan:
+        return set(), {}
+
+    required = {key for kind, key, label, sub, is_required in root.plan if is_required}
+    literals = {}
+    for key, p, node in root.fields:
+        values = literal_values(node) if key in required else None
+        if values is not None:
+            literals[key] = values
+    return required, literals
+
+
+class SchemaRouter:
+    """
+    Finds which of many registered schemas a payload matches.
+
+    Every schema is fingerprinted by the keys it requires and the literal values (discriminators) it pins them to, and
+    indexed under its most selective condition: a discriminator value if it has one, otherwise its least shared
+    required key. A payload is only checked against the fingerprints indexed under its own keys and values, and only
+    fully validated against the schemas whose fingerprint it meets
+    """
+
+    def __init__(self):
+        self.schemas = {}
+        self.order = {}
+        self.fingerprints = {}
+        self.index = None
+
+    def add(self, name, schema):
+        """Register `schema`, plain or compiled, under `name`"""
+        if name in self.schemas:
+            raise SchemaError("Schema {!r} is already registered".format(name))
+        compiled = compile(schema)
+        self.schemas[name] = compiled
+        self.order[name] = len(self.order)
+        self.fingerprints[name] = fingerprint(compiled.root)
+        self.index = None
+
+    def build(self):
+        """(key -> names, key -> value -> names, names without conditions), rebuilt after schemas are added"""
+        shared = Counter(key for required, literals in self.fingerprints.values() for key in required)
+        keys, values, unconditional = {}, {}, []
+        for name, (required, literals) in self.fingerprints.items():
+            if literals:
+                key = min(literals, key=lambda k: (len(literals[k]), str(k)))
+                index = values.setdefault(key, {})
+                for value in literals[key]:
+                    index.setdefault(value, []).append(name)
+            elif required:
+                keys.setdefault(min(required, key=lambda k: (shared[k], str(k))), []).append(name)
+            else:
+                unconditional.append(name)
+        self.index = keys, values, unconditional
+        return self.index
+
+    def candidates(self, payload):
+        """Names of the schemas the payload may match, in registration order, without validating it"""
+        if not isinstance(payload, Mapping):
+            return list(self.schemas)
+
+        keys, values, unconditional = self.index or self.build()
+        found = list(unconditional)
+        for key in payload:
+            names = keys.get(key)
+            if names:
+                found.extend(n for n in names if self.fits(n, payload))
+            index = values.get(key)
+            if index:
+                try:
+                    names = index.get(payload[key])
+                except TypeError:
+                    # Unhashable values can't equal any of the indexed literals
+                    names = None
+                if names:
+                    found.extend(n for n in names if self.fits(n, payload))
+        return sorted(found, key=self.order.__getitem__)
+
+    def fits(self, name, payload):
+        required, literals = self.fingerprints[name]
+        for key in required:
+            if key not in payload:
+                return False
+        for key, allowed in literals.items():
+            try:
+                if payload[key] not in allowed:
+                    return False
+            except TypeError:
+                return False
+        return True
+
+    def match(self, payload):
+        """Names of the schemas the payload is valid against, in registration order"""
+        return [name for name in self.candidates(payload) if self.schemas[name].validate(payload)]
+
+    def __len__(self):
+        return len(self.schemas)
+
+    def __contains__(self, name):
+        return name in self.schemas
@@ -0,0 +1,44 @@
+from itertools import chain
+from random import Random
+
+
+class Sample:
+    """
+    Validate only part of long lists: the first and last `edges` elements and `n` others picked at random. The same
+    seed picks the same elements, so a failure found once is found again. Lists of at most 2 * edges + n elements are
+    validated in full.
+
+    The sample keeps count of what it covered, across every list and every call it's passed to
+    """
+
+    def __init__(self, n=1000, edges=100, seed=0):
+        for name, value in (("n", n), ("edges", edges)):
+            if type(value) is not int or value < 0:
+                raise ValueError("{} must be a non negative integer (but {!r})".format(name, value))
+        self.n = n
+        self.edges = edges
+        self.seed = seed
+        self.lists = 0
+        self.total = 0
+        self.checked = 0
+
+    def indices(self, size):
+        """The indices to validate of a list of `size` elements, in ascending order"""
+        self.lists += 1
+        self.total += size
+        edges = self.edges
+        if size <= 2 * edges + self.n:
+            self.checked += size
+            return range(size)
+        self.checked += 2 * edges + self.n
+        middle = sorted(Random(self.seed).sample(range(edges, size - edges), self.n))
+        return chain(range(edges), middle, range(size - edges, size))
+
+    @property
+    def coverage(self):
+        """The share of the list elements seen that were validated"""
+        return self.checked / self.total if self.total else 1.0
+
+    def __repr__(self):
+        return "Sample(n={}, edges={}, seed={!r}, checked {} of {} elements in {} lists)".format(
+            self.n, self.edges, self.seed, self.checked, self.total, self.lists)
@@ -0,0 +1,110 @@
+import itertools
+import threading
+from collections.abc import Sized
+from time import perf_counter
+
+from tissuebox.profiler import Profile
+
+
+class Tracer:
+    """
+    Gets a span for every validate() of the schemas compiled with it, compile(tracer=...). Override start(), end() and
+    event() to hand them to a tracing library, the span is whatever start() returns.
+
+    The validation span ends with the `size` of the payload (its len(), `None` for a value without one), the number
+    of `errors` and whether it was `sampled`. Sampling is decided as a validation starts, one in `every` is validated
+    on the profiled tree and also gets the number of values it went through (`nodes`), a "node" event for every field
+    and tissue and, with `fields`, a span of its own for each top level field. `every=0` never samples
+    """
+
+    def __init__(self, every=100, fields=False):
+        if type(every) is not int or every < 0:
+            raise ValueError("every must be a non negative integer (but {!r})".format(every))
+        self.every = every
+        self.fields = fields
+        self.calls = itertools.count()
+
+    def sampled(self):
+        return bool(self.every) and next(self.calls) % self.every == 0
+
+    def start(self, name, parent=None):
+        return None
+
+    def end(self, span, **attributes):
+        pass
+
+    def event(self, span, name, **attributes):
+        pass
+
+
+class Trace(Profile):
+    """The Profile of a sampled validation, passing what it sees on to the tracer"""
+
+    def __init__(self, tracer, span):
+        super().__init__()
+        self.tracer = tracer
+        self.span = span
+        self.nodes = 0
+
+    def enter(self, field):
+        span = None
+        if self.tracer.fields and len(self.stack) == 1 and field.startswith("['"):
+            span = self.tracer.start("validate " + field.rstrip(), self.span)
+        start = super().enter(field)
+        self.stack[-1].append(span)
+        return start
+
+    def leave(self, tissue, start, failed):
+        span = self.stack[-1][2]
+        path = self.field.rstrip()
+        seconds = perf_counter() - start
+        super().leave(tissue, start, failed)
+        if tissue is None:
+            self.nodes += 1
+        self.tracer.event(self.span, "node", path=path, tissue=tissue, failed=bool(failed), seconds=seconds)
+        if span is not None:
+            self.tracer.end(span, failed=bool(failed), seconds=seconds)
+
+
+def size(payload):
+    return len(payload) if isinstance(payload, Sized) else None
+
+
+class Span:
+    __slots__ = ("name", "parent", "attributes", "events", "start", "seconds")
+
+    def __init__(self, name, parent):
+        self.name = name
+        self.parent = parent
+        self.attributes = {}
+        self.events = []
+        self.start = perf_counter()
+        self.seconds = None
+
+    def __repr__(self):
+        return "Span({!r}, {})".format(self.name, self.attributes)
+
+
+class RecordingTracer(Tracer):
+    """A Tracer keeping every span it gets in `spans`, in the order they end, to look at in tests"""
+
+    def __init__(self, every=100, fields=False):
+        super().__init__(every, fields)
+        self.spans = []
+        self.lock = threading.Lock()
+
+    def start(self, name, parent=None):
+        return Span(name, parent)
+
+    def end(self, span, **attributes):
+        span.seconds = perf_counter() - span.start
+        span.attributes.update(attributes)
+        with self.lock:
+            self.spans.append(span)
+
+    def event(self, span, name, **attributes):
+        span.events.append((name, attributes))
+
+    def clear(self):
+        with self.lock:
+            del self.spans[:]